@@ -0,0 +1,210 @@
+"""
+Message builder benchmark: the slot-based builders of builders.py against
+the pydantic request models, for every message type.
+
+For each message type it reports:
+
+- model_us / builder_us: building one message from plain values and
+  encoding its request body
+- speedup: model_us / builder_us
+- model_bytes / builder_bytes: memory held per built message, measured
+  with tracemalloc over --hold messages kept alive at once
+
+Both sides build every nested part (contacts, sections, parameters) per
+message, as a send does, and the request bodies are checked to be
+byte-identical before anything is timed.
+
+Run from the repository root:
+
+    python benchmarks/bench_builders.py [--number N] [--hold N] [--json]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import whatsapp_sdk  # noqa: E402
+from whatsapp_sdk import builders  # noqa: E402
+from whatsapp_sdk.request_schema import (Body, ButtonAction,  # noqa: E402
+                                         Contact, CtaParameters, CtaUrlAction,
+                                         Footer, Header, ListAction, Name,
+                                         Phone, Reply, ReplyButton, Row,
+                                         Section)
+from whatsapp_sdk.schema import template  # noqa: E402
+from whatsapp_sdk.serialization import encode_model  # noqa: E402
+from whatsapp_sdk.whatsapp import Whatsapp  # noqa: E402
+
+TO = "919876543210"
+LINK = "https://example.com/file"
+WAMID = "wamid.HBgLOTE5ODc2NTQzMjEw"
+
+whatsapp = Whatsapp(None)
+
+
+def free_form(to, **kwargs):
+    return whatsapp.build_free_form_message(to=to, **kwargs)
+
+
+def cases():
+    """
+    {name: (model(to), builder(to))}, each building one message for `to`
+    """
+    def contact(to):
+        return [Contact(name=Name(formatted_name="Alice Smith", first_name="Alice"), phones=[Phone(phone=to)])]
+
+    def contact_dict(to):
+        return [{"name": {"formatted_name": "Alice Smith", "first_name": "Alice"}, "phones": [{"phone": to}]}]
+
+    def media(msg_type, builder):
+        return (lambda to: free_form(to, msg_type=msg_type, media_link=LINK),
+                lambda to: builder(to, link=LINK))
+
+    return {
+        "text": (
+            lambda to: free_form(to, msg_type="text", text="Your order has shipped"),
+            lambda to: builders.TextMessage(to, "Your order has shipped"),
+        ),
+        "reaction": (
+            lambda to: free_form(to, msg_type="reaction", msg_id=WAMID, emoji="\U0001f44d"),
+            lambda to: builders.ReactionMessage(to, WAMID, "\U0001f44d"),
+        ),
+        "image": media("image", builders.ImageMessage),
+        "video": media("video", builders.VideoMessage),
+        "audio": media("audio", builders.AudioMessage),
+        "document": media("document", builders.DocumentMessage),
+        "sticker": media("sticker", builders.StickerMessage),
+        "location": (
+            lambda to: free_form(to, msg_type="location", longitude="77.59", latitude="12.97",
+                                 location_name="Office", location_address="MG Road"),
+            lambda to: builders.LocationMessage(to, "77.59", "12.97", name="Office", address="MG Road"),
+        ),
+        "contact": (
+            lambda to: free_form(to, msg_type="contact", contacts=contact(to)),
+            lambda to: builders.ContactsMessage(to, contact_dict(to)),
+        ),
+        "interactive_list": (
+            lambda to: free_form(
+                to, msg_type="interactive", body=Body(text="Pick a slot"), header=Header(text="Delivery"),
+                action=ListAction(button="Slots", sections=[
+                    Section(title="Today", rows=[Row(id=str(i), title=f"{9 + i}:00") for i in range(5)]),
+                ]),
+            ),
+            lambda to: builders.ListMessage(
+                to, "Pick a slot", "Slots", header="Delivery", sections=[
+                    {"title": "Today", "rows": [{"id": str(i), "title": f"{9 + i}:00"} for i in range(5)]},
+                ],
+            ),
+        ),
+        "interactive_button": (
+            lambda to: free_form(
+                to, msg_type="interactive", body=Body(text="Confirm the order?"), footer=Footer(text="Reply below"),
+                action=ButtonAction(buttons=[
+                    ReplyButton(reply=Reply(id="yes", title="Yes")),
+                    ReplyButton(reply=Reply(id="no", title="No")),
+                ]),
+            ),
+            lambda to: builders.ButtonMessage(to, "Confirm the order?", [("yes", "Yes"), ("no", "No")],
+                                              footer="Reply below"),
+        ),
+        "interactive_cta_url": (
+            lambda to: free_form(
+                to, msg_type="interactive", body=Body(text="Track your order"),
+                action=CtaUrlAction(parameters=CtaParameters(display_text="Track", url="https://example.com/t")),
+            ),
+            lambda to: builders.CtaUrlMessage(to, "Track your order", "Track", "https://example.com/t"),
+        ),
+        "template": (
+            lambda to: whatsapp.build_template_message("order_update", to, body=template.Body(parameters=[
+                template.TextParameter(text="Alice"),
+                template.TextParameter(text="ORDER-1234"),
+            ])),
+            lambda to: builders.TemplateMessage(to, "order_update", body=["Alice", "ORDER-1234"]),
+        ),
+    }
+
+
+def check(name, model, builder):
+    expected, actual = encode_model(model(TO)), builder(TO).encode()
+    if expected != actual:
+        raise AssertionError(f"{name}: builder body differs\n  model   {expected}\n  builder {actual}")
+    builder(TO).validate()
+
+
+def per_message_us(func, number):
+    started = time.perf_counter()
+    for i in range(number):
+        func(i)
+    return (time.perf_counter() - started) / number * 1e6
+
+
+def held_bytes(build, hold):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    messages = [build(f"9198{i:08d}") for i in range(hold)]
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del messages
+    return held / hold
+
+
+def measure(name, model, builder, number, hold):
+    check(name, model, builder)
+    model_us = per_message_us(lambda i: encode_model(model(TO)), number)
+    builder_us = per_message_us(lambda i: builder(TO).encode(), number)
+    return {
+        "type": name,
+        "model_us": model_us,
+        "builder_us": builder_us,
+        "speedup": model_us / builder_us,
+        "model_bytes": held_bytes(model, hold),
+        "builder_bytes": held_bytes(builder, hold),
+    }
+
+
+def run(args):
+    results = [measure(name, model, builder, args.number, args.hold)
+               for name, (model, builder) in cases().items()]
+    return {
+        "sdk_version": whatsapp_sdk.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"number": args.number, "hold": args.hold},
+        "results": results,
+    }
+
+
+COLUMNS = (
+    ("model_us", "model us", ".2f"),
+    ("builder_us", "builder us", ".2f"),
+    ("speedup", "speedup", ".1f"),
+    ("model_bytes", "model B", ".0f"),
+    ("builder_bytes", "builder B", ".0f"),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20_000, help="messages built per type for timing")
+    parser.add_argument("--hold", type=int, default=10_000, help="messages held per type for memory")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"whatsapp-sdk {report['sdk_version']} on Python {report['python']}, {report['params']}")
+    print(f"{'type':<22}" + "".join(f"{title:>12}" for _, title, _ in COLUMNS))
+    for row in report["results"]:
+        print(f"{row['type']:<22}" + "".join(f"{row[key]:>12{spec}}" for key, _, spec in COLUMNS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Campaign benchmark: a template campaign streamed from a generated CSV file
+(see campaign.py), interrupted part way and resumed from its checkpoint.
+
+Sends go through the in-memory transport, so rows/s is the cost of the
+pipeline itself: reading, mapping to template parameters, sending through
+the SDK and recording results and checkpoints. The max RSS shows memory
+staying flat however many rows the file holds.
+
+Run from the repository root:
+
+    python benchmarks/bench_campaign.py [--rows N] [--workers N] [--interrupt-at F] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import whatsapp_sdk  # noqa: E402
+from whatsapp_sdk.campaign import TemplateMapping, read_csv  # noqa: E402
+from whatsapp_sdk.transport import ACCEPTED_BODY, InMemoryTransport  # noqa: E402
+
+
+class Interrupted(BaseException):
+    """
+    Stands for the process being killed: not an Exception, so the bulk
+    sender does not record it as a failed send
+    """
+
+
+def generate(path, rows):
+    with open(path, "w") as f:
+        f.write("phone,name,order_id\n")
+        for i in range(rows):
+            f.write(f"9198{i % 10 ** 8:08d},Customer {i},ORD-{i}\n")
+
+
+def run_campaign(directory, path, workers, interrupt_after=None):
+    def responder(method, url, headers, body):
+        if interrupt_after is not None and transport.requests > interrupt_after:
+            raise Interrupted()
+        return 200, ACCEPTED_BODY
+
+    transport = InMemoryTransport(responder=responder)
+    client = whatsapp_sdk.Client("token", "1234567890", transport=transport, pool_maxsize=workers)
+    campaign = client.whatsapp.template_campaign(
+        "order_update", read_csv(path), TemplateMapping(to="phone", body=["name", "order_id"]),
+        checkpoint=os.path.join(directory, "campaign.ckpt"), results=os.path.join(directory, "results.jsonl"),
+        workers=workers, language="en",
+    )
+    try:
+        campaign.run()
+    except Interrupted:
+        pass
+    progress = campaign.progress
+    return {"sent": progress.sent, "failed": progress.failed, "skipped": progress.skipped,
+            "seconds": progress.elapsed, "rows_per_sec": progress.rate}
+
+
+def run(args):
+    logging.getLogger("whatsapp_sdk").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "recipients.csv")
+        generate(path, args.rows)
+        first = run_campaign(directory, path, args.workers, int(args.rows * args.interrupt_at))
+        resumed = run_campaign(directory, path, args.workers)
+        with open(os.path.join(directory, "results.jsonl")) as f:
+            recorded = sum(1 for _ in f)
+    return {
+        "sdk_version": whatsapp_sdk.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"rows": args.rows, "workers": args.workers, "interrupt_at": args.interrupt_at},
+        "results": [{"run": "interrupted", **first}, {"run": "resumed", **resumed}],
+        "recorded": recorded,
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="rows in the CSV file")
+    parser.add_argument("--workers", type=int, default=16, help="sending threads")
+    parser.add_argument("--interrupt-at", type=float, default=0.5, help="share of rows sent before interrupting")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"whatsapp-sdk {report['sdk_version']} on Python {report['python']}, {report['params']}")
+    print(f"{'run':<12}{'sent':>10}{'failed':>8}{'skipped':>10}{'seconds':>10}{'rows/s':>10}")
+    for row in report["results"]:
+        print(f"{row['run']:<12}{row['sent']:>10}{row['failed']:>8}{row['skipped']:>10}{row['seconds']:>10.2f}"
+              f"{row['rows_per_sec']:>10.0f}")
+    print(f"result lines {report['recorded']} for {args.rows} rows, max RSS {report['max_rss_mib']:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
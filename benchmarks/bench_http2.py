@@ -0,0 +1,157 @@
+"""
+HTTP/1.1 connection pool vs HTTP/2 multiplexing, against a local mock
+Graph API server (see mock_graph.py) with a given latency.
+
+For every concurrency level and client (sync Client with threads, or
+AsyncClient with gathered coroutines) it reports:
+
+- msgs_per_sec: throughput
+- p50_ms / p99_ms: send latency
+- cpu_us: process CPU time per send, mock server included
+- connections: sockets the server accepted
+
+The mock server runs in the benchmark's process, so throughput at high
+concurrency is bound by the CPU both share; the socket count is what
+HTTP/2 changes most.
+
+Run from the repository root (HTTP/2 needs `pip install httpx[http2]`):
+
+    python benchmarks/bench_http2.py [--latency S] [--concurrency 16,64,256] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import whatsapp_sdk  # noqa: E402
+
+from mock_graph import MockGraphServer  # noqa: E402
+
+TO = "919876543210"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(durations, elapsed, cpu, server):
+    return {
+        "msgs_per_sec": len(durations) / elapsed,
+        "p50_ms": percentile(durations, 0.5) * 1e3,
+        "p99_ms": percentile(durations, 0.99) * 1e3,
+        "cpu_us": cpu / len(durations) * 1e6,
+        "connections": server.connections,
+    }
+
+
+def run_sync(server, http2, concurrency, number, pool_maxsize):
+    client = whatsapp_sdk.Client("token", "1234567890", pool_connections=pool_maxsize, pool_maxsize=pool_maxsize,
+                                 http2=http2)
+    client.scheme("http")
+    client.host(server.host)
+    whatsapp = client.whatsapp
+
+    def send(_):
+        started = time.perf_counter()
+        whatsapp.send_free_form_message(to=TO, msg_type="text", text="Your order has shipped")
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(send, range(concurrency)))  # open the connections
+        wall, cpu = time.perf_counter(), time.process_time()
+        durations = list(executor.map(send, range(number)))
+        return summarize(durations, time.perf_counter() - wall, time.process_time() - cpu, server)
+
+
+def run_async(server, http2, concurrency, number, pool_maxsize):
+    async def main():
+        client = whatsapp_sdk.AsyncClient("token", "1234567890", pool_connections=pool_maxsize,
+                                          pool_maxsize=pool_maxsize, http2=http2)
+        client.scheme("http")
+        client.host(server.host)
+        whatsapp = client.whatsapp
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send():
+            async with semaphore:
+                started = time.perf_counter()
+                await whatsapp.send_free_form_message(to=TO, msg_type="text", text="Your order has shipped")
+                return time.perf_counter() - started
+
+        async with client:
+            await asyncio.gather(*(send() for _ in range(concurrency)))
+            wall, cpu = time.perf_counter(), time.process_time()
+            durations = await asyncio.gather(*(send() for _ in range(number)))
+            return summarize(durations, time.perf_counter() - wall, time.process_time() - cpu, server)
+
+    return asyncio.run(main())
+
+
+def run(args):
+    logging.getLogger("whatsapp_sdk").setLevel(logging.ERROR)
+    results = []
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        for mode, runner in (("sync", run_sync), ("async", run_async)):
+            for http2 in (False, True):
+                with MockGraphServer(latency=args.latency, jitter=args.jitter, http2=http2) as server:
+                    row = {"client": mode, "protocol": "HTTP/2" if http2 else "HTTP/1.1", "concurrency": concurrency}
+                    row.update(runner(server, http2, concurrency, args.number, args.pool_maxsize or concurrency))
+                results.append(row)
+    return {
+        "sdk_version": whatsapp_sdk.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"number": args.number, "latency": args.latency, "jitter": args.jitter,
+                   "pool_maxsize": args.pool_maxsize},
+        "results": results,
+    }
+
+
+COLUMNS = (
+    ("msgs_per_sec", "msgs/s", ".0f"),
+    ("p50_ms", "p50 ms", ".1f"),
+    ("p99_ms", "p99 ms", ".1f"),
+    ("cpu_us", "cpu us", ".0f"),
+    ("connections", "sockets", "d"),
+)
+
+
+def print_table(report):
+    print(f"whatsapp-sdk {report['sdk_version']} on Python {report['python']}, {report['params']}")
+    print(f"{'client':<8}{'protocol':<10}{'concurrency':>12}" + "".join(f"{title:>10}" for _, title, _ in COLUMNS))
+    for row in report["results"]:
+        print(f"{row['client']:<8}{row['protocol']:<10}{row['concurrency']:>12}"
+              + "".join(f"{row[key]:>10{spec}}" for key, _, spec in COLUMNS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="sends per measurement")
+    parser.add_argument("--concurrency", default="16,64,256", help="comma separated concurrent sends to try")
+    parser.add_argument("--pool-maxsize", type=int, help="connections per client, the concurrency by default")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="mock server latency jitter in seconds")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print_table(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Duplicate suppression benchmark: the cost per send of a DuplicateGuard
+(see idempotency.py) holding many keys.
+
+For each key store it reports:
+
+- claim_us: claiming and committing a new key, as every first send does
+- duplicate_us: refusing a key sent before
+- lookup_us: checking a key never sent, once the guard is full
+- false_positive_rate: share of those checks the Bloom filter passed on
+  to the exact store
+- bloom_mib: memory of the Bloom filter
+
+Run from the repository root:
+
+    python benchmarks/bench_idempotency.py [--keys N] [--error-rate F] [--stores memory,sqlite] [--json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import whatsapp_sdk  # noqa: E402
+from whatsapp_sdk import DuplicateMessageError  # noqa: E402
+from whatsapp_sdk.idempotency import (DuplicateGuard, MemoryKeyStore,  # noqa: E402
+                                      SQLiteKeyStore, message_key)
+
+BODY = b'{"messaging_product":"whatsapp","to":"%d","type":"template","template":{"name":"order_update"}}'
+
+
+class CountingStore:
+    """
+    Forwards to a store, counting lookups: the Bloom filter's positives
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.lookups = 0
+
+    def add(self, key):
+        self.store.add(key)
+
+    def __contains__(self, key):
+        self.lookups += 1
+        return key in self.store
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __len__(self):
+        return len(self.store)
+
+    def flush(self):
+        self.store.flush()
+
+    def close(self):
+        self.store.close()
+
+
+def measure(name, store, keys, error_rate, samples):
+    counting = CountingStore(store)
+    guard = DuplicateGuard(capacity=keys, error_rate=error_rate, store=counting)
+
+    started = time.perf_counter()
+    for i in range(keys):
+        key = message_key(BODY % i)
+        guard.claim(key)
+        guard.commit(key)
+    claim = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(samples):
+        try:
+            guard.claim(message_key(BODY % i))
+        except DuplicateMessageError:
+            pass
+    duplicate = time.perf_counter() - started
+
+    counting.lookups = 0
+    started = time.perf_counter()
+    for i in range(keys, keys + samples):
+        guard.seen(message_key(BODY % i))
+    lookup = time.perf_counter() - started
+    guard.close()
+    return {
+        "store": name,
+        "claim_us": claim / keys * 1e6,
+        "duplicate_us": duplicate / samples * 1e6,
+        "lookup_us": lookup / samples * 1e6,
+        "false_positive_rate": counting.lookups / samples,
+        "bloom_mib": guard.bloom.nbytes / 2 ** 20,
+    }
+
+
+def run(args):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        stores = {
+            "memory": MemoryKeyStore,
+            "sqlite": lambda: SQLiteKeyStore(os.path.join(directory, "keys.db")),
+        }
+        for name in args.stores.split(","):
+            results.append(measure(name, stores[name](), args.keys, args.error_rate, args.samples))
+    return {
+        "sdk_version": whatsapp_sdk.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"keys": args.keys, "error_rate": args.error_rate, "samples": args.samples},
+        "results": results,
+    }
+
+
+COLUMNS = (
+    ("claim_us", "claim us", ".2f"),
+    ("duplicate_us", "dup us", ".2f"),
+    ("lookup_us", "lookup us", ".2f"),
+    ("false_positive_rate", "fp rate", ".5f"),
+    ("bloom_mib", "bloom MiB", ".1f"),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=2_000_000, help="keys sent before measuring lookups")
+    parser.add_argument("--error-rate", type=float, default=0.001, help="Bloom filter false positive rate")
+    parser.add_argument("--samples", type=int, default=200_000, help="duplicate and new keys looked up")
+    parser.add_argument("--stores", default="memory,sqlite", help="comma separated key stores to try")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"whatsapp-sdk {report['sdk_version']} on Python {report['python']}, {report['params']}")
+    print(f"{'store':<8}" + "".join(f"{title:>12}" for _, title, _ in COLUMNS))
+    for row in report["results"]:
+        print(f"{row['store']:<8}" + "".join(f"{row[key]:>12{spec}}" for key, _, spec in COLUMNS))
+
+
+if __name__ == "__main__":
+    main()
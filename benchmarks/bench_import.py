@@ -0,0 +1,101 @@
+"""
+Cold import time of the package, measured in fresh interpreters.
+
+Scenarios:
+
+- import: `import whatsapp_sdk`
+- client: the import and creating a Client
+- first_message: the above and building a text message, which loads the
+  message schemas
+
+Each scenario reports the median and best of --runs processes, and which
+heavy modules it loaded. With --check the script exits with status 1 when
+`import whatsapp_sdk` or creating a Client loads requests, httpx or pydantic,
+or when their median exceeds --max-ms, so it can gate regressions in CI.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py [--runs N] [--check] [--max-ms MS] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+HEAVY_MODULES = ("requests", "urllib3", "httpx", "pydantic")
+
+SCENARIOS = {
+    "import": "import whatsapp_sdk",
+    "client": "import whatsapp_sdk; whatsapp_sdk.Client('token', '1234567890')",
+    "first_message": (
+        "import whatsapp_sdk; client = whatsapp_sdk.Client('token', '1234567890'); "
+        "client.whatsapp.build_free_form_message(msg_type='text', to='919876543210', text='hi')"
+    ),
+}
+
+# Scenarios that must not load HEAVY_MODULES
+LIGHT_SCENARIOS = ("import", "client")
+
+_PROBE = """
+import sys, time
+sys.path.insert(0, {src!r})
+started = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - started
+loaded = sorted(name for name in {heavy!r} if name in sys.modules)
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure(code, runs):
+    times = []
+    loaded = ""
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(src=SRC, code=code, heavy=HEAVY_MODULES)],
+            check=True, capture_output=True, text=True,
+        ).stdout.split()
+        times.append(float(output[0]) * 1000)
+        loaded = output[1] if len(output) > 1 else ""
+    return {
+        "median_ms": statistics.median(times),
+        "best_ms": min(times),
+        "heavy_modules": loaded.split(",") if loaded else [],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=15, help="interpreter runs per scenario")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on a regression")
+    parser.add_argument("--max-ms", type=float, default=50.0,
+                        help="highest median for the import and client scenarios with --check")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = {name: measure(code, args.runs) for name, code in SCENARIOS.items()}
+    failures = []
+    for name in LIGHT_SCENARIOS:
+        if results[name]["heavy_modules"]:
+            failures.append(f"{name} loads {', '.join(results[name]['heavy_modules'])}")
+        if results[name]["median_ms"] > args.max_ms:
+            failures.append(f"{name} takes {results[name]['median_ms']:.1f}ms, more than {args.max_ms}ms")
+
+    if args.json:
+        print(json.dumps({"runs": args.runs, "results": results, "failures": failures}, indent=2))
+    else:
+        print(f"{'scenario':<16}{'median ms':>11}{'best ms':>10}  heavy modules")
+        for name, row in results.items():
+            print(f"{name:<16}{row['median_ms']:>11.1f}{row['best_ms']:>10.1f}  {', '.join(row['heavy_modules'])}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
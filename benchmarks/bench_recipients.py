@@ -0,0 +1,113 @@
+"""
+Recipient list preparation benchmark: normalizing, validating and
+deduplicating a generated campaign list (see recipients.py).
+
+The list mixes the formats people upload (national numbers with and
+without trunk prefix, "+" and "00" international forms, separators),
+with a share of repeated numbers and of invalid entries. It is prepared
+as a Python list, and as a numpy array and pandas Series when those are
+installed.
+
+Run from the repository root:
+
+    python benchmarks/bench_recipients.py [--rows N] [--unique-share F] [--invalid-share F] [--json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import whatsapp_sdk  # noqa: E402
+from whatsapp_sdk import recipients  # noqa: E402
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+FORMATS = (
+    lambda n: n,
+    lambda n: f"0{n}",
+    lambda n: f"+91{n}",
+    lambda n: f"0091 {n[:5]} {n[5:]}",
+    lambda n: f"+91 {n[:5]}-{n[5:]}",
+    lambda n: f"91{n}",
+)
+INVALID = ("12345", "n/a", "", "+91 12345 67890", "98765432101234567")
+
+
+def generate(rows, unique_share, invalid_share, seed=7):
+    rng = random.Random(seed)
+    numbers = [f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}" for _ in range(max(1, int(rows * unique_share)))]
+    values = []
+    for _ in range(rows):
+        if rng.random() < invalid_share:
+            values.append(rng.choice(INVALID))
+        else:
+            values.append(rng.choice(FORMATS)(rng.choice(numbers)))
+    return values
+
+
+def measure(name, values, convert=None):
+    data = convert(values) if convert else values
+    normalizer = recipients.RecipientNormalizer(default_country="IN")
+    started = time.perf_counter()
+    prepared = normalizer.prepare(data)
+    elapsed = time.perf_counter() - started
+    return {
+        "input": name,
+        "seconds": elapsed,
+        "rows_per_sec": len(values) / elapsed,
+        "valid": len(prepared),
+        "duplicates": prepared.duplicates,
+        "invalid": len(prepared.invalid),
+    }
+
+
+def run(args):
+    values = generate(args.rows, args.unique_share, args.invalid_share)
+    results = [measure("list", values)]
+    if numpy is not None:
+        results.append(measure("numpy", values, lambda v: numpy.array(v, dtype=object)))
+    if pandas is not None:
+        results.append(measure("pandas", values, pandas.Series))
+    return {
+        "sdk_version": whatsapp_sdk.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"rows": args.rows, "unique_share": args.unique_share, "invalid_share": args.invalid_share},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000, help="rows in the list")
+    parser.add_argument("--unique-share", type=float, default=0.8, help="distinct numbers per row")
+    parser.add_argument("--invalid-share", type=float, default=0.01, help="share of invalid rows")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"whatsapp-sdk {report['sdk_version']} on Python {report['python']}, {report['params']}")
+    print(f"{'input':<8}{'seconds':>10}{'rows/s':>12}{'valid':>10}{'duplicates':>12}{'invalid':>10}")
+    for row in report["results"]:
+        print(f"{row['input']:<8}{row['seconds']:>10.2f}{row['rows_per_sec']:>12.0f}{row['valid']:>10}"
+              f"{row['duplicates']:>12}{row['invalid']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+End-to-end send benchmark of every message type against a local mock
+Graph API server (see mock_graph.py).
+
+For each message type it measures:
+
+- build_us: building and encoding the request body only
+- cpu_us: SDK CPU time per send on the sending thread, server excluded
+- latency_us: wall time per sequential send
+- msgs_per_sec: throughput with --concurrency sending threads
+- alloc_kib: peak memory allocated during one send (tracemalloc)
+- retained_bytes: memory still held per send after it returned
+- concurrent_peak_mib: traced memory peak while sending concurrently
+
+Run from the repository root:
+
+    python benchmarks/bench_send.py [--latency S] [--concurrency N] [--transport NAME] [--json] [--output FILE]
+
+--transport memory answers in-process without the mock server, leaving
+only the SDK's own cost in cpu_us and latency_us.
+
+Save a run with --output and pass it to --compare on a later run to see
+the change per message type.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import whatsapp_sdk  # noqa: E402
+from whatsapp_sdk.compiled_template import CompiledTemplate  # noqa: E402
+from whatsapp_sdk.request_schema import (Body, ButtonAction,  # noqa: E402
+                                         Contact, CtaParameters, CtaUrlAction,
+                                         Footer, Header, ListAction, Name,
+                                         Phone, Reply, ReplyButton, Row,
+                                         Section)
+from whatsapp_sdk.schema import template  # noqa: E402
+from whatsapp_sdk.serialization import encode, encode_model  # noqa: E402
+from whatsapp_sdk.transport import TRANSPORTS  # noqa: E402
+
+from mock_graph import MockGraphServer  # noqa: E402
+
+TO = "919876543210"
+
+
+def free_form(**kwargs):
+    return (
+        lambda whatsapp, to: whatsapp.send_free_form_message(to=to, **kwargs),
+        lambda whatsapp: encode_model(whatsapp.build_free_form_message(to=TO, **kwargs)),
+    )
+
+
+def template_message(**kwargs):
+    return (
+        lambda whatsapp, to: whatsapp.send_template_message(to=to, **kwargs),
+        lambda whatsapp: encode_model(whatsapp.build_template_message(to=TO, **kwargs)),
+    )
+
+
+def compiled_template(compiled, **kwargs):
+    return (
+        lambda whatsapp, to: whatsapp.send_compiled_template(compiled, to, **kwargs),
+        lambda whatsapp: encode(compiled.render(TO, **kwargs)),
+    )
+
+
+def cases():
+    """
+    {name: (send(whatsapp, to), build(whatsapp))}, one per msg_type branch
+    """
+    media = {"media_link": "https://example.com/file"}
+    template_body = template.Body(parameters=[
+        template.TextParameter(text="Alice"),
+        template.TextParameter(text="ORDER-1234"),
+    ])
+    compiled = CompiledTemplate("order_update", body=template.Body(parameters=[
+        template.TextParameter(text="name"),
+        template.TextParameter(text="order"),
+    ]))
+    return {
+        "text": free_form(msg_type="text", text="Your order has shipped"),
+        "reaction": free_form(msg_type="reaction", msg_id="wamid.HBgLOTE5ODc2NTQzMjEw", emoji="\U0001f44d"),
+        "image": free_form(msg_type="image", **media),
+        "video": free_form(msg_type="video", **media),
+        "audio": free_form(msg_type="audio", **media),
+        "document": free_form(msg_type="document", **media),
+        "sticker": free_form(msg_type="sticker", **media),
+        "location": free_form(msg_type="location", longitude="77.59", latitude="12.97",
+                              location_name="Office", location_address="MG Road"),
+        "contact": free_form(msg_type="contact", contacts=[
+            Contact(name=Name(formatted_name="Alice Smith", first_name="Alice"), phones=[Phone(phone=TO)]),
+        ]),
+        "interactive_list": free_form(
+            msg_type="interactive", body=Body(text="Pick a slot"), header=Header(text="Delivery"),
+            action=ListAction(button="Slots", sections=[
+                Section(title="Today", rows=[Row(id=str(i), title=f"{9 + i}:00") for i in range(5)]),
+            ]),
+        ),
+        "interactive_button": free_form(
+            msg_type="interactive", body=Body(text="Confirm the order?"), footer=Footer(text="Reply below"),
+            action=ButtonAction(buttons=[
+                ReplyButton(reply=Reply(id="yes", title="Yes")),
+                ReplyButton(reply=Reply(id="no", title="No")),
+            ]),
+        ),
+        "interactive_cta_url": free_form(
+            msg_type="interactive", body=Body(text="Track your order"),
+            action=CtaUrlAction(parameters=CtaParameters(display_text="Track", url="https://example.com/t")),
+        ),
+        "template": template_message(name="order_update", body=template_body),
+        "compiled_template": compiled_template(compiled, body=["Alice", "ORDER-1234"]),
+    }
+
+
+def measure(whatsapp, send, build, number, concurrency, concurrent_number):
+    row = {}
+
+    started = time.perf_counter()
+    for _ in range(number):
+        build(whatsapp)
+    row["build_us"] = (time.perf_counter() - started) / number * 1e6
+
+    send(whatsapp, TO)  # open the connection
+    wall, cpu = time.perf_counter(), time.thread_time()
+    for _ in range(number):
+        send(whatsapp, TO)
+    row["cpu_us"] = (time.thread_time() - cpu) / number * 1e6
+    row["latency_us"] = (time.perf_counter() - wall) / number * 1e6
+
+    recipients = [TO] * concurrent_number
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(lambda to: send(whatsapp, to), recipients[:concurrency]))  # warm the pool
+        started = time.perf_counter()
+        list(executor.map(lambda to: send(whatsapp, to), recipients))
+        row["msgs_per_sec"] = concurrent_number / (time.perf_counter() - started)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            peak = 0
+            for _ in range(min(number, 200)):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                send(whatsapp, TO)
+                peak += tracemalloc.get_traced_memory()[1] - before
+            row["alloc_kib"] = peak / min(number, 200) / 1024
+
+            gc.collect()
+            before = tracemalloc.get_traced_memory()[0]
+            for _ in range(number):
+                send(whatsapp, TO)
+            gc.collect()
+            row["retained_bytes"] = (tracemalloc.get_traced_memory()[0] - before) / number
+
+            tracemalloc.reset_peak()
+            list(executor.map(lambda to: send(whatsapp, to), recipients[:max(concurrency * 10, 1)]))
+            row["concurrent_peak_mib"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return row
+
+
+def run(args):
+    # error responses are expected with --error-rate/--throttle-rate
+    logging.getLogger("whatsapp_sdk").setLevel(logging.ERROR)
+    selected = cases()
+    if args.cases:
+        selected = {name: selected[name] for name in args.cases.split(",")}
+    server = MockGraphServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             throttle_rate=args.throttle_rate, http2=args.transport == "http2")
+    results = []
+    with server:
+        client = whatsapp_sdk.Client("token", "1234567890", pool_maxsize=args.concurrency, transport=args.transport)
+        client.scheme("http")
+        client.host(server.host)
+        for name, (send, build) in selected.items():
+            row = {"msg_type": name}
+            row.update(measure(client.whatsapp, send, build, args.number, args.concurrency, args.concurrent_number))
+            results.append(row)
+    return {
+        "sdk_version": whatsapp_sdk.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "number": args.number,
+            "concurrency": args.concurrency,
+            "concurrent_number": args.concurrent_number,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "throttle_rate": args.throttle_rate,
+            "transport": args.transport,
+        },
+        "server_statuses": {str(status): count for status, count in sorted(server.statuses.items())},
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "results": results,
+    }
+
+
+COLUMNS = (
+    ("build_us", "build us", ".1f"),
+    ("cpu_us", "cpu us", ".1f"),
+    ("latency_us", "latency us", ".0f"),
+    ("msgs_per_sec", "msgs/s", ".0f"),
+    ("alloc_kib", "alloc KiB", ".1f"),
+    ("retained_bytes", "retained B", ".1f"),
+    ("concurrent_peak_mib", "peak MiB", ".2f"),
+)
+
+
+def print_table(report, baseline=None):
+    previous = {row["msg_type"]: row for row in baseline["results"]} if baseline else {}
+    print(f"whatsapp-sdk {report['sdk_version']} on Python {report['python']}, {report['params']}")
+    print(f"{'msg_type':<22}" + "".join(f"{title:>13}" for _, title, _ in COLUMNS))
+    for row in report["results"]:
+        print(f"{row['msg_type']:<22}" + "".join(f"{row[key]:>13{spec}}" for key, _, spec in COLUMNS))
+        old = previous.get(row["msg_type"])
+        if old:
+            ratios = (f"{row[key] / old[key]:.2f}x" if old.get(key) else "-" for key, _, _ in COLUMNS)
+            print(f"{'  vs baseline':<22}" + "".join(f"{ratio:>13}" for ratio in ratios))
+    print(f"server statuses: {report['server_statuses']}, max RSS {report['max_rss_mib']:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=500, help="sequential sends per measurement")
+    parser.add_argument("--concurrency", type=int, default=16, help="sending threads")
+    parser.add_argument("--concurrent-number", type=int, default=2000, help="sends per throughput measurement")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="mock server latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of sends failing with 131026")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of sends failing with 130429")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="requests", help="transport of the client")
+    parser.add_argument("--cases", help="comma separated message types to run, all by default")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Request body serialization: bytes per message and encoding time.
+
+before: model_dump() followed by the stdlib json encoding requests applies to `json=`
+after:  model_dump_json(exclude_none=True), and orjson for pre-rendered dicts
+
+Run from the repository root:
+
+    python benchmarks/bench_serialization.py [--number N] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from whatsapp_sdk import serialization  # noqa: E402
+from whatsapp_sdk.compiled_template import CompiledTemplate  # noqa: E402
+from whatsapp_sdk.request_schema import (Body, ListAction, Row,  # noqa: E402
+                                         Section)
+from whatsapp_sdk.schema import template  # noqa: E402
+from whatsapp_sdk.whatsapp import Whatsapp  # noqa: E402
+
+TO = "919876543210"
+
+
+def sample_messages():
+    whatsapp = Whatsapp(None)
+    template_body = template.Body(parameters=[
+        template.TextParameter(text="Alice"),
+        template.TextParameter(text="ORDER-1234"),
+    ])
+    return {
+        "text": whatsapp.build_free_form_message(msg_type="text", to=TO, text="Your order has shipped"),
+        "image": whatsapp.build_free_form_message(msg_type="image", to=TO, media_id="1234567890"),
+        "interactive_list": whatsapp.build_free_form_message(
+            msg_type="interactive",
+            to=TO,
+            body=Body(text="Pick a slot"),
+            action=ListAction(button="Slots", sections=[
+                Section(title="Today", rows=[Row(id=str(i), title=f"{9 + i}:00") for i in range(5)]),
+            ]),
+        ),
+        "template": whatsapp.build_template_message("order_update", TO, body=template_body),
+    }
+
+
+def before(model):
+    return json.dumps(model.model_dump(mode="json")).encode()
+
+
+def after(model):
+    return serialization.encode_model(model)
+
+
+def run(number):
+    results = []
+    for msg_type, model in sample_messages().items():
+        row = {"msg_type": msg_type}
+        for label, func in (("before", before), ("after", after)):
+            row[f"{label}_bytes"] = len(func(model))
+            row[f"{label}_us"] = timeit.timeit(lambda: func(model), number=number) / number * 1e6
+        results.append(row)
+
+    compiled = CompiledTemplate("order_update", body=template.Body(parameters=[
+        template.TextParameter(text="name"),
+        template.TextParameter(text="order"),
+    ]))
+    render_args = (TO,)
+    render_kwargs = {"body": ["Alice", "ORDER-1234"]}
+    rendered = compiled.render(*render_args, **render_kwargs)
+    results.append({
+        "msg_type": "compiled_template",
+        "before_bytes": len(json.dumps(rendered).encode()),
+        "before_us": timeit.timeit(
+            lambda: json.dumps(compiled.render(*render_args, **render_kwargs)).encode(), number=number
+        ) / number * 1e6,
+        "after_bytes": len(serialization.encode(rendered)),
+        "after_us": timeit.timeit(
+            lambda: serialization.encode(compiled.render(*render_args, **render_kwargs)), number=number
+        ) / number * 1e6,
+    })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="encodings per measurement")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.number)
+    if args.json:
+        print(json.dumps({"orjson": serialization.orjson is not None, "results": results}, indent=2))
+        return
+    print(f"orjson available: {serialization.orjson is not None}")
+    print(f"{'msg_type':<20}{'bytes before':>14}{'bytes after':>13}{'us before':>11}{'us after':>10}")
+    for row in results:
+        print(f"{row['msg_type']:<20}{row['before_bytes']:>14}{row['after_bytes']:>13}"
+              f"{row['before_us']:>11.2f}{row['after_us']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
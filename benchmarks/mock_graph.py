@@ -0,0 +1,230 @@
+"""
+Local stand-in for graph.facebook.com answering message sends, and batch
+requests of them, like the Cloud API, with configurable latency and error
+rates.
+
+Use it from a benchmark:
+
+    with MockGraphServer(latency=0.02, error_rate=0.01) as server:
+        client.scheme("http")
+        client.host(server.host)
+
+or run it on its own, e.g. to point an application at it:
+
+    python benchmarks/mock_graph.py --port 8080 --latency 0.05
+"""
+import argparse
+import itertools
+import json
+import random
+import socket
+import socketserver
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _error(message, error_type, code, details):
+    return {"error": {
+        "message": message,
+        "type": error_type,
+        "code": code,
+        "error_data": {"messaging_product": "whatsapp", "details": details},
+        "fbtrace_id": "AbCdEfGhIjK",
+    }}
+
+
+RECIPIENT_ERROR = _error("(#131026) Message undeliverable", "OAuthException", 131026,
+                         "Message Undeliverable.")
+THROTTLING_ERROR = _error("(#130429) Rate limit hit", "OAuthException", 130429,
+                          "Cloud API message throughput has been reached.")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count_connection()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._reply(*self.server.handle_post(self.path, body))
+
+    def _reply(self, status, payload):
+        # one write, so headers and body leave in the same segment
+        head = (f"HTTP/1.1 {status} {self.responses[status][0]}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n").encode()
+        self.wfile.write(head + payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class _HTTP2Handler(socketserver.BaseRequestHandler):
+    """
+    HTTP/2 with prior knowledge (h2c), answering each stream from a thread
+    of its own so slow replies do not hold up the others
+    """
+
+    def handle(self):
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        self.server.count_connection()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connection = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.initiate_connection()
+            self.request.sendall(self.connection.data_to_send())
+        paths, bodies = {}, {}
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            with self.lock:
+                events = self.connection.receive_data(data)
+                self.request.sendall(self.connection.data_to_send())
+            for event in events:
+                if isinstance(event, h2.events.RequestReceived):
+                    paths[event.stream_id] = dict(event.headers)[b":path"].decode()
+                    bodies[event.stream_id] = bytearray()
+                elif isinstance(event, h2.events.DataReceived):
+                    bodies[event.stream_id] += event.data
+                    with self.lock:
+                        self.connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    args = (event.stream_id, paths.pop(event.stream_id), bytes(bodies.pop(event.stream_id)))
+                    threading.Thread(target=self._respond, args=args, daemon=True).start()
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    return
+
+    def _respond(self, stream_id, path, body):
+        status, payload = self.server.handle_post(path, body)
+        headers = [(":status", str(status)), ("content-type", "application/json"),
+                   ("content-length", str(len(payload)))]
+        with self.lock:
+            self.connection.send_headers(stream_id, headers)
+            self.connection.send_data(stream_id, payload, end_stream=True)
+            try:
+                self.request.sendall(self.connection.data_to_send())
+            except OSError:
+                pass
+
+
+class MockGraphServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP/1.1 keep-alive server, or HTTP/2 with prior knowledge
+    with `http2`. Each send waits `latency` plus up to `jitter` seconds,
+    then fails with a throttling error (429, code 130429) with probability
+    `throttle_rate`, with a recipient error (400, code 131026) with
+    probability `error_rate`, and succeeds otherwise. `connections` counts
+    the connections accepted.
+    """
+    daemon_threads = True
+    # many clients connect at once when benchmarking concurrency
+    request_queue_size = 1024
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, http2=False):
+        super().__init__(("127.0.0.1", port), _HTTP2Handler if http2 else _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.ids = itertools.count()
+        self.statuses = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def host(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def count(self, status):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def handle_post(self, path, body):
+        """
+        (status, payload) answering a POST to `path`
+        """
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        if path == "/":
+            # Graph API batch request: form encoded `batch` of operations with form encoded bodies
+            operations = json.loads(urllib.parse.parse_qs(body.decode())["batch"][0])
+            items = []
+            for operation in operations:
+                fields = urllib.parse.parse_qs(operation.get("body", ""))
+                status, reply = self.message_reply(fields.get("to", [""])[0])
+                items.append({"code": status, "body": json.dumps(reply)})
+            return 200, json.dumps(items).encode()
+        try:
+            to = json.loads(body).get("to", "")
+        except ValueError:
+            to = ""
+        status, reply = self.message_reply(to)
+        return status, json.dumps(reply).encode()
+
+    def message_reply(self, to):
+        """
+        (status, reply) for one message send
+        """
+        roll = random.random()
+        if roll < self.throttle_rate:
+            status, reply = 429, THROTTLING_ERROR
+        elif roll < self.throttle_rate + self.error_rate:
+            status, reply = 400, RECIPIENT_ERROR
+        else:
+            status, reply = 200, {
+                "messaging_product": "whatsapp",
+                "contacts": [{"input": to, "wa_id": to}],
+                "messages": [{"id": f"wamid.mock{next(self.ids)}", "message_status": "accepted"}],
+            }
+        self.count(status)
+        return status, reply
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-graph", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every send")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds, uniformly")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of sends failing with 131026")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of sends failing with 130429")
+    parser.add_argument("--http2", action="store_true", help="speak HTTP/2 with prior knowledge (needs h2)")
+    args = parser.parse_args()
+    server = MockGraphServer(args.port, args.latency, args.jitter, args.error_rate, args.throttle_rate, args.http2)
+    print(f"Mock Graph API listening on http://{server.host}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
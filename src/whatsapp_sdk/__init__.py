@@ -1,2 +1,54 @@
+"""
+WhatsApp Cloud API SDK.
+
+Public names are resolved on first access (PEP 562), so `import whatsapp_sdk`
+only loads the exceptions; requests, httpx and the pydantic message schemas
+are imported when a Client, AsyncClient or message is first used.
+"""
 __version__ = "0.0.1"
-from .client import *
+
+import importlib
+
+from .error import *
+
+# name -> module it lives in
+_LAZY_ATTRIBUTES = {
+    "Client": ".client",
+    "AsyncClient": ".async_client",
+    "ClientPool": ".client_pool",
+    "AsyncClientPool": ".client_pool",
+    "Whatsapp": ".whatsapp",
+    "AsyncWhatsapp": ".whatsapp",
+    "WASuccessResponse": ".schema.response",
+    "WAErrorResponse": ".schema.response",
+}
+
+_SUBMODULES = frozenset((
+    "async_client", "batch", "builders", "bulk", "campaign", "client", "client_pool", "compiled_template", "enums",
+    "error", "http2", "idempotency", "instrumentation", "lazy_response", "media", "outbound_queue", "ratelimit",
+    "recipients", "request_schema", "response_schema", "retry", "schema", "serialization", "status_tracker",
+    "template_msg", "template_registry", "timed_http", "transport", "webhook", "whatsapp",
+))
+
+__all__ = [
+    "__version__",
+    *_LAZY_ATTRIBUTES,
+    "GraphAPIError", "SDKError", "AuthenticationError", "ClientError", "ValidationError", "ServerError",
+    "InsufficientCreditError", "NotFoundError", "BadRequest", "RateLimitError", "RecipientError",
+    "TemplateError", "TemplateValidationError", "ChecksumMismatchError", "DuplicateMessageError",
+]
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module(module, __name__), name)
+        globals()[name] = value
+        return value
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | _SUBMODULES)
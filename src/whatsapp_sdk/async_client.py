@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+
+from .client import BaseClient
+
+log = logging.getLogger(__name__)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class AsyncClient(BaseClient):
+    """
+    asyncio counterpart of Client.
+
+    Requests go through a single httpx.AsyncClient whose connection pool is
+    sized from pool_connections/pool_maxsize, so any number of sends can be
+    awaited concurrently from one event loop; once every pooled connection is
+    busy further requests wait for a free connection instead of opening new
+    sockets.
+
+    As with Client, the httpx client and the `whatsapp` helper are created
+    on first use.
+
+    With http2 the connections speak HTTP/2 (this needs h2), each carrying
+    many concurrent requests, so far fewer sockets are opened for the same
+    concurrency.
+    """
+
+    def __init__(
+            self,
+            api_token,
+            phone_number_id,
+            version="v17.0",
+            timeout=30,
+            pool_connections=10,
+            pool_maxsize=10,
+            max_retries=3,
+            rate_limiter=None,
+            media_cache=None,
+            status_tracker=None,
+            retry_policy=None,
+            hooks=None,
+            lazy_responses=False,
+            http2=False,
+            idempotency=None,
+            template_registry=None,
+            **kwargs
+    ) -> None:
+        if httpx is None:
+            raise ImportError("AsyncClient requires httpx, install it with `pip install httpx`")
+        super().__init__(
+            api_token, phone_number_id, version=version, timeout=timeout, pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize, max_retries=max_retries, rate_limiter=rate_limiter,
+            media_cache=media_cache, status_tracker=status_tracker, retry_policy=retry_policy, hooks=hooks,
+            lazy_responses=lazy_responses, http2=http2, idempotency=idempotency,
+            template_registry=template_registry,
+        )
+        self._session = None
+
+    @property
+    def session(self):
+        # Created from the event loop's thread only, so no lock is needed
+        if self._session is None:
+            # plain http (a local test server) has no TLS handshake to negotiate HTTP/2 in
+            http1 = not (self.http2 and self._scheme == "http")
+            self._session = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(
+                    http1=http1,
+                    http2=self.http2,
+                    limits=httpx.Limits(
+                        max_connections=self.pool_maxsize,
+                        max_keepalive_connections=self._pool_connections,
+                    ),
+                    retries=self._max_retries,
+                ),
+                timeout=self.timeout,
+            )
+        return self._session
+
+    @session.setter
+    def session(self, value):
+        self._session = value
+
+    @property
+    def whatsapp(self):
+        if self._whatsapp is None:
+            from .whatsapp import AsyncWhatsapp
+            self._whatsapp = AsyncWhatsapp(self)
+        return self._whatsapp
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.idempotency is not None:
+            self.idempotency.flush()
+        if self._session is not None:
+            await self._session.aclose()
+
+    async def get(self, host=None, path="messages", params=None):
+        """
+        Send HTTP GET request to meta whatsapp cloud api
+        """
+        request_url = self._create_request_url(host=host, path=f"/{path.lstrip('/')}")
+        log.debug(f"GET request sent to {request_url} with params {params}")
+        response = await self.session.get(request_url, headers=self._get_headers, params=params)
+        return self.process_response(host, response)
+
+    async def get_json(self, path, params=None, host=None):
+        """
+        Send HTTP GET request for a Graph API node, see Client.get_json
+        """
+        request_url = self._create_graph_url(host=host, path=path)
+        log.debug(f"GET request sent to {request_url} with params {params}")
+        response = await self.session.get(request_url, headers=self._get_headers, params=params)
+        return self.process_json_response(host, response)
+
+    def stream(self, url, headers=None):
+        """
+        Streaming authenticated GET of an absolute URL, to be used as
+        `async with client.stream(url) as response`
+        """
+        log.debug(f"Streaming GET request sent to {url}")
+        return self.session.stream(
+            "GET", url, headers={**self._get_headers, **headers} if headers else self._get_headers
+        )
+
+    async def post(self, host=None, path=None, body_is_json=True, params={}, body=None, recipient=None,
+                   msg_type=None, started=None, idempotency_key=None):
+        """
+        Send HTTP POST request to meta whatsapp cloud api, see Client.post
+        """
+        request_url, headers, data, recipient, key = self._prepare_post(
+            host, path, body_is_json, params, body, recipient, idempotency_key
+        )
+        if self.hooks:
+            send = self._timed_sender(msg_type, params, started)
+        else:
+            send = self._send_post
+        args = (host, request_url, headers, data, recipient)
+        if self.retry_policy is not None:
+            send, args = self.retry_policy.call_async, (send, *args)
+        if key is not None:
+            result = await self.idempotency.call_async(key, recipient, send, *args)
+        else:
+            result = await send(*args)
+        if self.status_tracker is not None:
+            self.status_tracker.record_response(result)
+        return result
+
+    async def _send_post(self, host, request_url, headers, data, recipient):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(self._phone_number_id, recipient)
+        response = await self.session.post(request_url, headers=headers, content=data)
+        return self._process_post(host, response)
+
+    def _timed_send(self, begin):
+        """
+        Connection and server phases come from httpcore's trace extension.
+        """
+        from .instrumentation import TraceMarks
+
+        async def send(host, request_url, headers, data, recipient):
+            timing = begin(request_url, data)
+            trace = TraceMarks()
+            try:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire_async(self._phone_number_id, recipient)
+                sent = time.perf_counter()
+                response = await self.session.post(
+                    request_url, headers=headers, content=data, extensions={"trace": trace}
+                )
+                received = time.perf_counter()
+                headers_received = trace.marks.get("receive_response_headers.complete", received)
+                timing.phases["rate_limit"] = sent - timing.started
+                timing.phases["connect"] = trace.span("connect_tcp") + trace.span("start_tls")
+                timing.phases["server"] = trace.span("send_request_headers.started",
+                                                     "receive_response_headers.complete")
+                timing.phases["read"] = received - headers_received
+                result = self._timed_result(timing, host, response)
+            except Exception as e:
+                self._timing_failed(timing, e)
+                raise
+            self._timing_done(timing, received)
+            return result
+
+        return send
+
+    async def post_batch(self, operations, recipients=None, host=None):
+        """
+        Send Graph API operations as one batch request, see Client.post_batch
+        """
+        if self.rate_limiter is not None:
+            for recipient in recipients or ():
+                await self.rate_limiter.acquire_async(self._phone_number_id, recipient)
+        request_url, data = self._batch_request(operations, host)
+
+        async def send():
+            response = await self.session.post(request_url, headers=self._form_headers, content=data)
+            return self.process_json_response(host, response)
+
+        if self.retry_policy is None:
+            return await send()
+        return await self.retry_policy.call_async(send)
+
+    def batcher(self, max_size=50, max_delay=0.05):
+        """
+        A batch.AsyncBatcher, see Client.batcher
+        """
+        from .batch import AsyncBatcher
+        return AsyncBatcher(self, max_size, max_delay)
+
+    async def post_stream(self, data, content_type, host=None, path=None):
+        """
+        Send HTTP POST request with a streamed body, see Client.post_stream
+        """
+        request_url = self._create_request_url(host=host, path=path)
+
+        async def chunks():
+            # reading the body (e.g. a media.MultipartUpload) blocks, keep it off the loop
+            iterator = iter(data)
+            while True:
+                chunk = await asyncio.to_thread(next, iterator, None)
+                if chunk is None:
+                    return
+                yield chunk
+
+        headers = {**self._get_headers, "Content-Type": content_type, "Content-Length": str(len(data))}
+        log.debug(f"Streaming POST request sent to {request_url} with {content_type}")
+        response = await self.session.post(request_url, headers=headers, content=chunks())
+        return self.process_json_response(host, response)
@@ -0,0 +1,406 @@
+"""
+Coalescing of many sends into Graph API batch requests.
+
+A batch request is one POST to the Graph API root carrying up to 50
+operations; the reply holds one {"code", "body"} entry per operation, or
+null for operations that were not processed. Each operation's reply is
+processed as the response of a single send would be, so callers get the
+same WASuccessResponse/WAErrorResponse/LazyResponse or exception.
+
+With an idempotency guard on the client, each message is claimed when it
+is queued, raising DuplicateMessageError then, and its key kept or dropped
+by its own reply in the batch.
+
+With a retry_policy on the client, operations whose reply is a retryable
+error (throttling, transient failures) are queued again after the
+policy's delay, and go out with a later batch.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .error import GraphAPIError
+from .serialization import decode, encode
+
+log = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 50
+
+
+class BatchItemResponse:
+    """
+    The reply to one operation of a batch, with the interface of an HTTP
+    response that the clients' response processing relies on
+    """
+    __slots__ = ("status_code", "content", "headers")
+
+    def __init__(self, status_code: int, content: bytes, headers: dict = None) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    @classmethod
+    def from_item(cls, item: dict) -> "BatchItemResponse":
+        headers = {header["name"]: header["value"] for header in item.get("headers") or ()}
+        body = item.get("body") or ""
+        return cls(item["code"], body.encode() if isinstance(body, str) else body, headers)
+
+    def json(self):
+        return decode(self.content)
+
+
+def encode_operation(relative_url: str, params: dict) -> dict:
+    """
+    A POST operation of a batch. Batched bodies are form encoded, nested
+    values as JSON.
+    """
+    fields = {key: value if isinstance(value, str) else json.dumps(value, separators=(",", ":"))
+              for key, value in params.items()}
+    return {"method": "POST", "relative_url": relative_url, "body": urllib.parse.urlencode(fields)}
+
+
+def _params(params, body):
+    if body is not None:
+        return decode(body)
+    return params
+
+
+class _Pending:
+    __slots__ = ("operation", "recipient", "future", "key", "attempts", "started")
+
+    def __init__(self, operation, recipient, future, key=None):
+        self.operation = operation
+        self.recipient = recipient
+        self.future = future
+        self.key = key
+        self.attempts = 1
+        self.started = time.monotonic()
+
+
+class _BatcherBase:
+    def __init__(self, client, max_size: int = MAX_BATCH_SIZE, max_delay: float = 0.05) -> None:
+        if not 1 <= max_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"max_size must be between 1 and {MAX_BATCH_SIZE}")
+        self._client = client
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending = []
+
+    def _operation(self, path, params, body, recipient):
+        params = _params(params, body)
+        if recipient is None:
+            recipient = params.get("to")
+        relative_url = f"{self._client.version}/{self._client.phone_number_id}{path or '/messages'}"
+        return encode_operation(relative_url, params), recipient
+
+    def _claim(self, params, body, recipient, idempotency_key):
+        """
+        Claim the idempotency key of a send as Client.post does, None
+        without a guard
+        """
+        guard = getattr(self._client, "idempotency", None)
+        if guard is None or (recipient is None and idempotency_key is None):
+            return None
+        key = guard.key(body if body is not None else encode(params), idempotency_key)
+        guard.claim(key, recipient)
+        return key
+
+    def _settle(self, pending, result=None, error=None):
+        if pending.key is not None:
+            self._client.idempotency.settle(pending.key, result, error)
+
+    def _retry_delay(self, pending, error):
+        """
+        Seconds after which to send `pending` again after its reply raised
+        `error`, None when it is not retried
+        """
+        policy = self._client.retry_policy
+        if policy is None or not isinstance(error, GraphAPIError):
+            return None
+        delay = policy.next_delay(pending.attempts, error, pending.started)
+        if delay is not None:
+            pending.attempts += 1
+        return delay
+
+    def _resolve(self, batch, items):
+        """
+        Complete the futures of `batch` from the items of a batch response,
+        scheduling the retryable failures to be sent again
+        """
+        client = self._client
+        if not isinstance(items, list):
+            self._fail(batch, GraphAPIError(f"Unexpected batch response {items!r:.200}"))
+            return
+        retries = []
+        for index, pending in enumerate(batch):
+            item = items[index] if index < len(items) else None
+            if item is None:
+                if pending.key is not None:
+                    # may have gone out, like a send that timed out
+                    self._client.idempotency.settle_uncertain(pending.key)
+                pending.future.set_exception(GraphAPIError(
+                    "Batched request was not processed, it may or may not have been sent"
+                ))
+                continue
+            try:
+                result = client._process_post(client.host(), BatchItemResponse.from_item(item))
+            except Exception as e:
+                delay = self._retry_delay(pending, e)
+                if delay is not None:
+                    retries.append((delay, pending))
+                    continue
+                self._settle(pending, error=e)
+                pending.future.set_exception(e)
+                continue
+            self._settle(pending, result)
+            if client.status_tracker is not None:
+                client.status_tracker.record_response(result)
+            pending.future.set_result(result)
+        if retries:
+            # one wait for all of them, honouring the longest Retry-After
+            delay = max(delay for delay, _ in retries)
+            log.info(f"Retrying {len(retries)} batched requests in {delay:.2f}s")
+            self._schedule_retry(delay, [pending for _, pending in retries])
+
+    def _fail(self, batch, error):
+        for pending in batch:
+            self._settle(pending, error=error)
+            if not pending.future.done():
+                pending.future.set_exception(error)
+
+    # -------------- Message helpers --------------
+
+    def send_free_form_message(self, *args, idempotency_key: str = None, **kwargs):
+        """
+        Batched Whatsapp.send_free_form_message
+        """
+        msg = self._client.whatsapp.build_free_form_message(*args, **kwargs)
+        return self.post(params=msg.model_dump(mode="json", exclude_none=True), recipient=msg.to,
+                         idempotency_key=idempotency_key)
+
+    def send_template_message(self, *args, idempotency_key: str = None, **kwargs):
+        """
+        Batched Whatsapp.send_template_message
+        """
+        msg = self._client.whatsapp.build_template_message(*args, **kwargs)
+        self._client.whatsapp.validate_template_message(msg)
+        return self.post(params=msg.model_dump(mode="json", exclude_none=True), recipient=msg.to,
+                         idempotency_key=idempotency_key)
+
+    def send_compiled_template(self, template, to: str, header=None, body=None, footer=None,
+                               idempotency_key: str = None):
+        params = template.render(to, header=header, body=body, footer=footer)
+        self._client.whatsapp.validate_template_message(params)
+        return self.post(params=params, recipient=to, idempotency_key=idempotency_key)
+
+    def send_message(self, message, idempotency_key: str = None):
+        """
+        Batched Whatsapp.send_message
+        """
+        params = message.to_dict()
+        if message.type == "template":
+            self._client.whatsapp.validate_template_message(params)
+        return self.post(params=params, recipient=message.to, idempotency_key=idempotency_key)
+
+    def mark_message_as_read(self, message_id: str):
+        return self.post(params=self._client.whatsapp.build_read_receipt(message_id))
+
+
+class Batcher(_BatcherBase):
+    """
+    Gathers sends and posts them as Graph API batch requests from a
+    background thread, once `max_size` sends are pending or `max_delay`
+    seconds after the first one. Up to `workers` batch requests are in
+    flight at a time.
+
+    post() and the send_* helpers return a concurrent.futures.Future of the
+    response. Sends through the client itself are unaffected and can be
+    mixed freely with batched ones. Call close() (or use the Batcher as a
+    context manager) to send what is still pending.
+    """
+
+    def __init__(self, client, max_size: int = MAX_BATCH_SIZE, max_delay: float = 0.05, workers: int = 1) -> None:
+        super().__init__(client, max_size, max_delay)
+        self.workers = workers
+        self._condition = threading.Condition()
+        self._first_at = None
+        self._closed = False
+        # sends taken in a batch not answered yet, and waiting to be retried
+        self._sending = 0
+        self._retrying = 0
+        self._thread = threading.Thread(target=self._run, name="whatsapp-batcher", daemon=True)
+        self._thread.start()
+
+    def post(self, path=None, params=None, body=None, recipient=None, idempotency_key=None) -> Future:
+        """
+        Queue a POST to the phone number's `path`, taking a request dict as
+        `params` or encoded JSON as `body`, and `idempotency_key`, like
+        Client.post
+        """
+        operation, recipient = self._operation(path, params, body, recipient)
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Batcher is closed")
+            key = self._claim(params, body, recipient, idempotency_key)
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append(_Pending(operation, recipient, future, key))
+            if len(self._pending) >= self.max_size or len(self._pending) == 1:
+                self._condition.notify()
+        return future
+
+    def _take(self):
+        """
+        Wait for the next batch to send, None once closed and drained
+        """
+        with self._condition:
+            while True:
+                if self._pending:
+                    wait = self._first_at + self.max_delay - time.monotonic()
+                    if len(self._pending) >= self.max_size or wait <= 0 or self._closed:
+                        batch = self._pending[:self.max_size]
+                        del self._pending[:self.max_size]
+                        self._first_at = time.monotonic() if self._pending else None
+                        self._sending += len(batch)
+                        return batch
+                    self._condition.wait(wait)
+                elif self._closed and not self._sending and not self._retrying:
+                    return None
+                else:
+                    self._condition.wait()
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whatsapp-batch") as executor:
+            while True:
+                batch = self._take()
+                if batch is None:
+                    return
+                executor.submit(self._send, batch)
+
+    def _send(self, batch):
+        try:
+            items = self._client.post_batch([p.operation for p in batch], [p.recipient for p in batch])
+        except Exception as e:
+            log.warning(f"Batch of {len(batch)} requests failed: {e!r}")
+            self._fail(batch, e)
+        else:
+            self._resolve(batch, items)
+        finally:
+            with self._condition:
+                self._sending -= len(batch)
+                self._condition.notify()
+
+    def _schedule_retry(self, delay, batch):
+        with self._condition:
+            self._retrying += len(batch)
+        timer = threading.Timer(delay, self._requeue, (batch,))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, batch):
+        with self._condition:
+            self._retrying -= len(batch)
+            # already waited for, so sent with the next batch right away
+            self._pending[:0] = batch
+            self._first_at = time.monotonic() - self.max_delay
+            self._condition.notify()
+
+    def flush(self, timeout: float = None) -> None:
+        """
+        Send everything pending now and wait for the responses
+        """
+        with self._condition:
+            futures = [p.future for p in self._pending]
+            self._first_at = time.monotonic() - self.max_delay
+            self._condition.notify()
+        for future in futures:
+            try:
+                future.exception(timeout)
+            except Exception:
+                pass
+
+    def close(self, timeout: float = None) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncBatcher(_BatcherBase):
+    """
+    Batcher for an AsyncClient. post() and the send_* helpers return an
+    asyncio Future to await; batches are posted by a task of the running
+    event loop. Use `async with` or await aclose() to send what is pending.
+    """
+
+    def __init__(self, client, max_size: int = MAX_BATCH_SIZE, max_delay: float = 0.05) -> None:
+        super().__init__(client, max_size, max_delay)
+        self._timer = None
+        self._tasks = set()
+
+    def post(self, path=None, params=None, body=None, recipient=None, idempotency_key=None) -> asyncio.Future:
+        operation, recipient = self._operation(path, params, body, recipient)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = self._claim(params, body, recipient, idempotency_key)
+        self._pending.append(_Pending(operation, recipient, future, key))
+        if len(self._pending) >= self.max_size:
+            self._send_pending()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._send_pending)
+        return future
+
+    def _send_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_size]
+            del self._pending[:self.max_size]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        try:
+            items = await self._client.post_batch([p.operation for p in batch], [p.recipient for p in batch])
+        except Exception as e:
+            log.warning(f"Batch of {len(batch)} requests failed: {e!r}")
+            self._fail(batch, e)
+            return
+        self._resolve(batch, items)
+
+    def _schedule_retry(self, delay, batch):
+        task = asyncio.ensure_future(self._retry(delay, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _retry(self, delay, batch):
+        await asyncio.sleep(delay)
+        self._pending[:0] = batch
+        self._send_pending()
+
+    async def flush(self) -> None:
+        self._send_pending()
+        # retries scheduled by the batches sent add tasks of their own
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    aclose = flush
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
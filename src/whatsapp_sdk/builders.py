@@ -0,0 +1,356 @@
+"""
+Lightweight message builders: the request bodies of request_schema.py and
+schema/template.py without pydantic.
+
+Each builder is a small __slots__ object holding only the values that vary
+between messages, and writes the same wire JSON as the corresponding model
+dumped with exclude_none. Nothing is validated on construction; call
+validate() where messages enter the application (e.g. on the first row of
+a campaign, or in tests) to check one against its pydantic model.
+
+    message = TextMessage("919876543210", "Your order has shipped")
+    client.whatsapp.send_message(message)
+
+Nested values taking several fields (contacts, list sections) are given in
+their wire form as dicts, or as the request_schema models, which are
+dumped once on construction.
+"""
+import importlib
+
+from .serialization import encode
+
+
+def _dump(value):
+    # wire form of a request model, dicts are taken as they are
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    return value
+
+
+class MessageBuilder:
+    """
+    Base of the builders. `type` is the message type of the request body,
+    `_model` the module and name of the pydantic model it corresponds to.
+    """
+    __slots__ = ("to",)
+    type = None
+    _model = None
+
+    def to_dict(self) -> dict:
+        raise NotImplementedError
+
+    def encode(self) -> bytes:
+        return encode(self.to_dict())
+
+    def model(self):
+        """
+        The pydantic model of the message, validated from to_dict()
+        """
+        module, name = self._model
+        model_class = getattr(importlib.import_module(module, __package__), name)
+        return model_class.model_validate(self.to_dict())
+
+    def validate(self) -> "MessageBuilder":
+        """
+        Check the message against its pydantic model, raising
+        pydantic.ValidationError if it does not conform
+        """
+        self.model()
+        return self
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields())
+        return f"{type(self).__name__}({fields})"
+
+    @classmethod
+    def _fields(cls):
+        return [name for klass in reversed(cls.__mro__) for name in getattr(klass, "__slots__", ())]
+
+
+# -------------- Free-form messages --------------
+
+class FreeFormMessage(MessageBuilder):
+    """
+    Base of the free-form messages. `context` is the message_id of the
+    message replied to.
+    """
+    __slots__ = ("context",)
+
+    def _envelope(self):
+        message = {"messaging_product": "whatsapp", "recipient_type": "individual", "preview_url": False,
+                   "to": self.to}
+        if self.context is not None:
+            message["context"] = {"message_id": self.context}
+        message["type"] = self.type
+        return message
+
+
+class TextMessage(FreeFormMessage):
+    __slots__ = ("body", "preview_url")
+    type = "text"
+    _model = (".request_schema", "WhatsappFreeFormTextMsg")
+
+    def __init__(self, to: str, body: str, preview_url: bool = False, context: str = None) -> None:
+        self.to = to
+        self.body = body
+        self.preview_url = preview_url
+        self.context = context
+
+    def to_dict(self):
+        message = self._envelope()
+        message["text"] = {"preview_url": self.preview_url, "body": self.body}
+        return message
+
+
+class ReactionMessage(FreeFormMessage):
+    __slots__ = ("message_id", "emoji")
+    type = "reaction"
+    _model = (".request_schema", "WhatsappFreeFormReactionMsg")
+
+    def __init__(self, to: str, message_id: str, emoji: str) -> None:
+        self.to = to
+        self.message_id = message_id
+        self.emoji = emoji
+        self.context = None
+
+    def to_dict(self):
+        message = self._envelope()
+        message["reaction"] = {"message_id": self.message_id, "emoji": self.emoji}
+        return message
+
+
+class MediaMessage(FreeFormMessage):
+    """
+    Base of the media messages, sending the media at `link` or uploaded as
+    `id`
+    """
+    __slots__ = ("link", "id")
+
+    def __init__(self, to: str, link: str = None, id: str = None, context: str = None) -> None:
+        self.to = to
+        self.link = link
+        self.id = id
+        self.context = context
+
+    def to_dict(self):
+        message = self._envelope()
+        media = {}
+        if self.link is not None:
+            media["link"] = self.link
+        if self.id is not None:
+            media["id"] = self.id
+        message[self.type] = media
+        return message
+
+
+class ImageMessage(MediaMessage):
+    __slots__ = ()
+    type = "image"
+    _model = (".request_schema", "WhatsappFreeFormMediaImageMsg")
+
+
+class VideoMessage(MediaMessage):
+    __slots__ = ()
+    type = "video"
+    _model = (".request_schema", "WhatsappFreeFormMediaVideoMsg")
+
+
+class AudioMessage(MediaMessage):
+    __slots__ = ()
+    type = "audio"
+    _model = (".request_schema", "WhatsappFreeFormMediaAudioMsg")
+
+
+class DocumentMessage(MediaMessage):
+    __slots__ = ()
+    type = "document"
+    _model = (".request_schema", "WhatsappFreeFormMediaDocumentMsg")
+
+
+class StickerMessage(MediaMessage):
+    __slots__ = ()
+    type = "sticker"
+    _model = (".request_schema", "WhatsappFreeFormMediaStickerMsg")
+
+
+class LocationMessage(FreeFormMessage):
+    __slots__ = ("longitude", "latitude", "name", "address")
+    type = "location"
+    _model = (".request_schema", "WhatsappFreeFormLocationMsg")
+
+    def __init__(self, to: str, longitude: str, latitude: str, name: str = None, address: str = None,
+                 context: str = None) -> None:
+        self.to = to
+        self.longitude = longitude
+        self.latitude = latitude
+        self.name = name
+        self.address = address
+        self.context = context
+
+    def to_dict(self):
+        message = self._envelope()
+        location = {}
+        for key in ("longitude", "latitude", "name", "address"):
+            value = getattr(self, key)
+            if value is not None:
+                location[key] = value
+        message["location"] = location
+        return message
+
+
+class ContactsMessage(FreeFormMessage):
+    """
+    Contact cards, given as dicts of their wire form or request_schema.Contact
+    models
+    """
+    __slots__ = ("contacts",)
+    type = "contacts"
+    _model = (".request_schema", "WhatsappFreeFormContactsMsg")
+
+    def __init__(self, to: str, contacts: list) -> None:
+        self.to = to
+        self.contacts = [_dump(contact) for contact in contacts]
+        self.context = None
+
+    def to_dict(self):
+        message = self._envelope()
+        message["contacts"] = self.contacts
+        return message
+
+
+# -------------- Interactive messages --------------
+
+class InteractiveMessage(FreeFormMessage):
+    """
+    Base of the interactive messages. `header` is the text of a text header
+    or the dict of another kind; `body` and `footer` are texts.
+    """
+    __slots__ = ("body", "header", "footer")
+    type = "interactive"
+    interactive_type = None
+
+    def _interactive(self, action):
+        interactive = {}
+        if self.header is not None:
+            header = self.header
+            interactive["header"] = {"type": "text", "text": header} if isinstance(header, str) else header
+        interactive["body"] = {"text": self.body}
+        if self.footer is not None:
+            interactive["footer"] = {"text": self.footer}
+        interactive["type"] = self.interactive_type
+        interactive["action"] = action
+        message = self._envelope()
+        message["interactive"] = interactive
+        return message
+
+
+class ListMessage(InteractiveMessage):
+    """
+    List message opened by the `button` text, with `sections` given as
+    dicts of their wire form or request_schema.Section models
+    """
+    __slots__ = ("button", "sections")
+    interactive_type = "list"
+    _model = (".request_schema", "FreeFormInteractiveListMsg")
+
+    def __init__(self, to: str, body: str, button: str, sections: list, header=None, footer: str = None,
+                 context: str = None) -> None:
+        self.to = to
+        self.body = body
+        self.button = button
+        self.sections = [_dump(section) for section in sections]
+        self.header = header
+        self.footer = footer
+        self.context = context
+
+    def to_dict(self):
+        return self._interactive({"button": self.button, "sections": self.sections})
+
+
+class ButtonMessage(InteractiveMessage):
+    """
+    Reply buttons, given as (id, title) pairs
+    """
+    __slots__ = ("buttons",)
+    interactive_type = "button"
+    _model = (".request_schema", "FreeFormInteractiveReplyButtonMsg")
+
+    def __init__(self, to: str, body: str, buttons: list, header=None, footer: str = None,
+                 context: str = None) -> None:
+        self.to = to
+        self.body = body
+        self.buttons = tuple(buttons)
+        self.header = header
+        self.footer = footer
+        self.context = context
+
+    def to_dict(self):
+        buttons = [{"type": "reply", "reply": {"id": id, "title": title}} for id, title in self.buttons]
+        return self._interactive({"buttons": buttons})
+
+
+class CtaUrlMessage(InteractiveMessage):
+    """
+    Call to action button labelled `display_text` opening `url`
+    """
+    __slots__ = ("display_text", "url")
+    interactive_type = "cta_url"
+    _model = (".request_schema", "FreeFormInteractiveCtaButtonMsg")
+
+    def __init__(self, to: str, body: str, display_text: str, url: str, header=None, footer: str = None,
+                 context: str = None) -> None:
+        self.to = to
+        self.body = body
+        self.display_text = display_text
+        self.url = url
+        self.header = header
+        self.footer = footer
+        self.context = context
+
+    def to_dict(self):
+        action = {"name": "cta_url", "parameters": {"display_text": self.display_text, "url": self.url}}
+        return self._interactive(action)
+
+
+# -------------- Template messages --------------
+
+def _parameter(value):
+    if isinstance(value, str):
+        return {"type": "text", "text": value}
+    return _dump(value)
+
+
+class TemplateMessage(MessageBuilder):
+    """
+    Template message. `header`, `body` and `footer` list the parameters of
+    those components: strings for text parameters, and dicts or
+    schema/template.py parameter models for the others. None leaves the
+    component out.
+    """
+    __slots__ = ("name", "language", "header", "body", "footer", "recipient_type")
+    type = "template"
+    _model = (".schema.template", "TemplateMsg")
+
+    def __init__(self, to: str, name: str, language: str = "en", header: list = None, body: list = None,
+                 footer: list = None, recipient_type: str = "individual") -> None:
+        self.to = to
+        self.name = name
+        self.language = language
+        self.header = header
+        self.body = body
+        self.footer = footer
+        self.recipient_type = recipient_type
+
+    def to_dict(self):
+        components = []
+        for kind in ("header", "body", "footer"):
+            parameters = getattr(self, kind)
+            if parameters is not None:
+                components.append({"type": kind, "parameters": [_parameter(value) for value in parameters]})
+        return {
+            "messaging_product": "whatsapp",
+            "recipient_type": self.recipient_type,
+            "type": "template",
+            "to": self.to,
+            "template": {"name": self.name, "language": {"code": self.language}, "components": components},
+        }
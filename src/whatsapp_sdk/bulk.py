@@ -0,0 +1,174 @@
+"""
+Concurrent fan-out of many sends over a single client's connection pool
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Union
+
+from .error import TemplateValidationError
+from .schema.response import WASuccessResponse
+
+log = logging.getLogger(__name__)
+
+
+class BulkResult(NamedTuple):
+    """
+    Outcome of one recipient of a bulk send. `response` is the processed
+    WASuccessResponse/WAErrorResponse (or LazyResponse), `error` the
+    exception raised while sending, if any.
+    """
+    index: int
+    to: Optional[str]
+    response: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self):
+        if self.error is not None:
+            return False
+        return getattr(self.response, "ok", None) or isinstance(self.response, WASuccessResponse)
+
+
+class BulkSummary:
+    def __init__(self):
+        self.total = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"BulkSummary(total={self.total}, succeeded={self.succeeded}, "
+                f"failed={self.failed}, elapsed={self.elapsed:.3f})")
+
+
+class BulkSend:
+    """
+    Iterator over the results of a bulk send, in completion order.
+
+    Recipients are consumed lazily and at most `workers * 2` sends are queued
+    at any time, so arbitrarily large recipient iterables can be streamed.
+    Totals are available on `summary` once iteration has finished. Breaking
+    out of the iteration (or closing it) cancels the sends still queued.
+
+    A TemplateValidationError is raised from the iteration instead of being
+    reported as a result, and no further recipients are sent to: the
+    template or its parameters are wrong for every recipient alike.
+    """
+
+    def __init__(
+            self,
+            send: Callable[..., Any],
+            recipients: Iterable[Union[str, dict]],
+            workers: int,
+            **common
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self._send = send
+        self._recipients = recipients
+        self._common = common
+        self.workers = workers
+        self.summary = BulkSummary()
+
+    def _kwargs(self, recipient):
+        if isinstance(recipient, dict):
+            return {**self._common, **recipient}
+        return {**self._common, "to": recipient}
+
+    def _tally(self, result):
+        self.summary.total += 1
+        if result.ok:
+            self.summary.succeeded += 1
+        else:
+            self.summary.failed += 1
+        return result
+
+    def _send_one(self, index, recipient):
+        kwargs = self._kwargs(recipient)
+        try:
+            return BulkResult(index, kwargs.get("to"), response=self._send(**kwargs))
+        except TemplateValidationError:
+            raise
+        except Exception as e:
+            log.warning(f"Bulk send to {kwargs.get('to')} failed: {e!r}")
+            return BulkResult(index, kwargs.get("to"), error=e)
+
+    def _collect(self, futures):
+        for future in futures:
+            yield self._tally(future.result())
+
+    def __iter__(self):
+        start = time.perf_counter()
+        window = self.workers * 2
+        pending = set()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whatsapp-bulk")
+        try:
+            for index, recipient in enumerate(self._recipients):
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self._collect(done)
+                pending.add(executor.submit(self._send_one, index, recipient))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._collect(done)
+        finally:
+            # also reached when the consumer stops iterating early: queued
+            # sends are dropped, only those already running finish
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.summary.elapsed = time.perf_counter() - start
+            log.info(f"Bulk send finished: {self.summary}")
+
+
+class AsyncBulkSend(BulkSend):
+    """
+    Asynchronous iterator over the results of a bulk send of coroutine
+    function `send`, in completion order: `async for result in bulk`.
+
+    At most `workers` sends are awaited concurrently, as tasks of the
+    running event loop; recipients are consumed lazily as they finish.
+    TemplateValidationError is raised as in BulkSend, cancelling the sends
+    still in flight.
+    """
+
+    async def _send_one(self, index, recipient):
+        kwargs = self._kwargs(recipient)
+        try:
+            return BulkResult(index, kwargs.get("to"), response=await self._send(**kwargs))
+        except TemplateValidationError:
+            raise
+        except Exception as e:
+            log.warning(f"Bulk send to {kwargs.get('to')} failed: {e!r}")
+            return BulkResult(index, kwargs.get("to"), error=e)
+
+    def __iter__(self):
+        raise TypeError("AsyncBulkSend is iterated with `async for`")
+
+    async def __aiter__(self):
+        start = time.perf_counter()
+        pending = set()
+        try:
+            for index, recipient in enumerate(self._recipients):
+                if len(pending) >= self.workers:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield self._tally(task.result())
+                pending.add(asyncio.ensure_future(self._send_one(index, recipient)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield self._tally(task.result())
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            self.summary.elapsed = time.perf_counter() - start
+            log.info(f"Bulk send finished: {self.summary}")
@@ -0,0 +1,345 @@
+"""
+Template campaigns streamed from large recipient files, with checkpoints so
+an interrupted run resumes where it stopped.
+
+    mapping = TemplateMapping(to="phone", body=["name", "order_id"])
+    campaign = Campaign(client.whatsapp, "order_update", read_csv("export.csv"), mapping,
+                        checkpoint="order_update.ckpt", results="order_update.jsonl", language="en")
+    progress = campaign.run()
+
+Rows go through a generator pipeline: read, map to the arguments of
+Whatsapp.send_template_message, send on the worker pool of
+send_template_bulk, record. Only the sends in flight are held in memory,
+whatever the size of the file.
+"""
+import csv
+import logging
+import os
+import time
+from typing import Callable, Iterable, Iterator, Sequence, Union
+
+from .bulk import AsyncBulkSend
+from .lazy_response import response_error, response_wamid
+from .schema.template import Body, Footer, Header, TextParameter
+from .serialization import decode, encode
+
+log = logging.getLogger(__name__)
+
+
+# -------------- Read --------------
+
+def read_csv(path: str, encoding: str = "utf-8", **reader_kwargs) -> Iterator[dict]:
+    """
+    Rows of a CSV file with a header line, as dicts. `reader_kwargs` go to
+    csv.DictReader (e.g. delimiter=";").
+    """
+    with open(path, newline="", encoding=encoding) as f:
+        yield from csv.DictReader(f, **reader_kwargs)
+
+
+def read_jsonl(path: str, encoding: str = "utf-8") -> Iterator[dict]:
+    """
+    Rows of a JSON Lines file, one object per line. Blank lines are skipped.
+    """
+    with open(path, encoding=encoding) as f:
+        for line in f:
+            if line.strip():
+                yield decode(line)
+
+
+# -------------- Map --------------
+
+class TemplateMapping:
+    """
+    Maps a row to the send_template_message arguments of its recipient.
+
+    `to` and `language` name columns of the row. `header`, `body` and
+    `footer` list the template's parameters in order, each the name of a
+    column holding a text parameter or a callable(row) returning a parameter
+    model of schema/template.py, e.g. a CurrencyParameter. Arguments shared
+    by all rows, such as a fixed language, are given to the Campaign.
+    """
+
+    def __init__(
+            self,
+            to: str = "to",
+            header: Sequence[Union[str, Callable]] = (),
+            body: Sequence[Union[str, Callable]] = (),
+            footer: Sequence[Union[str, Callable]] = (),
+            language: str = None,
+    ) -> None:
+        self.to = to
+        self.header = tuple(header)
+        self.body = tuple(body)
+        self.footer = tuple(footer)
+        self.language = language
+
+    @staticmethod
+    def _parameters(fields, row):
+        return [field(row) if callable(field) else TextParameter(text=str(row[field])) for field in fields]
+
+    def __call__(self, row: dict) -> dict:
+        kwargs = {"to": str(row[self.to])}
+        if self.header:
+            kwargs["header"] = Header(parameters=self._parameters(self.header, row))
+        if self.body:
+            kwargs["body"] = Body(parameters=self._parameters(self.body, row))
+        if self.footer:
+            kwargs["footer"] = Footer(parameters=self._parameters(self.footer, row))
+        if self.language is not None:
+            kwargs["language"] = row[self.language]
+        return kwargs
+
+
+# -------------- Record --------------
+
+class _Completed:
+    """
+    Rows done so far: all rows below `next_row`, and those in `done` above it
+    that finished ahead of slower ones
+    """
+
+    def __init__(self, next_row: int = 0, done: Iterable[int] = ()) -> None:
+        self.next_row = next_row
+        self.done = set(done)
+
+    def __contains__(self, row):
+        return row < self.next_row or row in self.done
+
+    def add(self, row):
+        if row != self.next_row:
+            self.done.add(row)
+            return
+        self.next_row += 1
+        while self.next_row in self.done:
+            self.done.remove(self.next_row)
+            self.next_row += 1
+
+
+class CampaignProgress:
+    """
+    Counts of a campaign run: rows `sent` and `failed` in this run (invalid
+    rows included in the latter) and `skipped` as done by an earlier one.
+    `rate` is the throughput of the whole run, `current_rate` of the last
+    report interval.
+    """
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+        self.current_rate = 0.0
+
+    @property
+    def processed(self):
+        return self.sent + self.failed
+
+    @property
+    def rate(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"CampaignProgress(sent={self.sent}, failed={self.failed}, skipped={self.skipped}, "
+                f"elapsed={self.elapsed:.3f}, rate={self.rate:.1f})")
+
+
+class Campaign:
+    """
+    Sends the template `name` to every row of `rows`, an iterable of dicts
+    such as read_csv() or read_jsonl() return, mapped to the arguments of
+    send_template_message by `mapping` (a TemplateMapping or any
+    callable(row) returning them). `common` holds the arguments shared by
+    all rows.
+
+    Rows are numbered from 0 in the order read. With a `checkpoint` path the
+    rows done are saved to it every `checkpoint_every` results and when the
+    run ends, and a run over the same rows skips them. A checkpoint only
+    lists rows whose outcome was recorded: sends in flight when the process
+    died are sent again on resume, at most `workers * 2` of them plus those
+    finished since the last save.
+
+    With a `results` path, one JSON line per row is appended to it: the row
+    number, recipient, ok, wamid and error. Rows failing to map, or whose
+    number a `normalizer` (recipients.RecipientNormalizer) rejects, are
+    recorded as failed without being sent.
+
+    Progress is logged every `report_interval` seconds and passed to
+    `on_progress`, if given. With a template_registry on the client, a row
+    failing template validation stops the run with TemplateValidationError,
+    leaving that row and those after it to be sent once fixed.
+    """
+
+    def __init__(
+            self,
+            whatsapp,
+            name: str,
+            rows: Iterable[dict],
+            mapping: Callable[[dict], dict] = None,
+            checkpoint: str = None,
+            results: str = None,
+            workers: int = None,
+            normalizer=None,
+            checkpoint_every: int = 1000,
+            report_interval: float = 10.0,
+            on_progress: Callable[[CampaignProgress], None] = None,
+            **common
+    ) -> None:
+        self._whatsapp = whatsapp
+        self.name = name
+        self._rows = rows
+        self.mapping = mapping or TemplateMapping()
+        self.checkpoint = checkpoint
+        self.results = results
+        self.workers = workers
+        self.normalizer = normalizer
+        self.checkpoint_every = checkpoint_every
+        self.report_interval = report_interval
+        self.on_progress = on_progress
+        self._common = common
+        self.progress = CampaignProgress()
+        self._completed = None
+        self._results_file = None
+        self._rows_by_index = {}
+        self._unsaved = 0
+
+    # -------------- Checkpoint --------------
+
+    def _load_checkpoint(self):
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return _Completed()
+        with open(self.checkpoint, "rb") as f:
+            state = decode(f.read())
+        if state.get("name") != self.name:
+            raise ValueError(f"Checkpoint {self.checkpoint} belongs to template {state.get('name')!r}, "
+                             f"not {self.name!r}")
+        log.info(f"Resuming campaign {self.name} at row {state['next_row']}")
+        return _Completed(state["next_row"], state["done"])
+
+    def save_checkpoint(self) -> None:
+        """
+        Write the rows done to the checkpoint file, replacing it atomically
+        """
+        if self._results_file is not None:
+            self._results_file.flush()
+        if self.checkpoint is None or self._completed is None:
+            return
+        state = {"name": self.name, "next_row": self._completed.next_row, "done": sorted(self._completed.done)}
+        temporary = f"{self.checkpoint}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(encode(state))
+        os.replace(temporary, self.checkpoint)
+        self._unsaved = 0
+
+    # -------------- Pipeline --------------
+
+    def _record(self, row, to, response=None, error=None, ok=False):
+        if ok:
+            self.progress.sent += 1
+        else:
+            self.progress.failed += 1
+        if self._results_file is not None:
+            if error is None and not ok:
+                error = response_error(response)
+            self._results_file.write(encode({
+                "row": row,
+                "to": to,
+                "ok": ok,
+                "wamid": response_wamid(response) if ok else None,
+                "error": error if error is None or isinstance(error, str) else repr(error),
+            }) + b"\n")
+        self._completed.add(row)
+        self._unsaved += 1
+        if self._unsaved >= self.checkpoint_every:
+            self.save_checkpoint()
+
+    def _mapped(self, rows_by_index):
+        """
+        Send arguments of the rows still to do. The index of each in the bulk
+        send is mapped to its row number in `rows_by_index`.
+        """
+        index = 0
+        for row, values in enumerate(self._rows):
+            if row in self._completed:
+                self.progress.skipped += 1
+                continue
+            try:
+                kwargs = self.mapping(values)
+                if self.normalizer is not None:
+                    number, reason = self.normalizer.check(kwargs["to"])
+                    if number is None:
+                        self._record(row, kwargs["to"], error=f"invalid recipient: {reason}")
+                        continue
+                    kwargs["to"] = number
+            except Exception as e:
+                log.warning(f"Campaign {self.name} row {row} could not be mapped: {e!r}")
+                self._record(row, None, error=e)
+                continue
+            rows_by_index[index] = row
+            index += 1
+            yield kwargs
+
+    def _report(self, started, last):
+        now = time.perf_counter()
+        at, processed = last
+        self.progress.elapsed = now - started
+        self.progress.current_rate = (self.progress.processed - processed) / (now - at) if now > at else 0.0
+        log.info(f"Campaign {self.name}: {self.progress.sent} sent, {self.progress.failed} failed, "
+                 f"{self.progress.current_rate:.1f} msgs/s")
+        if self.on_progress is not None:
+            self.on_progress(self.progress)
+        return now, self.progress.processed
+
+    def _start(self):
+        self._completed = self._load_checkpoint()
+        if self.results is not None:
+            self._results_file = open(self.results, "ab")
+        return self._whatsapp.send_template_bulk(self._mapped(self._rows_by_index), self.name, self.workers,
+                                                 **self._common)
+
+    def _result(self, result, started, last):
+        self._record(self._rows_by_index.pop(result.index), result.to, result.response, result.error, result.ok)
+        if time.perf_counter() - last[0] >= self.report_interval:
+            return self._report(started, last)
+        return last
+
+    def _finish(self, started, last):
+        self.save_checkpoint()
+        if self._results_file is not None:
+            self._results_file.close()
+            self._results_file = None
+        self._report(started, last)
+
+    def run(self) -> CampaignProgress:
+        """
+        Send to every row not done yet and return the progress of this run
+        """
+        started = time.perf_counter()
+        last = (started, 0)
+        self._rows_by_index = {}
+        try:
+            bulk = self._start()
+            if isinstance(bulk, AsyncBulkSend):
+                raise TypeError("Campaigns of an AsyncWhatsapp are run with `await campaign.run_async()`")
+            for result in bulk:
+                last = self._result(result, started, last)
+        finally:
+            self._finish(started, last)
+        log.info(f"Campaign {self.name} finished: {self.progress}")
+        return self.progress
+
+    async def run_async(self) -> CampaignProgress:
+        """
+        run() for a Campaign of an AsyncWhatsapp, sending on its event loop.
+        Rows are read and results written from the loop's thread.
+        """
+        started = time.perf_counter()
+        last = (started, 0)
+        self._rows_by_index = {}
+        try:
+            async for result in self._start():
+                last = self._result(result, started, last)
+        finally:
+            self._finish(started, last)
+        log.info(f"Campaign {self.name} finished: {self.progress}")
+        return self.progress
@@ -1,15 +1,12 @@
+import json
 import logging
+import sys
+import threading
+import time
 import urllib.parse
-from platform import python_version
 
-from requests import Response
-from requests.adapters import HTTPAdapter
-from requests.sessions import Session
-
-from .. import whatsapp_sdk
+from . import __version__
 from .error import *
-from .whatsapp import Whatsapp
-from .schema.response import WAResponse
 
 log = logging.getLogger(__name__)
 
@@ -19,7 +16,21 @@ except ImportError:
     JSONDecodeError = ValueError
 
 
-class Client:
+def _with_query(url, params):
+    # as requests does with `params`, leaving out None values
+    if params:
+        query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None}, doseq=True)
+        if query:
+            return f"{url}?{query}"
+    return url
+
+
+class BaseClient:
+    """
+    Configuration, headers, URLs and response processing shared by Client
+    and AsyncClient, which only add the transport the requests go through
+    and the (awaitable) methods sending them.
+    """
 
     def __init__(
             self,
@@ -30,8 +41,19 @@ class Client:
             pool_connections=10,
             pool_maxsize=10,
             max_retries=3,
-            **kwargs
+            rate_limiter=None,
+            media_cache=None,
+            status_tracker=None,
+            retry_policy=None,
+            hooks=None,
+            lazy_responses=False,
+            http2=False,
+            idempotency=None,
+            template_registry=None,
     ) -> None:
+        if http2:
+            from .http2 import check_http2_support
+            check_http2_support()
         self._api_token = api_token
         self._version = version
         self._phone_number_id = phone_number_id
@@ -40,22 +62,46 @@ class Client:
 
         self._host = "graph.facebook.com"
 
-        user_agent = f"whatsapp-sdk/{whatsapp_sdk.__version__} python/{python_version()}"
+        user_agent = f"whatsapp-sdk/{__version__} python/{sys.version.split()[0]}"
 
         self.headers = {
             "User-Agent": user_agent,
             "Accept": "application/json",
         }
-        self.whatsapp = Whatsapp(self)
+        self._get_headers = {**self.headers, "Authorization": self._create_bearer_token_string()}
+        self._json_headers = {**self._get_headers, "Content-Type": "application/json"}
+        self._form_headers = {**self._get_headers, "Content-Type": "application/x-www-form-urlencoded"}
+        self._whatsapp = None
 
         self.timeout = timeout
-        self.session = Session()
-        self.adapter = HTTPAdapter(
-            pool_connections=pool_connections,
-            pool_maxsize=pool_maxsize,
-            max_retries=max_retries,
-        )
-        self.session.mount("https://", self.adapter)
+        self.rate_limiter = rate_limiter
+        self.media_cache = media_cache
+        self.status_tracker = status_tracker
+        self.retry_policy = retry_policy
+        self.idempotency = idempotency
+        self.template_registry = template_registry
+        self.hooks = list(hooks or ())
+        self.lazy_responses = lazy_responses
+        self.http2 = http2
+        self.pool_maxsize = pool_maxsize
+        self._pool_connections = pool_connections
+        self._max_retries = max_retries
+        self._messages_url = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    @property
+    def phone_number_id(self):
+        return self._phone_number_id
+
+    @property
+    def version(self):
+        """
+        Graph API version requests are sent to, e.g. "v17.0"
+        """
+        return self._version
 
     def _create_bearer_token_string(self):
         return f"Bearer {self._api_token}"
@@ -66,6 +112,15 @@ class Client:
             return self._host
         else:
             self._host = value
+            self._messages_url = None
+
+    # Gets and sets _scheme attribute, e.g. "http" for a local test server
+    def scheme(self, value=None):
+        if value is None:
+            return self._scheme
+        else:
+            self._scheme = value
+            self._messages_url = None
 
     def _create_request_url(self, host=None, path=None):
         # if host:
@@ -77,32 +132,50 @@ class Client:
         # else:
         #     _path = "/messages"
         # return f"{_host}/{self._version}/{self._phone_number_id}{path}"
+        if host is None and (path is None or path == "/messages"):
+            # the URL of every message send, built once
+            url = self._messages_url
+            if url is None:
+                url = self._messages_url = urllib.parse.urlunparse(
+                    (self._scheme, self._host, f"/{self._version}/{self._phone_number_id}/messages", None, None, None)
+                )
+            return url
         path = path or "/messages"
         url_path = f"/{self._version}/{self._phone_number_id}{path}"
         url_parts = (self._scheme, host or self._host, url_path, None, None, None)
         return urllib.parse.urlunparse(url_parts)
 
+    def _create_graph_url(self, host=None, path=""):
+        # Graph API nodes that are not under the phone number, e.g. /<media_id>
+        url_parts = (self._scheme, host or self._host, f"/{self._version}{path}", None, None, None)
+        return urllib.parse.urlunparse(url_parts)
+
     @staticmethod
-    def process_response(host, response: Response):
+    def process_response(host, response):
         """
         Process the response from the D7 API.
         """
-        log.debug(f"Response headers {repr(response.headers)}")
+        from .schema.response import WAErrorResponse, WASuccessResponse
+
+        debug = log.isEnabledFor(logging.DEBUG)
+        if debug:
+            log.debug(f"Response headers {repr(response.headers)}")
         if response.status_code == 401:
             log.warning(f"Authentication error: {response.status_code} {repr(response.content)}")
-            return WAResponse(**response.json())
+            return WAErrorResponse(**response.json())
             # raise AuthenticationError("Invalid API token")
         elif 200 <= response.status_code < 300:
             # success response
             try:
                 result = response.json()
-                log.debug(f"Successful process response: {result}")
-                return WAResponse(**result)
+                if debug:
+                    log.debug(f"Successful process response: {result}")
+                return WASuccessResponse(**result)
             except JSONDecodeError:
                 pass
         elif 400 <= response.status_code < 500:
             log.warning(f"Client error: {response.status_code} {repr(response.content)}")
-            return WAResponse(**response.json())
+            return WAErrorResponse(**response.json())
             # if response.status_code == 400:
             #     return WAResponse(**response.json())
             #     # raise BadRequest(f"{repr(response.content)}")
@@ -119,53 +192,413 @@ class Client:
             message = f"{response.status_code} response from {host}"
             raise ServerError(message)
 
+    @staticmethod
+    def process_json_response(host, response):
+        """
+        Return the decoded JSON body of a 2xx response, raising for errors.
+        Used by endpoints whose replies are not message send responses.
+        """
+        if 200 <= response.status_code < 300:
+            return response.json()
+        from .retry import error_from_response
+        raise error_from_response(host, response)
+
+
+    def _prepare_post(self, host, path, body_is_json, params, body, recipient, idempotency_key):
+        """
+        The URL, headers and encoded body of a post(), the recipient it is
+        rate limited by and its idempotency key, None when it is not guarded
+        """
+        request_url = self._create_request_url(host=host, path=path)
+        if recipient is None and isinstance(params, dict):
+            recipient = params.get("to")
+        if not body_is_json:
+            headers, data = self._form_headers, urllib.parse.urlencode(params, doseq=True).encode()
+        elif body is not None:
+            headers, data = self._json_headers, body
+        else:
+            from .serialization import encode
+            headers, data = self._json_headers, encode(params)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"POST request sent to {request_url} with {data!r}")
+        key = None
+        if self.idempotency is not None and (recipient is not None or idempotency_key is not None):
+            key = self.idempotency.key(data, idempotency_key)
+        return request_url, headers, data, recipient, key
+
+    def _process_post(self, host, response):
+        if self.retry_policy is not None and response.status_code >= 400:
+            from .retry import error_from_response
+            raise error_from_response(host, response)
+        if self.lazy_responses and response.status_code < 500:
+            from .lazy_response import LazyResponse
+            return LazyResponse.from_response(response)
+        return self.process_response(host, response)
+
+    def _timed_sender(self, msg_type, params, started):
+        """
+        _send_post reporting each attempt to the hooks, built by the
+        transport's _timed_send from begin(request_url, data), which starts
+        the RequestTiming of the next attempt
+        """
+        from .instrumentation import RequestTiming, emit, message_type, payload_size
+
+        msg_type = msg_type or message_type(params)
+        attempts = 0
+
+        def begin(request_url, data):
+            nonlocal attempts, started
+            attempts += 1
+            timing = RequestTiming("POST", request_url, msg_type, payload_size(data), attempts)
+            if started is not None:
+                timing.phases["prepare"] = timing.started - started
+                started = None
+            emit(self.hooks, "on_request", timing)
+            return timing
+
+        return self._timed_send(begin)
+
+    def _timed_result(self, timing, host, response):
+        from .instrumentation import error_code
+
+        timing.status_code = response.status_code
+        if response.status_code >= 400:
+            timing.error_code = error_code(response)
+        return self._process_post(host, response)
+
+    def _timing_failed(self, timing, error):
+        from .instrumentation import emit
+
+        timing.error = error
+        if isinstance(error, GraphAPIError):
+            timing.error_code = error.code
+        timing.phases["total"] = time.perf_counter() - timing.started
+        emit(self.hooks, "on_error", timing)
+
+    def _timing_done(self, timing, received):
+        from .instrumentation import emit
+
+        done = time.perf_counter()
+        timing.phases["process"] = done - received
+        timing.phases["total"] = done - timing.started
+        emit(self.hooks, "on_response", timing)
+
+    def _batch_request(self, operations, host=None):
+        """
+        URL and form encoded body of a batch request of `operations`
+        """
+        request_url = urllib.parse.urlunparse((self._scheme, host or self._host, "/", None, None, None))
+        data = urllib.parse.urlencode({
+            "batch": json.dumps(operations, separators=(",", ":")), "include_headers": "false",
+        }).encode()
+        log.debug(f"Batch of {len(operations)} requests sent to {request_url}")
+        return request_url, data
+
+
+class Client(BaseClient):
+    """
+    Client for the WhatsApp Cloud API.
+
+    A Client is safe to share between threads: the request path only reads
+    the headers built here and the requests Session, whose urllib3
+    connection pool hands out one connection per concurrent request. Size
+    pool_maxsize to the number of threads sending through the instance.
+    Changing `headers` or the token after construction is not picked up.
+
+    Requests go through a transport.Transport, named by `transport` (one of
+    transport.TRANSPORTS, "requests" by default) or given as an instance.
+    The transport and the `whatsapp` helper are created on first use, so
+    constructing a Client does not import the HTTP stack or the message
+    schemas.
+
+    `hooks` are instrumentation.RequestHook objects notified of the timing
+    and outcome of every message send attempt, see instrumentation.py.
+
+    With lazy_responses, sends return a lazy_response.LazyResponse keeping
+    the raw body, whose wamid and error code are extracted without building
+    the response models.
+
+    With http2, the default transport is the HTTP/2 one: concurrent sends
+    are multiplexed over up to pool_maxsize HTTP/2 connections rather than
+    needing a connection each.
+
+    With an idempotency.DuplicateGuard as `idempotency`, a message send
+    whose key was sent before raises error.DuplicateMessageError instead of
+    reaching the recipient a second time.
+
+    With a template_registry.TemplateRegistry as `template_registry`,
+    template messages are checked against the account's templates before
+    they are sent.
+    """
+
+    def __init__(
+            self,
+            api_token,
+            phone_number_id,
+            version="v17.0",
+            timeout=30,
+            pool_connections=10,
+            pool_maxsize=10,
+            max_retries=3,
+            rate_limiter=None,
+            media_cache=None,
+            status_tracker=None,
+            retry_policy=None,
+            hooks=None,
+            lazy_responses=False,
+            http2=False,
+            transport=None,
+            idempotency=None,
+            template_registry=None,
+            **kwargs
+    ) -> None:
+        super().__init__(
+            api_token, phone_number_id, version=version, timeout=timeout, pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize, max_retries=max_retries, rate_limiter=rate_limiter,
+            media_cache=media_cache, status_tracker=status_tracker, retry_policy=retry_policy, hooks=hooks,
+            lazy_responses=lazy_responses, http2=http2, idempotency=idempotency,
+            template_registry=template_registry,
+        )
+        if transport is None:
+            transport = "http2" if http2 else "requests"
+        self._transport_name = transport if isinstance(transport, str) else None
+        self._transport = None if isinstance(transport, str) else transport
+        self._transport_lock = threading.Lock()
+
+    @property
+    def transport(self):
+        transport = self._transport
+        if transport is None:
+            with self._transport_lock:
+                if self._transport is None:
+                    self._transport = self._create_transport()
+                transport = self._transport
+        return transport
+
+    @transport.setter
+    def transport(self, value):
+        self._transport = value
+
+    def _create_transport(self):
+        from .transport import create_transport
+        return create_transport(
+            self._transport_name,
+            pool_connections=self._pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self._max_retries,
+            timeout=self.timeout,
+            # plain http (a local test server) has no TLS handshake to negotiate HTTP/2 in
+            prior_knowledge=self._scheme == "http",
+        )
+
+    @property
+    def session(self):
+        """
+        The requests Session (or http2.HTTP2Session) of the transport, None
+        for transports without one. Setting a requests Session sends
+        through it.
+        """
+        return getattr(self.transport, "session", None)
+
+    @session.setter
+    def session(self, value):
+        from .transport import RequestsTransport
+        self._transport = RequestsTransport(value)
+
+    @property
+    def adapter(self):
+        return getattr(self.transport, "adapter", None)
+
+    @property
+    def whatsapp(self):
+        if self._whatsapp is None:
+            from .whatsapp import Whatsapp
+            self._whatsapp = Whatsapp(self)
+        return self._whatsapp
+
+    def close(self):
+        """
+        Close the transport's connections and write the sent keys the
+        idempotency guard holds in memory. The guard itself stays open, as it
+        may be shared with other clients.
+        """
+        if self.idempotency is not None:
+            self.idempotency.flush()
+        if self._transport is not None:
+            self._transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def get(self, host=None, path="messages", params=None):
         """
-        Send HTTP POST request to the D7 API.
+        Send HTTP GET request to meta whatsapp cloud api
         """
         # "https://graph.facebook.com/v17.0/140464972481061/messages"
-        request_url = f"{self._host}/{self._version}/{self._phone_number_id}/{path}"
-        self._request_headers = self.headers
-        self._request_headers['Authorization'] = self._create_bearer_token_string()
-        log.debug(f"GET request sent to {request_url} with headers {self._request_headers} and params {params}")
+        request_url = self._create_request_url(host=host, path=f"/{path.lstrip('/')}")
+        log.debug(f"GET request sent to {request_url} with params {params}")
         return self.process_response(host,
-                                     self.session.get(
-                                         request_url,
-                                         headers=self._request_headers,
-                                         params=params,
+                                     self.transport.request(
+                                         "GET",
+                                         _with_query(request_url, params),
+                                         self._get_headers,
                                          timeout=self.timeout
                                      )
                                      )
 
-    def post(self, host=None, path=None, body_is_json=True, params={}):
+    def get_json(self, path, params=None, host=None):
+        """
+        Send HTTP GET request for a Graph API node outside the phone number,
+        e.g. "/<media_id>", and return the decoded JSON response
+        """
+        request_url = self._create_graph_url(host=host, path=path)
+        log.debug(f"GET request sent to {request_url} with params {params}")
+        return self.process_json_response(host,
+                                          self.transport.request(
+                                              "GET",
+                                              _with_query(request_url, params),
+                                              self._get_headers,
+                                              timeout=self.timeout
+                                          )
+                                          )
+
+    def stream(self, url, headers=None):
+        """
+        Send an authenticated HTTP GET request to an absolute URL, such as a
+        media download URL, without reading the body. Use the returned
+        response as a context manager and read it with iter_content().
+        """
+        log.debug(f"Streaming GET request sent to {url}")
+        return self.transport.request(
+            "GET",
+            url,
+            {**self._get_headers, **headers} if headers else self._get_headers,
+            timeout=self.timeout,
+            stream=True
+        )
+
+    def post(self, host=None, path=None, body_is_json=True, params={}, body=None, recipient=None,
+             msg_type=None, started=None, idempotency_key=None):
         """
         Send HTTP POST  request to meta whatsapp cloud api
+
+        `body` takes an already encoded JSON request body (see serialization.py)
+        which is sent as is instead of `params`; `recipient` then names the
+        message's `to` for rate limiting.
+
+        With a retry_policy, error responses raise the typed exceptions of
+        error.py instead of returning a WAErrorResponse, and retryable ones
+        are sent again according to the policy.
+
+        With an idempotency guard, sends to a `recipient` are keyed by
+        `idempotency_key`, or by their body when it is None, and raise
+        DuplicateMessageError when the key was sent before.
+
+        `msg_type` and `started`, the time.perf_counter() at which the caller
+        started building the request, are only reported to the hooks.
         """
-        request_url = self._create_request_url(host=host, path=path)
-        print(f"Request URL: {request_url}")
-        self._request_headers = self.headers
-        self._request_headers['Authorization'] = self._create_bearer_token_string()
-        if body_is_json:
-            self._request_headers['Content-Type'] = 'application/json'
-            log.debug(f"POST request sent to {request_url} with headers {self._request_headers} and params {params}")
-            return self.process_response(host,
-                                         self.session.post(
-                                             request_url,
-                                             headers=self._request_headers,
-                                             json=params,
-                                             timeout=self.timeout
-                                         )
-                                         )
+        request_url, headers, data, recipient, key = self._prepare_post(
+            host, path, body_is_json, params, body, recipient, idempotency_key
+        )
+        if self.hooks:
+            send = self._timed_sender(msg_type, params, started)
+        else:
+            send = self._send_post
+        args = (host, request_url, headers, data, recipient)
+        if self.retry_policy is not None:
+            send, args = self.retry_policy.call, (send, *args)
+        if key is not None:
+            result = self.idempotency.call(key, recipient, send, *args)
         else:
-            self._request_headers['Content-Type'] = 'application/x-www-form-urlencoded'
-            return self.process_response(host,
-                                         self.session.post(
-                                             request_url,
-                                             headers=self._request_headers,
-                                             data=params,
-                                             timeout=self.timeout
-                                         )
-                                         )
+            result = send(*args)
+        if self.status_tracker is not None:
+            self.status_tracker.record_response(result)
+        return result
+
+    def _send_post(self, host, request_url, headers, data, recipient):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self._phone_number_id, recipient)
+        response = self.transport.request("POST", request_url, headers, data, self.timeout)
+        return self._process_post(host, response)
+
+    def _timed_send(self, begin):
+        from .instrumentation import take_connect_time
+
+        def send(host, request_url, headers, data, recipient):
+            timing = begin(request_url, data)
+            try:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(self._phone_number_id, recipient)
+                sent = time.perf_counter()
+                take_connect_time()
+                response = self.transport.request("POST", request_url, headers, data, self.timeout)
+                received = time.perf_counter()
+                connect = take_connect_time()
+                # requests' elapsed runs until the response headers were parsed
+                elapsed = response.elapsed.total_seconds()
+                timing.phases["rate_limit"] = sent - timing.started
+                timing.phases["connect"] = connect
+                timing.phases["server"] = max(0.0, elapsed - connect)
+                timing.phases["read"] = max(0.0, received - sent - elapsed)
+                result = self._timed_result(timing, host, response)
+            except Exception as e:
+                self._timing_failed(timing, e)
+                raise
+            self._timing_done(timing, received)
+            return result
+
+        return send
+
+    def post_batch(self, operations, recipients=None, host=None):
+        """
+        Send up to 50 Graph API operations (see batch.encode_operation) as one
+        batch request and return the list of per-operation replies, each a
+        {"code", "body"} dict or None when it was not processed.
+
+        `recipients` of the batched messages are paced by the rate limiter.
+        Failures of the batch request as a whole raise as with a retry_policy.
+        """
+        if self.rate_limiter is not None:
+            for recipient in recipients or ():
+                self.rate_limiter.acquire(self._phone_number_id, recipient)
+        request_url, data = self._batch_request(operations, host)
+
+        def send():
+            response = self.transport.request("POST", request_url, self._form_headers, data, self.timeout)
+            return self.process_json_response(host, response)
+
+        if self.retry_policy is None:
+            return send()
+        return self.retry_policy.call(send)
+
+    def batcher(self, max_size=50, max_delay=0.05, workers=1):
+        """
+        A batch.Batcher coalescing sends through this client into batch
+        requests of up to `max_size` sends, waiting at most `max_delay`
+        seconds for a batch to fill
+        """
+        from .batch import Batcher
+        return Batcher(self, max_size, max_delay, workers)
+
+    def post_stream(self, data, content_type, host=None, path=None):
+        """
+        Send HTTP POST request with a streamed body, such as a MultipartUpload,
+        and return the decoded JSON response
+        """
+        request_url = self._create_request_url(host=host, path=path)
+        log.debug(f"Streaming POST request sent to {request_url} with {content_type}")
+        return self.process_json_response(host,
+                                          self.transport.request(
+                                              "POST",
+                                              request_url,
+                                              {**self._get_headers, "Content-Type": content_type},
+                                              data,
+                                              self.timeout
+                                          )
+                                          )
 
     def put(self, path, data=None):
         ...
@@ -0,0 +1,432 @@
+"""
+Routing of sends across many business phone numbers
+"""
+import logging
+import math
+import threading
+import time
+import zlib
+from typing import Iterable
+
+from .bulk import AsyncBulkSend, BulkSend
+from .error import RateLimitError
+from .ratelimit import THROUGHPUT_TIERS
+from .retry import THROTTLING_CODES
+
+log = logging.getLogger(__name__)
+
+STRATEGIES = ("least_loaded", "sticky", "weighted")
+
+# Too many messages to one recipient, which does not make the number worth avoiding
+PAIR_RATE_LIMIT_CODE = 131056
+
+# Throttling that concerns the whole number
+NUMBER_THROTTLING_CODES = THROTTLING_CODES - {PAIR_RATE_LIMIT_CODE}
+
+
+class PoolMember:
+    """
+    One client of a ClientPool and its routing state
+    """
+    __slots__ = (
+        "client", "weight", "inflight", "dispatched", "cooldown_until", "sent", "failed", "throttled", "_current",
+    )
+
+    def __init__(self, client, weight: float = 1.0) -> None:
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        self.client = client
+        self.weight = float(weight)
+        self.inflight = 0
+        self.dispatched = 0
+        self.cooldown_until = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.throttled = 0
+        self._current = 0.0
+
+    @property
+    def phone_number_id(self):
+        return self.client.phone_number_id
+
+    def __repr__(self):
+        return f"<PoolMember {self.phone_number_id} weight={self.weight:g} inflight={self.inflight}>"
+
+
+def _weight(tier):
+    if isinstance(tier, str):
+        try:
+            return THROUGHPUT_TIERS[tier]
+        except KeyError:
+            raise ValueError(f"Unknown throughput tier {tier!r}, expected one of {list(THROUGHPUT_TIERS)}")
+    return tier
+
+
+def _failed(result):
+    ok = getattr(result, "ok", None)
+    if ok is not None:
+        return not ok
+    return getattr(result, "error", None) is not None
+
+
+def _throttle_delay(result, error, cooldown):
+    """
+    Seconds to keep traffic away from a number after this send outcome,
+    None if it was not throttled
+    """
+    if error is not None:
+        if isinstance(error, RateLimitError) and error.code != PAIR_RATE_LIMIT_CODE:
+            return error.retry_after or cooldown
+        return None
+    if hasattr(result, "ok"):
+        # a LazyResponse, whose `error` would validate the whole body
+        code = result.error_code
+    else:
+        code = getattr(getattr(result, "error", None), "code", None)
+    return cooldown if code in NUMBER_THROTTLING_CODES else None
+
+
+class ClientPool:
+    """
+    Sends through many Clients, one per (token, phone_number_id), choosing a
+    number for every message by `strategy`:
+
+    - least_loaded: the number with the fewest sends in flight for its
+      weight, then with the fewest sends so far
+    - sticky: the same number for a recipient every time (weighted rendezvous
+      hashing), so conversations stay on one number; recipients only move
+      when their number is cooling down or leaves the pool
+    - weighted: smooth weighted round-robin over the weights
+
+    Weights default to each number's messaging tier (see
+    ratelimit.THROUGHPUT_TIERS). A number answering with a throttling error
+    is avoided for the response's Retry-After, or `cooldown` seconds, and
+    with `failover` the message is sent again once through another number.
+    When every number is cooling down the one that recovers first is used.
+
+    The send_* methods take the arguments of their Whatsapp counterparts,
+    with the recipient given as `to`.
+    """
+
+    def __init__(
+            self,
+            members: Iterable = (),
+            strategy: str = "least_loaded",
+            cooldown: float = 30.0,
+            failover: bool = True,
+    ) -> None:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {list(STRATEGIES)}")
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.failover = failover
+        self.members = []
+        self._lock = threading.Lock()
+        for member in members:
+            self.add(member)
+
+    @classmethod
+    def from_numbers(
+            cls,
+            numbers: Iterable,
+            strategy: str = "least_loaded",
+            cooldown: float = 30.0,
+            failover: bool = True,
+            share_session: bool = True,
+            **client_kwargs
+    ) -> "ClientPool":
+        """
+        Build a pool from (api_token, phone_number_id) or (api_token,
+        phone_number_id, tier) tuples, where tier is a THROUGHPUT_TIERS key or
+        a weight. `client_kwargs` are passed to every client.
+
+        With `share_session` all clients send through one transport (and
+        connection pool) of pool_maxsize connections per number, instead of
+        one each. close() the pool to close it.
+        """
+        numbers = list(numbers)
+        pool = cls(strategy=strategy, cooldown=cooldown, failover=failover)
+        shared = None
+        for number in numbers:
+            api_token, phone_number_id, *tier = number
+            kwargs = client_kwargs
+            if share_session and shared is None:
+                kwargs = {**client_kwargs, "pool_maxsize": client_kwargs.get("pool_maxsize", 10) * len(numbers)}
+            client = cls._client_class()(api_token, phone_number_id, **kwargs)
+            if share_session:
+                if shared is None:
+                    shared = cls._connections(client)
+                else:
+                    cls._share_connections(client, shared)
+            pool.add(client, tier[0] if tier else "standard")
+        return pool
+
+    @classmethod
+    def _client_class(cls):
+        from .client import Client
+        return Client
+
+    @staticmethod
+    def _connections(client):
+        return client.transport
+
+    @staticmethod
+    def _share_connections(client, transport):
+        client.transport = transport
+
+    @staticmethod
+    def _open_connections(client):
+        # the transport of a client if it was created, without creating it
+        return getattr(client, "_transport", None)
+
+    def add(self, client, tier="standard") -> PoolMember:
+        """
+        Add a client, or a PoolMember, weighted by `tier`
+        """
+        member = client if isinstance(client, PoolMember) else PoolMember(client, _weight(tier))
+        with self._lock:
+            self.members.append(member)
+        return member
+
+    def remove(self, phone_number_id) -> None:
+        with self._lock:
+            self.members = [m for m in self.members if m.phone_number_id != phone_number_id]
+
+    def __len__(self):
+        return len(self.members)
+
+    # -------------- Routing --------------
+
+    def _select(self, to, exclude):
+        now = time.monotonic()
+        candidates = [m for m in self.members if m not in exclude]
+        if not candidates:
+            return None
+        available = [m for m in candidates if m.cooldown_until <= now]
+        if not available:
+            return min(candidates, key=lambda m: m.cooldown_until)
+        if self.strategy == "sticky" and to:
+            return max(available, key=lambda m: self._rendezvous_score(to, m))
+        if self.strategy == "weighted":
+            total = 0.0
+            best = None
+            for member in available:
+                member._current += member.weight
+                total += member.weight
+                if best is None or member._current > best._current:
+                    best = member
+            best._current -= total
+            return best
+        return min(available, key=lambda m: ((m.inflight + 1) / m.weight, m.dispatched / m.weight))
+
+    @staticmethod
+    def _rendezvous_score(to, member):
+        digest = zlib.crc32(f"{to}:{member.phone_number_id}".encode())
+        # uniform in (0, 1), mapped so that higher weights win proportionally more keys
+        return -member.weight / math.log((digest + 1) / 4294967297)
+
+    def _acquire(self, to, exclude=()):
+        with self._lock:
+            member = self._select(to, exclude)
+            if member is None:
+                raise ValueError("ClientPool has no clients")
+            member.inflight += 1
+            member.dispatched += 1
+        return member
+
+    def _release(self, member, result, error):
+        """
+        Record a send outcome, returning whether it should be sent again
+        through another number
+        """
+        delay = _throttle_delay(result, error, self.cooldown)
+        with self._lock:
+            member.inflight -= 1
+            if delay is not None:
+                member.throttled += 1
+                member.cooldown_until = max(member.cooldown_until, time.monotonic() + delay)
+            elif error is not None or _failed(result):
+                member.failed += 1
+            else:
+                member.sent += 1
+        if delay is not None:
+            log.warning(f"Number {member.phone_number_id} throttled, avoiding it for {delay:.1f}s")
+        return delay is not None and self.failover
+
+    def pick(self, to: str = None):
+        """
+        The client the next message to `to` would be sent through
+        """
+        with self._lock:
+            member = self._select(to, ())
+        if member is None:
+            raise ValueError("ClientPool has no clients")
+        return member.client
+
+    # -------------- Sending --------------
+
+    def send(self, method: str, to: str, *args, **kwargs):
+        """
+        Call the Whatsapp `method` (e.g. "send_template_message") for `to`
+        through the number chosen for it
+        """
+        tried = []
+        while True:
+            member = self._acquire(to, tried)
+            result = error = None
+            try:
+                result = getattr(member.client.whatsapp, method)(*args, to=to, **kwargs)
+            except Exception as e:
+                error = e
+            retry = self._release(member, result, error)
+            tried.append(member)
+            if not retry or len(tried) >= len(self.members):
+                if error is not None:
+                    raise error
+                return result
+
+    def send_free_form_message(self, to: str, **kwargs):
+        return self.send("send_free_form_message", to, **kwargs)
+
+    def send_template_message(self, name: str, to: str, **kwargs):
+        return self.send("send_template_message", to, name, **kwargs)
+
+    def send_compiled_template(self, template, to: str, **kwargs):
+        return self.send("send_compiled_template", to, template, **kwargs)
+
+    def _bulk_workers(self, workers):
+        if workers:
+            return workers
+        # clients sharing a connection pool count it once, at its largest size
+        sizes = {}
+        for member in self.members:
+            connections = self._open_connections(member.client)
+            key = id(member.client) if connections is None else id(connections)
+            sizes[key] = max(sizes.get(key, 0), getattr(member.client, "pool_maxsize", None) or 10)
+        return sum(sizes.values()) or 10
+
+    def send_template_bulk(self, recipients, name: str, workers: int = None, **kwargs):
+        """
+        Send a template message to many recipients across the pool, see
+        Whatsapp.send_template_bulk. `workers` defaults to the total size of
+        the clients' connection pools, a shared one counting once.
+        """
+        return BulkSend(self.send_template_message, recipients, self._bulk_workers(workers), name=name, **kwargs)
+
+    def send_free_form_bulk(self, recipients, workers: int = None, **kwargs):
+        return BulkSend(self.send_free_form_message, recipients, self._bulk_workers(workers), **kwargs)
+
+    def close(self):
+        """
+        Close the clients' transports, a shared one once, and write the sent
+        keys their idempotency guards hold in memory
+        """
+        closed = set()
+        for member in self.members:
+            client = member.client
+            if getattr(client, "idempotency", None) is not None:
+                client.idempotency.flush()
+            transport = self._open_connections(client)
+            if transport is not None and id(transport) not in closed:
+                closed.add(id(transport))
+                transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # -------------- Inspection --------------
+
+    def stats(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "phone_number_id": m.phone_number_id,
+                "weight": m.weight,
+                "inflight": m.inflight,
+                "sent": m.sent,
+                "failed": m.failed,
+                "throttled": m.throttled,
+                "cooling_down_for": max(0.0, m.cooldown_until - now),
+            } for m in self.members]
+
+
+class AsyncClientPool(ClientPool):
+    """
+    ClientPool of AsyncClients, whose send methods are awaited. Bulk sends
+    return an AsyncBulkSend, iterated with `async for`.
+    """
+
+    @classmethod
+    def _client_class(cls):
+        from .async_client import AsyncClient
+        return AsyncClient
+
+    @staticmethod
+    def _connections(client):
+        return client.session
+
+    @staticmethod
+    def _share_connections(client, session):
+        client.session = session
+
+    @staticmethod
+    def _open_connections(client):
+        return getattr(client, "_session", None)
+
+    async def send(self, method: str, to: str, *args, **kwargs):
+        tried = []
+        while True:
+            member = self._acquire(to, tried)
+            result = error = None
+            try:
+                result = await getattr(member.client.whatsapp, method)(*args, to=to, **kwargs)
+            except Exception as e:
+                error = e
+            retry = self._release(member, result, error)
+            tried.append(member)
+            if not retry or len(tried) >= len(self.members):
+                if error is not None:
+                    raise error
+                return result
+
+    async def send_free_form_message(self, to: str, **kwargs):
+        return await self.send("send_free_form_message", to, **kwargs)
+
+    async def send_template_message(self, name: str, to: str, **kwargs):
+        return await self.send("send_template_message", to, name, **kwargs)
+
+    async def send_compiled_template(self, template, to: str, **kwargs):
+        return await self.send("send_compiled_template", to, template, **kwargs)
+
+    def send_template_bulk(self, recipients, name: str, workers: int = None, **kwargs):
+        return AsyncBulkSend(self.send_template_message, recipients, self._bulk_workers(workers), name=name,
+                             **kwargs)
+
+    def send_free_form_bulk(self, recipients, workers: int = None, **kwargs):
+        return AsyncBulkSend(self.send_free_form_message, recipients, self._bulk_workers(workers), **kwargs)
+
+    def close(self):
+        raise TypeError("AsyncClientPool is closed with `await pool.aclose()`")
+
+    def __enter__(self):
+        raise TypeError("AsyncClientPool is used with `async with`")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        closed = set()
+        for member in self.members:
+            client = member.client
+            if getattr(client, "idempotency", None) is not None:
+                client.idempotency.flush()
+            session = self._open_connections(client)
+            if session is not None and id(session) not in closed:
+                closed.add(id(session))
+                await session.aclose()
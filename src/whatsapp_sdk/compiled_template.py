@@ -0,0 +1,96 @@
+"""
+Template messages validated once and rendered per recipient by slot filling
+"""
+from typing import Optional, Sequence
+
+from .enums import ParameterType
+from .schema.template import Body, Footer, Header, Language, Template, TemplateMsg
+
+
+class CompiledTemplate:
+    """
+    A template message whose structure is validated once through the pydantic
+    models of schema/template.py and kept as a ready-to-send request body.
+
+    Every text parameter of the header, body and footer is a slot. render()
+    fills the slots of one recipient and returns the request body without
+    building or dumping any model; components without new values, and the
+    rest of the body, are shared between rendered messages and must not be
+    mutated.
+
+    >>> welcome = CompiledTemplate("welcome", body=Body(parameters=[TextParameter(text="name")]))
+    >>> welcome.render("919876543210", body=["Alice"])
+    """
+
+    def __init__(
+            self,
+            name: str,
+            language: str = "en",
+            header: Optional[Header] = None,
+            body: Optional[Body] = None,
+            footer: Optional[Footer] = None,
+            recipient_type: str = "individual",
+    ) -> None:
+        components = [component for component in (header, body, footer) if component is not None]
+        template = Template(name=name, components=components, language=Language(code=language))
+        msg = TemplateMsg(to="", template=template, recipient_type=recipient_type)
+        self.name = name
+        self.language = language
+        self._prototype = msg.model_dump(mode="json")
+        self._template = self._prototype["template"]
+        self._components = self._template["components"]
+        # component type -> (index in components, indexes of its text parameters)
+        self._slots = {}
+        for index, component in enumerate(self._components):
+            if component["type"] in self._slots:
+                raise ValueError(f"Template {name!r} has more than one {component['type']} component")
+            self._slots[component["type"]] = (index, [
+                position for position, parameter in enumerate(component["parameters"])
+                if parameter["type"] == ParameterType.TEXT.value
+            ])
+
+    def slot_count(self, component_type: str) -> int:
+        if component_type not in self._slots:
+            return 0
+        return len(self._slots[component_type][1])
+
+    def _fill(self, components, component_type, values):
+        try:
+            index, slots = self._slots[component_type]
+        except KeyError:
+            raise ValueError(f"Template {self.name!r} has no {component_type} component")
+        if len(values) != len(slots):
+            raise ValueError(
+                f"Template {self.name!r} {component_type} expects {len(slots)} text parameters, got {len(values)}"
+            )
+        component = components[index]
+        parameters = list(component["parameters"])
+        for slot, value in zip(slots, values):
+            if not isinstance(value, str):
+                raise TypeError(f"Text parameter values must be str, got {type(value).__name__}")
+            parameters[slot] = {"type": "text", "text": value}
+        components[index] = {**component, "parameters": parameters}
+
+    def render(
+            self,
+            to: str,
+            header: Optional[Sequence[str]] = None,
+            body: Optional[Sequence[str]] = None,
+            footer: Optional[Sequence[str]] = None,
+    ) -> dict:
+        """
+        Build the request body for one recipient. `header`, `body` and
+        `footer` hold the values of that component's text slots in order;
+        None keeps the values the template was compiled with.
+        """
+        template = self._template
+        if header is not None or body is not None or footer is not None:
+            components = list(self._components)
+            if header is not None:
+                self._fill(components, "header", header)
+            if body is not None:
+                self._fill(components, "body", body)
+            if footer is not None:
+                self._fill(components, "footer", footer)
+            template = {**template, "components": components}
+        return {**self._prototype, "to": to, "template": template}
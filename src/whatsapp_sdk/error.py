@@ -1,27 +1,80 @@
-class AuthenticationError(Exception):
-    def __init__(self, message):
+class GraphAPIError(Exception):
+    """
+    Base of the errors reported by the Graph API. `code` is the Graph error
+    code, `retry_after` the server requested delay in seconds, if any.
+    """
+
+    def __init__(self, message, code=None, status_code=None, retry_after=None, details=None):
         super().__init__(message)
+        self.code = code
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.details = details
+
+
+class SDKError(Exception):
+    """
+    Base of the errors raised by the SDK itself rather than reported by the
+    Graph API
+    """
+
+
+class AuthenticationError(GraphAPIError):
+    pass
+
+
+class ClientError(GraphAPIError):
+    pass
+
+
+class ValidationError(GraphAPIError):
+    pass
+
+
+class InsufficientCreditError(ClientError):
+    pass
 
 
-class ClientError(Exception):
+class NotFoundError(ClientError):
     pass
 
 
-class ValidationError(Exception):
+class ServerError(GraphAPIError):
     pass
 
 
-class InsufficientCreditError(Exception):
+class BadRequest(ClientError):
     pass
 
 
-class NotFoundError(Exception):
+class RateLimitError(ClientError):
     pass
 
 
-class ServerError(Exception):
+class RecipientError(ClientError):
     pass
 
 
-class BadRequest(Exception):
-    pass
\ No newline at end of file
+class TemplateError(ClientError):
+    pass
+
+
+class ChecksumMismatchError(SDKError):
+    """
+    Raised when downloaded media does not match the sha256 the API gave for
+    it, see media.py
+    """
+
+
+class TemplateValidationError(TemplateError):
+    """
+    Raised before sending a template message the API would refuse, see
+    template_registry.py
+    """
+
+
+class DuplicateMessageError(ClientError):
+    """
+    Raised instead of sending a message whose idempotency key was already
+    sent, see idempotency.py
+    """
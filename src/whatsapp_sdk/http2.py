@@ -0,0 +1,174 @@
+"""
+HTTP/2 for the synchronous Client.
+
+requests only speaks HTTP/1.1, so every concurrent send needs a connection
+(and a TLS handshake) of its own. HTTP2Session puts httpx with HTTP/2
+enabled behind the small part of the requests.Session interface the Client
+uses, so many sends from many threads share a few multiplexed connections.
+It needs httpx and h2: `pip install httpx[http2]`.
+
+httpcore's synchronous HTTP/2 connection allocates stream IDs without a
+lock, so threads sharing a connection can send them out of order, which
+the server answers by closing the connection. The session therefore runs
+an httpx.AsyncClient on an event loop of its own thread, and calling
+threads wait for their request there.
+"""
+import asyncio
+import logging
+import threading
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+log = logging.getLogger(__name__)
+
+
+def check_http2_support():
+    if httpx is None or h2 is None:
+        raise ImportError("HTTP/2 requires httpx and h2, install them with `pip install httpx[http2]`")
+
+
+async def _aiterate(chunks):
+    # chunks of a streamed body (e.g. media.MultipartUpload) read from a file:
+    # read in a worker thread so the session's loop keeps serving other streams
+    iterator = iter(chunks)
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class HTTP2Response:
+    """
+    httpx.Response with the requests.Response methods the SDK relies on
+    """
+    __slots__ = ("_response", "_session")
+
+    def __init__(self, response, session) -> None:
+        self._response = response
+        self._session = session
+
+    @property
+    def status_code(self):
+        return self._response.status_code
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    @property
+    def content(self):
+        if not self._response.is_stream_consumed:
+            return self._session.run(self._response.aread())
+        return self._response.content
+
+    @property
+    def elapsed(self):
+        return self._response.elapsed
+
+    @property
+    def http_version(self):
+        return self._response.http_version
+
+    def json(self):
+        self.content
+        return self._response.json()
+
+    def iter_content(self, chunk_size=None):
+        chunks = self._response.aiter_bytes(chunk_size)
+        while True:
+            try:
+                yield self._session.run(chunks.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def close(self):
+        if not self._response.is_closed:
+            self._session.run(self._response.aclose())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class HTTP2Session:
+    """
+    The get()/post() of a requests.Session over httpx speaking HTTP/2.
+
+    `max_connections` bounds the connections per host; each carries as many
+    concurrent requests as the server allows (100 streams for the Graph API)
+    before another one is opened. With `prior_knowledge` HTTP/2 is spoken
+    without negotiating it, as needed for plain http:// test servers where
+    there is no TLS handshake to negotiate it in.
+    """
+
+    def __init__(self, max_connections=10, max_keepalive_connections=None, retries=0, timeout=30,
+                 prior_knowledge=False) -> None:
+        check_http2_support()
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="whatsapp-http2", daemon=True)
+        self._thread.start()
+        self.client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(
+                http1=not prior_knowledge,
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                ),
+                retries=retries,
+            ),
+            timeout=timeout,
+        )
+
+    def run(self, coroutine):
+        """
+        Run `coroutine` on the session's event loop and return its result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def request(self, method, url, params=None, data=None, json=None, headers=None, timeout=None, stream=False):
+        kwargs = {"params": params, "json": json, "headers": headers}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        # requests takes form fields, bytes and iterables of chunks as data,
+        # httpx form fields as data and the others as content
+        if isinstance(data, dict):
+            kwargs["data"] = data
+        elif isinstance(data, (bytes, str)):
+            kwargs["content"] = data
+        elif data is not None:
+            kwargs["content"] = _aiterate(data)
+        request = self.client.build_request(method, url, **kwargs)
+        return HTTP2Response(self.run(self.client.send(request, stream=stream)), self)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self.run(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,375 @@
+"""
+Client side suppression of duplicate message sends.
+
+The Cloud API takes no idempotency key: a message whose send timed out after
+the server had accepted it reaches the customer twice when sent again. Given
+to a Client as `idempotency=`, a DuplicateGuard gives every message send a
+key, by default a hash of the guard's `campaign` and the request body, which
+holds the recipient and the template or message, and raises
+DuplicateMessageError instead of sending a key that was sent before.
+
+    guard = DuplicateGuard(capacity=20_000_000, store=SQLiteKeyStore("sent.db"), campaign="spring-sale")
+    client = Client(token, phone_number_id, idempotency=guard)
+
+Keys are first looked up in a BloomFilter held in memory. Only its
+positives, the duplicates and a small share of false positives, are
+looked up in the exact KeyStore behind it, so suppression costs a hash and
+a few bit tests per send rather than a store lookup.
+"""
+import atexit
+import hashlib
+import logging
+import math
+import sqlite3
+import threading
+from typing import Iterable, Iterator
+
+from .error import DuplicateMessageError, GraphAPIError, ServerError
+
+log = logging.getLogger(__name__)
+
+KEY_SIZE = 16
+
+# What DuplicateGuard does with the key of a send that may or may not have
+# gone out: keep it, suppressing a resend, or release it, allowing one
+UNCERTAIN_POLICIES = ("keep", "release")
+
+
+def message_key(body: bytes, campaign: str = None) -> bytes:
+    """
+    Idempotency key of an encoded message body within `campaign`
+    """
+    digest = hashlib.blake2b(body, digest_size=KEY_SIZE)
+    if campaign is not None:
+        digest.update(b"\0")
+        digest.update(campaign.encode())
+    return digest.digest()
+
+
+def explicit_key(key: str) -> bytes:
+    """
+    Idempotency key of a key given by the caller
+    """
+    return hashlib.blake2b(key.encode(), digest_size=KEY_SIZE, person=b"whatsapp-key").digest()
+
+
+# -------------- Bloom filter --------------
+
+class BloomFilter:
+    """
+    Bloom filter over keys of KEY_SIZE random bytes, such as message_key()
+    returns. Sized for `capacity` keys at a false positive rate of
+    `error_rate`: about 1.8 MB per million keys at 0.001. The rate grows
+    beyond capacity, never the memory.
+
+    The bit positions of a key are derived from its two 64-bit halves by
+    double hashing, so no further hashing is done per position.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, key: bytes) -> bool:
+        """
+        Add `key`, returning whether it may have been added before
+        """
+        bits, size = self._bits, self.size
+        first = int.from_bytes(key[:8], "little")
+        second = int.from_bytes(key[8:16], "little") | 1
+        present = True
+        for i in range(self.hashes):
+            position = (first + i * second) % size
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+    def __contains__(self, key: bytes) -> bool:
+        # most keys looked up were never added and miss on the first positions
+        bits, size = self._bits, self.size
+        first = int.from_bytes(key[:8], "little")
+        second = int.from_bytes(key[8:16], "little") | 1
+        for i in range(self.hashes):
+            position = (first + i * second) % size
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+    def __len__(self):
+        """
+        Keys added that were not reported as present, about the number of
+        distinct keys while under capacity
+        """
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+# -------------- Exact stores --------------
+
+class KeyStore:
+    """
+    Exact set of the keys sent. Only called by a DuplicateGuard, under its
+    lock.
+    """
+
+    def add(self, key: bytes) -> None:
+        raise NotImplementedError
+
+    def __contains__(self, key: bytes) -> bool:
+        raise NotImplementedError
+
+    def __iter__(self) -> Iterator[bytes]:
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryKeyStore(KeyStore):
+    """
+    Keys in a Python set, around 100 bytes each. Lost when the process exits.
+    """
+
+    def __init__(self, keys: Iterable[bytes] = ()) -> None:
+        self._keys = set(keys)
+
+    def add(self, key):
+        self._keys.add(key)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class SQLiteKeyStore(KeyStore):
+    """
+    Keys in a SQLite table on disk, for tens of millions of keys kept across
+    restarts. By default every key is written when added, so a crash right
+    after a send does not forget it. In WAL mode with synchronous=NORMAL
+    that costs tens of microseconds per key, small beside the send.
+
+    With a `batch_size` over 1, keys are written in transactions of that
+    size and looked up in memory until then: faster, but a crash forgets up
+    to `batch_size` keys sent last. Pending keys are written on flush(),
+    close() and at interpreter exit.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sent_keys (key BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._pending = set()
+        if batch_size > 1:
+            atexit.register(self.flush)
+
+    def add(self, key):
+        self._pending.add(key)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending or self._conn is None:
+            return
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO sent_keys (key) VALUES (?)", [(k,) for k in self._pending])
+        self._pending.clear()
+
+    def __contains__(self, key):
+        if key in self._pending:
+            return True
+        return self._conn.execute("SELECT 1 FROM sent_keys WHERE key = ?", (key,)).fetchone() is not None
+
+    def __iter__(self):
+        self.flush()
+        for (key,) in self._conn.execute("SELECT key FROM sent_keys"):
+            yield key
+
+    def __len__(self):
+        self.flush()
+        return self._conn.execute("SELECT COUNT(*) FROM sent_keys").fetchone()[0]
+
+    def close(self):
+        if self._conn is None:
+            return
+        self.flush()
+        if self.batch_size > 1:
+            atexit.unregister(self.flush)
+        self._conn.close()
+        self._conn = None
+
+
+# -------------- Guard --------------
+
+def _rejected(result):
+    # whether the API answered the send with an error
+    ok = getattr(result, "ok", None)
+    if ok is not None:
+        return not ok
+    from .schema.response import WAErrorResponse
+    return isinstance(result, WAErrorResponse)
+
+
+def _not_sent(error):
+    """
+    Whether a send failing with `error` certainly did not go out: the API
+    refused it (4xx client, validation and throttling errors). Server
+    errors, transient Graph codes, timeouts and connection errors leave it
+    uncertain.
+    """
+    if not isinstance(error, GraphAPIError) or isinstance(error, ServerError):
+        return False
+    return (error.status_code or 0) < 500
+
+
+class DuplicateGuard:
+    """
+    Refuses to send a message key twice, see the module docstring.
+
+    A key is taken when its send starts, so concurrent sends of the same
+    message are caught too. It is kept once the send succeeded. When the API
+    refused the send (a 4xx client, validation or throttling error) the key
+    is dropped and the message can be sent again. Other failures (5xx and
+    transient server errors, timeouts, connection errors) leave it
+    uncertain whether the message went out: `uncertain`, one of
+    UNCERTAIN_POLICIES, keeps their key by default, or releases it to allow
+    resending at the risk of a duplicate.
+
+    `capacity` is the number of keys the Bloom filter is sized for. Keys
+    already in `store` when the guard is created are loaded into it.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001, store: KeyStore = None,
+                 campaign: str = None, uncertain: str = "keep") -> None:
+        if uncertain not in UNCERTAIN_POLICIES:
+            raise ValueError(f"Unknown uncertain policy {uncertain!r}, expected one of {list(UNCERTAIN_POLICIES)}")
+        self.uncertain = uncertain
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.store = store if store is not None else MemoryKeyStore()
+        self.campaign = campaign
+        self.suppressed = 0
+        self._inflight = set()
+        self._lock = threading.Lock()
+        for key in self.store:
+            self.bloom.add(key)
+        if len(self.bloom) > capacity:
+            log.warning(f"DuplicateGuard loaded {len(self.bloom)} keys, over its capacity of {capacity}")
+
+    def key(self, body: bytes, idempotency_key: str = None) -> bytes:
+        if idempotency_key is not None:
+            return explicit_key(idempotency_key)
+        return message_key(body, self.campaign)
+
+    def seen(self, key: bytes) -> bool:
+        """
+        Whether `key` was sent or is being sent
+        """
+        with self._lock:
+            return key in self._inflight or (key in self.bloom and key in self.store)
+
+    def claim(self, key: bytes, recipient: str = None) -> None:
+        """
+        Take `key` for a send, raising DuplicateMessageError if it is taken
+        """
+        with self._lock:
+            if key in self._inflight or (key in self.bloom and key in self.store):
+                self.suppressed += 1
+                raise DuplicateMessageError(f"Message to {recipient} was already sent", details=key.hex())
+            self._inflight.add(key)
+
+    def commit(self, key: bytes) -> None:
+        with self._lock:
+            self._inflight.discard(key)
+            self.bloom.add(key)
+            self.store.add(key)
+
+    def release(self, key: bytes) -> None:
+        with self._lock:
+            self._inflight.discard(key)
+
+    def settle_uncertain(self, key: bytes) -> None:
+        """
+        Keep or drop the key of a send that may or may not have gone out, by
+        the `uncertain` policy
+        """
+        if self.uncertain == "release":
+            self.release(key)
+        else:
+            self.commit(key)
+
+    def settle(self, key: bytes, result=None, error: BaseException = None) -> None:
+        """
+        Keep or drop a claimed key by the outcome of its send: the result,
+        or the exception it raised
+        """
+        if error is None:
+            if not _rejected(result):
+                self.commit(key)
+                return
+            # an error response returned rather than raised, classified alike
+            from .retry import error_from_result
+            error = error_from_result(None, result)
+        if _not_sent(error):
+            self.release(key)
+        else:
+            self.settle_uncertain(key)
+
+    def call(self, key, recipient, func, *args, **kwargs):
+        """
+        Claim `key`, call `func` and keep or drop the key by its outcome
+        """
+        self.claim(key, recipient)
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.settle(key, error=e)
+            raise
+        self.settle(key, result)
+        return result
+
+    async def call_async(self, key, recipient, func, *args, **kwargs):
+        self.claim(key, recipient)
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            self.settle(key, error=e)
+            raise
+        self.settle(key, result)
+        return result
+
+    def flush(self) -> None:
+        """
+        Write the keys the store holds in memory, see SQLiteKeyStore
+        """
+        with self._lock:
+            self.store.flush()
+
+    def close(self):
+        with self._lock:
+            self.store.close()
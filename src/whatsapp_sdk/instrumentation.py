@@ -0,0 +1,354 @@
+"""
+Request timing hooks, an in-process latency histogram collector and
+optional Prometheus / OpenTelemetry exporters.
+
+Register hooks with Client(hooks=[...]) or client.add_hook(). Every HTTP
+attempt of a message send is reported as a RequestTiming with its phases
+in seconds:
+
+- prepare: building and encoding the request body, before the first attempt
+- rate_limit: waiting for the client's rate limiter
+- connect: DNS, TCP and TLS when a new connection was opened, 0 otherwise
+- server: from sending the request to receiving the response headers
+- read: reading the response body
+- process: parsing the response
+- total: the whole attempt
+
+With no hooks registered the client skips all of this.
+"""
+import logging
+import math
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+PHASES = ("prepare", "rate_limit", "connect", "server", "read", "process", "total")
+
+
+class RequestTiming:
+    """
+    One HTTP attempt as seen by the hooks. `status_code` is None when no
+    response was received and `error_code` holds the Graph error code of
+    error responses.
+    """
+    __slots__ = (
+        "method", "url", "msg_type", "payload_size", "attempt",
+        "status_code", "error_code", "error", "phases", "started",
+    )
+
+    def __init__(self, method, url, msg_type=None, payload_size=0, attempt=1):
+        self.method = method
+        self.url = url
+        self.msg_type = msg_type
+        self.payload_size = payload_size
+        self.attempt = attempt
+        self.status_code = None
+        self.error_code = None
+        self.error = None
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    def __repr__(self):
+        phases = ", ".join(f"{name}={value * 1000:.2f}ms" for name, value in self.phases.items())
+        return f"<RequestTiming {self.msg_type} {self.status_code} {phases}>"
+
+
+class RequestHook:
+    """
+    Base class of client hooks, override the events of interest. Hooks run on
+    the sending thread (or event loop) and must not block.
+    """
+
+    def on_request(self, timing: RequestTiming) -> None:
+        pass
+
+    def on_response(self, timing: RequestTiming) -> None:
+        pass
+
+    def on_error(self, timing: RequestTiming) -> None:
+        pass
+
+
+def payload_size(payload) -> int:
+    """
+    Size in bytes of an encoded request body, 0 for bodies still to be encoded.
+    Takes the body or the keyword arguments of an httpx request.
+    """
+    data = payload.get("data", payload.get("content")) if isinstance(payload, dict) else payload
+    return len(data) if isinstance(data, (bytes, bytearray, str)) else 0
+
+
+def message_type(params):
+    """
+    The `type` of a request model or dict, as a plain string
+    """
+    value = params.get("type") if isinstance(params, dict) else getattr(params, "type", None)
+    return getattr(value, "value", value)
+
+
+def error_code(response):
+    try:
+        return (response.json().get("error") or {}).get("code")
+    except ValueError:
+        return None
+
+
+# -------------- Connection timing --------------
+
+# The timed urllib3 connections filling this are in timed_http.py, apart so
+# that the AsyncClient's imports of this module leave requests and urllib3 out
+
+_connect_time = threading.local()
+
+
+def take_connect_time() -> float:
+    """
+    Seconds spent opening connections on this thread since the last call
+    """
+    value = getattr(_connect_time, "value", 0.0)
+    _connect_time.value = 0.0
+    return value
+
+
+def add_connect_time(seconds: float) -> None:
+    _connect_time.value = getattr(_connect_time, "value", 0.0) + seconds
+
+
+class TraceMarks:
+    """
+    httpcore `trace` extension recording when each connection and HTTP event
+    happened, the AsyncClient counterpart of the timed connections.
+    """
+    __slots__ = ("marks",)
+
+    def __init__(self):
+        self.marks = {}
+
+    async def __call__(self, event, info):
+        # "connection.connect_tcp.started" -> "connect_tcp.started"
+        self.marks[event.partition(".")[2]] = time.perf_counter()
+
+    def span(self, start, end=None) -> float:
+        """
+        Seconds from the `start` event to the `end` event, or from
+        "<start>.started" to "<start>.complete"; 0 if either did not happen
+        """
+        if end is None:
+            start, end = f"{start}.started", f"{start}.complete"
+        started, ended = self.marks.get(start), self.marks.get(end)
+        return ended - started if started is not None and ended is not None else 0.0
+
+
+# -------------- Hook dispatch --------------
+
+def emit(hooks, event, timing):
+    for hook in hooks:
+        try:
+            getattr(hook, event)(timing)
+        except Exception:
+            # a broken hook must not fail the send
+            log.exception(f"Hook {hook!r} failed on {event}")
+
+
+# -------------- Histograms --------------
+
+# Log-spaced buckets, 8 per doubling (~9% relative error) from 10µs to ~168s
+_BUCKETS_PER_DOUBLING = 8
+_MIN_VALUE = 1e-5
+_BUCKET_COUNT = _BUCKETS_PER_DOUBLING * 24
+
+
+class Histogram:
+    """
+    Fixed-size log-bucketed histogram of durations in seconds. Quantiles are
+    reported as the geometric middle of their bucket.
+    """
+    __slots__ = ("counts", "count", "sum", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKET_COUNT
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        if value <= _MIN_VALUE:
+            index = 0
+        else:
+            index = min(_BUCKET_COUNT - 1, int(math.log2(value / _MIN_VALUE) * _BUCKETS_PER_DOUBLING))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if index == 0:
+                    # everything up to 10µs, zero durations included
+                    return self.min
+                value = _MIN_VALUE * 2 ** ((index + 0.5) / _BUCKETS_PER_DOUBLING)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class HistogramCollector(RequestHook):
+    """
+    Collects phase latencies per message type in memory, plus counts of
+    response statuses and Graph error codes.
+
+    summary() returns {msg_type: {phase: {count, mean, p50, p95, p99, max}}}.
+    """
+
+    def __init__(self, phases=PHASES) -> None:
+        self.phases = frozenset(phases)
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self.statuses = {}
+        self.error_codes = {}
+        self.payload_bytes = 0
+
+    def _record(self, timing):
+        with self._lock:
+            by_phase = self._histograms.get(timing.msg_type)
+            if by_phase is None:
+                by_phase = self._histograms[timing.msg_type] = {}
+            for phase, value in timing.phases.items():
+                if phase in self.phases:
+                    histogram = by_phase.get(phase)
+                    if histogram is None:
+                        histogram = by_phase[phase] = Histogram()
+                    histogram.add(value)
+            self.statuses[timing.status_code] = self.statuses.get(timing.status_code, 0) + 1
+            if timing.error_code is not None:
+                self.error_codes[timing.error_code] = self.error_codes.get(timing.error_code, 0) + 1
+            self.payload_bytes += timing.payload_size
+
+    on_response = _record
+    on_error = _record
+
+    def histogram(self, msg_type, phase="total") -> Histogram:
+        return self._histograms.get(msg_type, {}).get(phase) or Histogram()
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                msg_type: {
+                    phase: histogram.summary()
+                    for phase, histogram in sorted(by_phase.items(), key=lambda item: PHASES.index(item[0]))
+                }
+                for msg_type, by_phase in self._histograms.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self.statuses.clear()
+            self.error_codes.clear()
+            self.payload_bytes = 0
+
+
+# -------------- Exporters --------------
+
+# Seconds, suited to request phases from sub-millisecond parsing to slow sends
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class PrometheusExporter(RequestHook):
+    """
+    Exports request phases, outcomes and payload sizes as prometheus_client
+    metrics, registered on `registry` (the default registry if None).
+    """
+
+    def __init__(self, registry=None, namespace="whatsapp", buckets=DEFAULT_LATENCY_BUCKETS) -> None:
+        # imported here, not with the module: clients import it for every send
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError("PrometheusExporter requires prometheus_client, "
+                              "install it with `pip install prometheus-client`") from None
+        kwargs = {"namespace": namespace}
+        if registry is not None:
+            kwargs["registry"] = registry
+        self.duration = prometheus_client.Histogram(
+            "request_phase_seconds", "Duration of WhatsApp API request phases",
+            ["msg_type", "phase"], buckets=buckets, **kwargs
+        )
+        self.requests = prometheus_client.Counter(
+            "requests_total", "WhatsApp API requests by outcome",
+            ["msg_type", "status", "error_code"], **kwargs
+        )
+        self.payload = prometheus_client.Counter(
+            "request_payload_bytes_total", "Bytes of WhatsApp API request bodies", ["msg_type"], **kwargs
+        )
+
+    def _record(self, timing):
+        msg_type = timing.msg_type or ""
+        for phase, value in timing.phases.items():
+            self.duration.labels(msg_type, phase).observe(value)
+        self.requests.labels(
+            msg_type, str(timing.status_code or ""), str(timing.error_code or "")
+        ).inc()
+        self.payload.labels(msg_type).inc(timing.payload_size)
+
+    on_response = _record
+    on_error = _record
+
+
+class OpenTelemetryExporter(RequestHook):
+    """
+    Records request phases and outcomes with an OpenTelemetry meter, the
+    global meter provider's if `meter` is None.
+    """
+
+    def __init__(self, meter=None, prefix="whatsapp") -> None:
+        try:
+            from opentelemetry import metrics as otel_metrics
+        except ImportError:
+            raise ImportError("OpenTelemetryExporter requires opentelemetry-api, "
+                              "install it with `pip install opentelemetry-api`") from None
+        meter = meter or otel_metrics.get_meter("whatsapp_sdk")
+        self.duration = meter.create_histogram(
+            f"{prefix}.request.phase.duration", unit="s", description="Duration of WhatsApp API request phases"
+        )
+        self.requests = meter.create_counter(
+            f"{prefix}.requests", description="WhatsApp API requests by outcome"
+        )
+        self.payload = meter.create_counter(
+            f"{prefix}.request.payload", unit="By", description="Bytes of WhatsApp API request bodies"
+        )
+
+    def _record(self, timing):
+        msg_type = timing.msg_type or ""
+        for phase, value in timing.phases.items():
+            self.duration.record(value, {"msg_type": msg_type, "phase": phase})
+        attributes = {"msg_type": msg_type, "status": timing.status_code or 0}
+        if timing.error_code is not None:
+            attributes["error_code"] = timing.error_code
+        self.requests.add(1, attributes)
+        self.payload.add(timing.payload_size, {"msg_type": msg_type})
+
+    on_response = _record
+    on_error = _record
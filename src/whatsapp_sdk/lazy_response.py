@@ -0,0 +1,125 @@
+"""
+Send responses kept as raw bytes until their content is needed
+"""
+import re
+
+from .serialization import decode
+
+# The Cloud API answers sends with
+# {"messaging_product":"whatsapp","contacts":[...],"messages":[{"id":"wamid...",...}]}
+_WAMID = re.compile(rb'"messages"\s*:\s*\[\s*\{[^{}]*?"id"\s*:\s*"([^"\\]*)"')
+_ERROR_CODE = re.compile(rb'"error"\s*:\s*\{[^{}]*?"code"\s*:\s*(-?\d+)')
+
+
+def response_wamid(response):
+    """
+    wamid of a send response, a LazyResponse or WASuccessResponse, None if
+    it has none. A LazyResponse is never validated for it.
+    """
+    if isinstance(response, LazyResponse):
+        return response.wamid
+    messages = getattr(response, "messages", None)
+    return messages[0].id if messages else None
+
+
+def response_error(response):
+    """
+    What to report of a send response that has no wamid: the `error` of a
+    WAErrorResponse, or the response itself. A LazyResponse stands for its
+    error, as its repr holds the status and error code.
+    """
+    if isinstance(response, LazyResponse):
+        return response
+    return getattr(response, "error", None) or response
+
+
+class LazyResponse:
+    """
+    Response of a message send holding the status code and the raw body.
+
+    `wamid` and `error_code` are extracted from the body with a regular
+    expression, falling back to decoding the JSON when the body is laid out
+    differently. model() validates the full WASuccessResponse/WAErrorResponse
+    straight from the bytes on first call; the `messages`, `contacts` and
+    `error` attributes of those models are available here too and build it.
+    """
+    __slots__ = ("status_code", "content", "headers", "_json", "_model")
+
+    def __init__(self, status_code: int, content: bytes, headers=None) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self._json = None
+        self._model = None
+
+    @classmethod
+    def from_response(cls, response) -> "LazyResponse":
+        return cls(response.status_code, response.content, response.headers)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 300
+
+    def json(self):
+        if self._json is None:
+            self._json = decode(self.content)
+        return self._json
+
+    @property
+    def wamid(self):
+        """
+        ID of the sent message, None for error responses
+        """
+        if not self.ok:
+            return None
+        match = _WAMID.search(self.content)
+        if match is not None:
+            return match.group(1).decode()
+        try:
+            messages = self.json().get("messages")
+        except ValueError:
+            return None
+        return messages[0].get("id") if messages else None
+
+    @property
+    def error_code(self):
+        """
+        Graph error code of an error response
+        """
+        if self.ok:
+            return None
+        match = _ERROR_CODE.search(self.content)
+        if match is not None:
+            return int(match.group(1))
+        try:
+            return (self.json().get("error") or {}).get("code")
+        except ValueError:
+            return None
+
+    def model(self):
+        """
+        The WASuccessResponse or WAErrorResponse of the body
+        """
+        if self._model is None:
+            from .schema.response import WAErrorResponse, WASuccessResponse
+
+            model = WASuccessResponse if self.ok else WAErrorResponse
+            self._model = model.model_validate_json(self.content)
+        return self._model
+
+    @property
+    def messages(self):
+        return getattr(self.model(), "messages", None)
+
+    @property
+    def contacts(self):
+        return getattr(self.model(), "contacts", None)
+
+    @property
+    def error(self):
+        return getattr(self.model(), "error", None)
+
+    def __repr__(self):
+        if self.ok:
+            return f"<LazyResponse {self.status_code} wamid={self.wamid}>"
+        return f"<LazyResponse {self.status_code} error_code={self.error_code}>"
@@ -0,0 +1,403 @@
+"""
+Media upload and download: streamed multipart bodies, a content-hash cache
+of media IDs and chunked, optionally parallel ranged downloads
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .error import ChecksumMismatchError
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Size of one range request when downloading with several workers
+DOWNLOAD_PART_SIZE = 8 * 1024 * 1024
+
+# Uploaded media is kept by Meta for 30 days, stop reusing an ID a day early
+DEFAULT_MEDIA_TTL = 29 * 24 * 60 * 60
+
+
+class _BufferReader:
+    """
+    Reader over bytes, bytearray, memoryview or mmap without copying the buffer
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else self._position + size
+        chunk = self._view[self._position:end]
+        self._position += len(chunk)
+        return bytes(chunk)
+
+
+class MediaSource:
+    """
+    A file to upload, given as a path, a binary file object positioned at the
+    start of the content, or an in-memory / memory-mapped buffer.
+    """
+
+    def __init__(self, file, filename: str = None) -> None:
+        self._owned = False
+        if isinstance(file, (str, os.PathLike)):
+            self.filename = filename or os.path.basename(file)
+            self._file = open(file, "rb")
+            self._owned = True
+        elif isinstance(file, (bytes, bytearray, memoryview)) or not hasattr(file, "read"):
+            self.filename = filename or "file"
+            self._file = _BufferReader(file)
+            self.size = len(self._file._view)
+            self._start = 0
+            return
+        else:
+            self.filename = filename or os.path.basename(getattr(file, "name", "file"))
+            self._file = file
+        self._start = self._file.tell()
+        self._file.seek(0, os.SEEK_END)
+        self.size = self._file.tell() - self._start
+        self._file.seek(self._start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+
+    def rewind(self):
+        if isinstance(self._file, _BufferReader):
+            self._file._position = 0
+        else:
+            self._file.seek(self._start)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def sha256(self) -> str:
+        """
+        Hex digest of the content, computed in chunks; leaves the source rewound.
+        """
+        if isinstance(self._file, _BufferReader):
+            return hashlib.sha256(self._file._view).hexdigest()
+        self.rewind()
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: self._file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+        self.rewind()
+        return digest.hexdigest()
+
+
+class MultipartUpload:
+    """
+    multipart/form-data body holding plain form fields and one file part,
+    read lazily from a MediaSource so the file is never held in memory.
+
+    The length is known upfront, so the body is sent with a Content-Length
+    rather than chunked transfer encoding.
+    """
+
+    def __init__(self, source: MediaSource, mime_type: str, fields: dict, chunk_size: int = CHUNK_SIZE) -> None:
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self.chunk_size = chunk_size
+        head = "".join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            for name, value in fields.items()
+        )
+        head += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{source.filename}"\r\n'
+            f"Content-Type: {mime_type}\r\n\r\n"
+        )
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        head = head.encode()
+        self._source = source
+        self._parts = [io.BytesIO(head), source, io.BytesIO(tail)]
+        self._length = len(head) + source.size + len(tail)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._source.close()
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b"".join(part.read() for part in self._parts)
+        chunks = []
+        while size > 0 and self._parts:
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def __iter__(self):
+        return iter(lambda: self.read(self.chunk_size), b"")
+
+
+class MediaCache:
+    """
+    Persistent map from (content sha256, phone_number_id) to an uploaded
+    media ID, backed by SQLite. Entries expire `ttl` seconds after upload.
+    """
+
+    def __init__(self, path: str = ":memory:", ttl: float = DEFAULT_MEDIA_TTL) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS media ("
+            " digest TEXT NOT NULL,"
+            " phone_number_id TEXT NOT NULL,"
+            " media_id TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (digest, phone_number_id))"
+        )
+
+    def get(self, digest: str, phone_number_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT media_id FROM media WHERE digest = ? AND phone_number_id = ? AND expires_at > ?",
+                (digest, str(phone_number_id), time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, digest: str, phone_number_id: str, media_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media (digest, phone_number_id, media_id, expires_at) VALUES (?, ?, ?, ?)",
+                (digest, str(phone_number_id), media_id, time.time() + self.ttl),
+            )
+
+    def purge(self) -> int:
+        """
+        Delete expired entries, returning how many were removed.
+        """
+        with self._lock:
+            return self._conn.execute("DELETE FROM media WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def close(self):
+        self._conn.close()
+
+
+def prepare_upload(client, file, mime_type: str, filename: str = None, use_cache: bool = True):
+    """
+    Open `file` and look it up in the client's media cache.
+
+    :return: (media_id, None, None) on a cache hit, otherwise (None, MultipartUpload, digest)
+    """
+    source = MediaSource(file, filename)
+    cache = getattr(client, "media_cache", None) if use_cache else None
+    digest = None
+    if cache is not None:
+        digest = source.sha256()
+        media_id = cache.get(digest, client.phone_number_id)
+        if media_id is not None:
+            log.debug(f"Media cache hit for {source.filename}: {media_id}")
+            source.close()
+            return media_id, None, None
+    fields = {"messaging_product": "whatsapp", "type": mime_type}
+    return None, MultipartUpload(source, mime_type, fields), digest
+
+
+def finish_upload(client, digest: str, result: dict) -> str:
+    """
+    Extract the media ID from an upload response and cache it under `digest`.
+    """
+    media_id = result["id"]
+    cache = getattr(client, "media_cache", None)
+    if digest is not None and cache is not None:
+        cache.put(digest, client.phone_number_id, media_id)
+    return media_id
+
+
+class _RangeNotSupported(Exception):
+    pass
+
+
+def _is_path(dest):
+    return isinstance(dest, (str, os.PathLike))
+
+
+def _part_ranges(size, part_size):
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+def _create_file(path, size):
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _verify(info, digest):
+    expected = info.get("sha256")
+    if expected and digest != expected:
+        raise ChecksumMismatchError(f"Media {info.get('id')} sha256 mismatch: expected {expected}, got {digest}")
+
+
+def _check_status(client, response):
+    if not 200 <= response.status_code < 300:
+        client.process_json_response(client.host(), response)
+
+
+def _download_stream(client, url, writer, chunk_size):
+    digest = hashlib.sha256()
+    with client.stream(url) as response:
+        _check_status(client, response)
+        for chunk in response.iter_content(chunk_size):
+            digest.update(chunk)
+            writer.write(chunk)
+    return digest.hexdigest()
+
+
+def _download_part(client, url, path, start, end, chunk_size):
+    with client.stream(url, {"Range": f"bytes={start}-{end}"}) as response:
+        _check_status(client, response)
+        if response.status_code != 206:
+            raise _RangeNotSupported()
+        with open(path, "r+b") as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size):
+                f.write(chunk)
+
+
+def download_media(client, media_id, dest, chunk_size=CHUNK_SIZE, workers=1, part_size=DOWNLOAD_PART_SIZE,
+                   verify=True) -> dict:
+    """
+    Resolve `media_id` to its download URL and stream the file to `dest`, a
+    path or an object with a write() method. Memory use is bounded by
+    `chunk_size` per worker whatever the file size.
+
+    With `workers` > 1, a path destination and a file larger than
+    `part_size`, the file is fetched as parallel HTTP range requests written
+    in place; servers that ignore ranges fall back to a single stream.
+
+    :return: the media metadata (url, mime_type, sha256, file_size, id)
+    """
+    info = client.get_json(f"/{media_id}")
+    url = info["url"]
+    size = int(info.get("file_size") or 0)
+    if workers > 1 and _is_path(dest) and size > part_size:
+        _create_file(dest, size)
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whatsapp-media") as executor:
+                futures = [
+                    executor.submit(_download_part, client, url, dest, start, end, chunk_size)
+                    for start, end in _part_ranges(size, part_size)
+                ]
+                for future in futures:
+                    future.result()
+            if verify:
+                _verify(info, _file_sha256(dest))
+            return info
+        except _RangeNotSupported:
+            log.debug(f"Range requests not supported for media {media_id}, downloading as a single stream")
+    if _is_path(dest):
+        with open(dest, "wb") as writer:
+            digest = _download_stream(client, url, writer, chunk_size)
+    else:
+        digest = _download_stream(client, url, dest, chunk_size)
+    if verify:
+        _verify(info, digest)
+    return info
+
+
+async def _check_status_async(client, response):
+    if not 200 <= response.status_code < 300:
+        await response.aread()
+        client.process_json_response(client.host(), response)
+
+
+def _write_chunk(writer, digest, chunk):
+    if digest is not None:
+        digest.update(chunk)
+    writer.write(chunk)
+
+
+async def _download_stream_async(client, url, writer, chunk_size):
+    digest = hashlib.sha256()
+    async with client.stream(url) as response:
+        await _check_status_async(client, response)
+        async for chunk in response.aiter_bytes(chunk_size):
+            # hashing and writing a chunk blocks, keep it off the loop
+            await asyncio.to_thread(_write_chunk, writer, digest, chunk)
+    return digest.hexdigest()
+
+
+async def _download_part_async(client, url, path, start, end, chunk_size, semaphore):
+    async with semaphore:
+        async with client.stream(url, {"Range": f"bytes={start}-{end}"}) as response:
+            await _check_status_async(client, response)
+            if response.status_code != 206:
+                raise _RangeNotSupported()
+            f = await asyncio.to_thread(open, path, "r+b")
+            try:
+                await asyncio.to_thread(f.seek, start)
+                async for chunk in response.aiter_bytes(chunk_size):
+                    await asyncio.to_thread(_write_chunk, f, None, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+
+
+async def download_media_async(client, media_id, dest, chunk_size=CHUNK_SIZE, workers=1,
+                               part_size=DOWNLOAD_PART_SIZE, verify=True) -> dict:
+    """
+    download_media for an AsyncClient; `workers` bounds the number of range
+    requests in flight. File writes and hashing run in worker threads
+    (asyncio.to_thread), so the event loop keeps serving other tasks.
+    """
+    info = await client.get_json(f"/{media_id}")
+    url = info["url"]
+    size = int(info.get("file_size") or 0)
+    if workers > 1 and _is_path(dest) and size > part_size:
+        await asyncio.to_thread(_create_file, dest, size)
+        semaphore = asyncio.Semaphore(workers)
+        try:
+            await asyncio.gather(*(
+                _download_part_async(client, url, dest, start, end, chunk_size, semaphore)
+                for start, end in _part_ranges(size, part_size)
+            ))
+            if verify:
+                _verify(info, await asyncio.to_thread(_file_sha256, dest))
+            return info
+        except _RangeNotSupported:
+            log.debug(f"Range requests not supported for media {media_id}, downloading as a single stream")
+    if _is_path(dest):
+        writer = await asyncio.to_thread(open, dest, "wb")
+        try:
+            digest = await _download_stream_async(client, url, writer, chunk_size)
+        finally:
+            await asyncio.to_thread(writer.close)
+    else:
+        digest = await _download_stream_async(client, url, dest, chunk_size)
+    if verify:
+        _verify(info, digest)
+    return info
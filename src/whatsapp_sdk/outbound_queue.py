@@ -0,0 +1,355 @@
+"""
+Durable outbound message queue backed by SQLite, drained by a worker pool
+"""
+import logging
+import queue
+import random
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+from .builders import MessageBuilder
+from .error import GraphAPIError
+from .lazy_response import response_wamid
+from .retry import error_from_result, is_retryable
+from .serialization import encode, encode_model
+
+log = logging.getLogger(__name__)
+
+PENDING = 0
+INFLIGHT = 1
+SENT = 2
+FAILED = 3
+# Was being sent when the process stopped, it may or may not have gone out
+UNKNOWN = 4
+
+STATE_NAMES = {PENDING: "pending", INFLIGHT: "inflight", SENT: "sent", FAILED: "failed", UNKNOWN: "unknown"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbound (
+    id INTEGER PRIMARY KEY,
+    dedupe_key TEXT UNIQUE,
+    path TEXT NOT NULL,
+    recipient TEXT,
+    body BLOB NOT NULL,
+    state INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    wamid TEXT,
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbound_ready ON outbound (state, next_attempt_at);
+"""
+
+
+def _encode_message(message):
+    """
+    (body, recipient) of a request model, a message builder, a request dict
+    or encoded bytes
+    """
+    if isinstance(message, (bytes, bytearray)):
+        return bytes(message), None
+    if isinstance(message, MessageBuilder):
+        return message.encode(), message.to
+    if isinstance(message, dict):
+        return encode(message), message.get("to")
+    return encode_model(message), getattr(message, "to", None)
+
+
+class OutboundQueue:
+    """
+    Messages are written to a SQLite database in WAL mode before anything is
+    sent, and a pool of worker threads sends them through `client`, so a
+    crashed or restarted process resumes where it stopped.
+
+    A coordinator thread owns all queue writes after enqueueing: it claims
+    batches of due messages, hands them to the workers and records results
+    in batched transactions. Failed sends are retried with jittered
+    exponential backoff (or after the Retry-After the API asked for) up to
+    `max_attempts`, unless they failed with a permanent Graph API error (see
+    retry.is_retryable), whether the client raised it or returned its
+    error response.
+
+    Delivery is at most once: messages that were in flight when the process
+    died are marked UNKNOWN on restart instead of being sent again. Check
+    them against delivery statuses and call requeue_unknown() to resend, or
+    pass resend_inflight=True to resend them automatically.
+    Messages enqueued with the same dedupe_key are only stored once.
+
+    Use the queue as a context manager, or call close(), to stop its threads
+    and close its database connections.
+    """
+
+    def __init__(
+            self,
+            client,
+            path: str,
+            workers: int = None,
+            batch_size: int = 500,
+            max_attempts: int = 5,
+            backoff: float = 1.0,
+            max_backoff: float = 300.0,
+            poll_interval: float = 0.5,
+            resend_inflight: bool = False,
+    ) -> None:
+        self._client = client
+        self.path = path
+        self.workers = workers or getattr(client, "pool_maxsize", None) or 10
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._work = queue.Queue()
+        self._results = queue.Queue()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._inflight = 0
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self._closed = False
+
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        recovered = PENDING if resend_inflight else UNKNOWN
+        with conn:
+            count = conn.execute(
+                "UPDATE outbound SET state = ?, updated_at = ? WHERE state = ?",
+                (recovered, time.time(), INFLIGHT),
+            ).rowcount
+        if count:
+            log.warning(f"{count} messages were in flight at the last shutdown, marked {STATE_NAMES[recovered]}")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self._closed:
+                raise RuntimeError("OutboundQueue is closed")
+            # one connection per thread, only closed from another one by close()
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    # -------------- Producer side --------------
+
+    def enqueue(self, message, dedupe_key: str = None, path: str = "/messages") -> bool:
+        """
+        Store one message, a request model, a request dict or encoded JSON bytes.
+
+        :return: False when a message with the same dedupe_key is already queued
+        """
+        return self.enqueue_many([(message, dedupe_key)], path=path) == 1
+
+    def enqueue_many(self, messages: Iterable, path: str = "/messages") -> int:
+        """
+        Store many messages, committing every `batch_size` rows. Items are
+        messages or (message, dedupe_key) tuples.
+
+        :return: the number of messages stored
+        """
+        conn = self._conn()
+        stored = 0
+        batch = []
+        for item in messages:
+            message, dedupe_key = item if isinstance(item, tuple) else (item, None)
+            body, recipient = _encode_message(message)
+            batch.append((dedupe_key, path, recipient, body))
+            if len(batch) >= self.batch_size:
+                stored += self._insert(conn, batch)
+                batch = []
+        if batch:
+            stored += self._insert(conn, batch)
+        return stored
+
+    @staticmethod
+    def _insert(conn, rows):
+        before = conn.total_changes
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO outbound (dedupe_key, path, recipient, body) VALUES (?, ?, ?, ?)", rows
+            )
+        return conn.total_changes - before
+
+    # -------------- Worker side --------------
+
+    def _claim(self, conn, limit):
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, path, recipient, body, attempts FROM outbound"
+                " WHERE state = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (PENDING, now, limit),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE outbound SET state = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    [(INFLIGHT, now, row[0]) for row in rows],
+                )
+        return rows
+
+    def _retry_delay(self, attempts, error=None):
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return min(self.max_backoff, retry_after)
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _outcome(self, row_id, attempts, response, error):
+        """
+        Row update for a send result: (state, next_attempt_at, wamid, error, updated_at, id)
+        """
+        now = time.time()
+        if error is None:
+            wamid = response_wamid(response)
+            if wamid is not None:
+                return SENT, 0, wamid, None, now, row_id
+            # The API answered with an error body, returned rather than raised by
+            # clients without a retry_policy: classified as the raised error would be
+            error = error_from_result(None, response)
+        if attempts >= self.max_attempts or (isinstance(error, GraphAPIError) and not is_retryable(error)):
+            return FAILED, 0, None, repr(error), now, row_id
+        return PENDING, now + self._retry_delay(attempts, error), None, repr(error), now, row_id
+
+    def _record(self, conn, outcomes):
+        with conn:
+            conn.executemany(
+                "UPDATE outbound SET state = ?, next_attempt_at = ?, wamid = ?, error = ?, updated_at = ?"
+                " WHERE id = ?",
+                outcomes,
+            )
+
+    def _worker(self):
+        while True:
+            item = self._work.get()
+            if item is None:
+                return
+            row_id, path, recipient, body, attempts = item
+            try:
+                response = self._client.post(path=path, body=body, recipient=recipient)
+                self._results.put(self._outcome(row_id, attempts + 1, response, None))
+            except Exception as e:
+                log.warning(f"Queued message {row_id} failed on attempt {attempts + 1}: {e!r}")
+                self._results.put(self._outcome(row_id, attempts + 1, None, e))
+
+    def _coordinator(self):
+        conn = self._conn()
+        window = self.workers * 4
+        while not (self._stopping.is_set() and self._inflight == 0):
+            outcomes = []
+            try:
+                outcomes.append(self._results.get(timeout=self.poll_interval if self._inflight else 0))
+                while True:
+                    outcomes.append(self._results.get_nowait())
+            except queue.Empty:
+                pass
+            if outcomes:
+                self._record(conn, outcomes)
+                self._inflight -= len(outcomes)
+            if not self._stopping.is_set() and self._inflight < window:
+                rows = self._claim(conn, min(self.batch_size, window - self._inflight))
+                for row in rows:
+                    self._work.put(row)
+                self._inflight += len(rows)
+                if not rows and not self._inflight:
+                    self._stopping.wait(self.poll_interval)
+        for _ in range(self.workers):
+            self._work.put(None)
+
+    def start(self) -> "OutboundQueue":
+        if self._closed:
+            raise RuntimeError("OutboundQueue is closed")
+        if self._threads:
+            return self
+        self._stopping.clear()
+        self._threads = [threading.Thread(target=self._coordinator, name="whatsapp-queue", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._worker, name=f"whatsapp-queue-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stop claiming messages, let in-flight sends finish and record them.
+        The queue can be started again.
+
+        :return: False if `timeout` expired before every thread stopped
+        """
+        self._stopping.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        alive = [thread for thread in self._threads if thread.is_alive()]
+        self._threads = alive
+        return not alive
+
+    def close(self, timeout: Optional[float] = None, drain: bool = False) -> bool:
+        """
+        stop(), then close the queue's database connections. With `drain`
+        the messages pending are sent first (see join()); otherwise they stay
+        stored for the next OutboundQueue on the same path.
+
+        :return: False if `timeout` expired before every thread stopped; the
+                 connections are then left open for the threads still sending
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if drain and self._threads:
+            self.join(timeout)
+        if not self.stop(None if deadline is None else max(0.0, deadline - time.monotonic())):
+            log.warning(f"OutboundQueue threads still running after {timeout}s, database left open")
+            return False
+        self._closed = True
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+        return True
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def join(self, timeout: Optional[float] = None, poll_interval: float = 0.2) -> bool:
+        """
+        Wait until no message is pending or in flight.
+
+        :return: False if `timeout` expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            stats = self.stats()
+            if not stats["pending"] and not stats["inflight"]:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+
+    # -------------- Inspection --------------
+
+    def stats(self) -> dict:
+        counts = dict(self._conn().execute("SELECT state, COUNT(*) FROM outbound GROUP BY state").fetchall())
+        return {name: counts.get(state, 0) for state, name in STATE_NAMES.items()}
+
+    def requeue_unknown(self) -> int:
+        """
+        Send again the messages whose outcome was lost in a crash.
+        """
+        conn = self._conn()
+        with conn:
+            return conn.execute(
+                "UPDATE outbound SET state = ?, next_attempt_at = 0, updated_at = ? WHERE state = ?",
+                (PENDING, time.time(), UNKNOWN),
+            ).rowcount
@@ -0,0 +1,123 @@
+"""
+Client-side throughput governor for the Cloud API rate limits.
+
+Meta limits every business phone number to a number of messages per second
+(the throughput tier) and every (business number, recipient) pair to roughly
+one message every six seconds. RateLimiter paces sends to stay inside both
+limits so that callers wait locally instead of burning round-trips on
+throttling errors.
+"""
+import asyncio
+import threading
+import time
+
+# Messages per second per business phone number
+THROUGHPUT_TIERS = {
+    "standard": 80,
+    "high": 1000,
+}
+
+# Seconds between two messages to the same recipient from the same number
+DEFAULT_PAIR_INTERVAL = 6.0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `rate` tokens per second and holding
+    at most `capacity` tokens.
+
+    reserve() always takes the token and returns how long the caller has to
+    wait before using it, so waiting can be done either by blocking or by
+    awaiting without holding the lock.
+    """
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class RateLimiter:
+    """
+    Token bucket per phone_number_id plus a minimum spacing between messages
+    to the same recipient.
+
+    :param messages_per_second: sustained rate per phone number, overrides `tier`
+    :param tier: key of THROUGHPUT_TIERS used when no explicit rate is given
+    :param burst: bucket capacity, defaults to one second worth of messages
+    :param pair_interval: seconds between messages to one recipient, 0 disables it
+    """
+
+    _PRUNE_THRESHOLD = 100_000
+
+    def __init__(
+            self,
+            messages_per_second: float = None,
+            tier: str = "standard",
+            burst: float = None,
+            pair_interval: float = DEFAULT_PAIR_INTERVAL,
+    ) -> None:
+        if messages_per_second is None:
+            try:
+                messages_per_second = THROUGHPUT_TIERS[tier]
+            except KeyError:
+                raise ValueError(f"Unknown throughput tier {tier!r}, expected one of {list(THROUGHPUT_TIERS)}")
+        self.messages_per_second = messages_per_second
+        self.burst = burst
+        self.pair_interval = pair_interval
+        self._buckets = {}
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, phone_number_id):
+        bucket = self._buckets.get(phone_number_id)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(
+                    phone_number_id, TokenBucket(self.messages_per_second, self.burst)
+                )
+        return bucket
+
+    def _reserve_recipient(self, phone_number_id, to, now):
+        key = (phone_number_id, to)
+        with self._lock:
+            if len(self._next_allowed) > self._PRUNE_THRESHOLD:
+                self._next_allowed = {k: v for k, v in self._next_allowed.items() if v > now}
+            send_at = max(now, self._next_allowed.get(key, now))
+            self._next_allowed[key] = send_at + self.pair_interval
+        return send_at - now
+
+    def reserve(self, phone_number_id, to: str = None) -> float:
+        """
+        Reserve a send slot and return the number of seconds to wait before
+        sending. The phone number's token is taken immediately, even when the
+        recipient spacing pushes the send further out.
+        """
+        delay = self._bucket(phone_number_id).reserve()
+        if to and self.pair_interval:
+            delay = max(delay, self._reserve_recipient(phone_number_id, to, time.monotonic()))
+        return delay
+
+    def acquire(self, phone_number_id, to: str = None) -> None:
+        delay = self.reserve(phone_number_id, to)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, phone_number_id, to: str = None) -> None:
+        delay = self.reserve(phone_number_id, to)
+        if delay > 0:
+            await asyncio.sleep(delay)
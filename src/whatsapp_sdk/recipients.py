@@ -0,0 +1,406 @@
+"""
+Preparation of campaign recipient lists: phone numbers normalized to
+E.164, deduplicated and checked against per-country numbering rules before
+anything is sent.
+
+    normalizer = RecipientNormalizer(default_country="IN")
+    prepared = normalizer.prepare(rows)
+    prepared.invalid  # [InvalidRecipient(index=3, value="12ab", reason="bad_characters"), ...]
+    client.whatsapp.send_template_bulk(prepared, name="order_update")
+
+Each distinct input of a list is normalized once: lists are deduplicated
+before normalizing, numpy arrays and pandas Series factorized (numpy and
+pandas are optional), and single normalize() calls are memoized.
+"""
+import logging
+import numbers
+import re
+from typing import Iterable, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+# E.164 numbers have at most 15 digits; shorter than 8 is not a reachable mobile
+E164_MAX_DIGITS = 15
+E164_MIN_DIGITS = 8
+
+# Reasons reported in InvalidRecipient
+EMPTY = "empty"
+BAD_CHARACTERS = "bad_characters"
+TOO_SHORT = "too_short"
+TOO_LONG = "too_long"
+UNKNOWN_COUNTRY = "unknown_country"
+BAD_LENGTH = "bad_length"
+BAD_PREFIX = "bad_prefix"
+
+# Separators people put in phone numbers; a replace() per separator present
+# is several times faster than str.translate
+_SEPARATORS = (" ", "-", ".", "(", ")", "/", "\t", "\r", "\n", "\u00a0", "\u2010", "\u2011", "\u2012", "\u2013")
+
+
+class CountryRule(NamedTuple):
+    """
+    Numbering rule of a country: national (significant) number lengths, the
+    trunk prefix dialled before them domestically, and the digits mobile
+    numbers start with, any if empty
+    """
+    country: str
+    calling_code: str
+    lengths: frozenset
+    trunk_prefix: str = ""
+    leading_digits: str = ""
+
+
+def _rule(country, calling_code, lengths, trunk_prefix="", leading_digits=""):
+    return CountryRule(country, calling_code, frozenset(lengths), trunk_prefix, leading_digits)
+
+
+COUNTRY_RULES = (
+    _rule("US", "1", (10,), "1", "23456789"),
+    _rule("CA", "1", (10,), "1", "23456789"),
+    _rule("RU", "7", (10,), "8", "3456789"),
+    _rule("EG", "20", (10,), "0", "1"),
+    _rule("ZA", "27", (9,), "0"),
+    _rule("NL", "31", (9,), "0"),
+    _rule("BE", "32", (8, 9), "0"),
+    _rule("FR", "33", (9,), "0"),
+    _rule("ES", "34", (9,), "", "6789"),
+    _rule("IT", "39", (9, 10), ""),
+    _rule("CH", "41", (9,), "0"),
+    _rule("GB", "44", (10,), "0", "7"),
+    _rule("DE", "49", (10, 11), "0", "1"),
+    _rule("MX", "52", (10,), ""),
+    _rule("AR", "54", (10, 11), "0"),
+    _rule("BR", "55", (10, 11), "0"),
+    _rule("CO", "57", (10,), "", "3"),
+    _rule("MY", "60", (9, 10), "0", "1"),
+    _rule("AU", "61", (9,), "0", "4"),
+    _rule("ID", "62", (9, 10, 11, 12), "0", "8"),
+    _rule("PH", "63", (10,), "0", "9"),
+    _rule("SG", "65", (8,), "", "89"),
+    _rule("TH", "66", (9,), "0", "689"),
+    _rule("JP", "81", (10,), "0", "789"),
+    _rule("KR", "82", (9, 10), "0", "1"),
+    _rule("VN", "84", (9,), "0", "35789"),
+    _rule("CN", "86", (11,), "0", "1"),
+    _rule("TR", "90", (10,), "0", "5"),
+    _rule("IN", "91", (10,), "0", "6789"),
+    _rule("PK", "92", (10,), "0", "3"),
+    _rule("LK", "94", (9,), "0", "7"),
+    _rule("NG", "234", (10,), "0", "789"),
+    _rule("KE", "254", (9,), "0", "17"),
+    _rule("HK", "852", (8,), "", "4569"),
+    _rule("BD", "880", (10,), "0", "1"),
+    _rule("AE", "971", (9,), "0", "5"),
+    _rule("IL", "972", (9,), "0", "5"),
+    _rule("NP", "977", (10,), "", "9"),
+    _rule("SA", "966", (9,), "0", "5"),
+)
+
+
+def national_pattern(rule: CountryRule):
+    """
+    Compiled pattern matching the numbers of `rule`'s country in any of
+    their usual forms once separators are removed, capturing the national
+    number: with "+" or "00" and the calling code, with the calling code
+    alone, with the trunk prefix or bare
+    """
+    lead = f"[{rule.leading_digits}]" if rule.leading_digits else r"\d"
+    rest = "|".join(rf"\d{{{length - 1}}}" for length in sorted(rule.lengths))
+    prefixes = [rf"(?:\+|00){rule.calling_code}", rule.calling_code]
+    if rule.trunk_prefix:
+        prefixes.append(re.escape(rule.trunk_prefix))
+    return re.compile(rf"(?:{'|'.join(prefixes)})?({lead}(?:{rest}))")
+
+
+RULES_BY_COUNTRY = {rule.country: rule for rule in COUNTRY_RULES}
+# NANP countries share +1, numbers are checked against the first rule of a code
+RULES_BY_CALLING_CODE = {}
+for _r in COUNTRY_RULES:
+    RULES_BY_CALLING_CODE.setdefault(_r.calling_code, _r)
+del _r
+
+
+class InvalidRecipient(NamedTuple):
+    index: int
+    value: object
+    reason: str
+
+
+class PreparedRecipients:
+    """
+    Result of RecipientNormalizer.prepare(): the unique valid `recipients`
+    in the order first seen, E.164 strings (or the input dicts with their
+    "to" normalized), the `invalid` entries and how many `duplicates` were
+    dropped. Iterates over `recipients`, so it can be passed straight to
+    the bulk senders.
+    """
+    __slots__ = ("recipients", "invalid", "duplicates", "total")
+
+    def __init__(self, recipients: list, invalid: list, duplicates: int, total: int) -> None:
+        self.recipients = recipients
+        self.invalid = invalid
+        self.duplicates = duplicates
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.recipients)
+
+    def __len__(self):
+        return len(self.recipients)
+
+    def invalid_by_reason(self) -> dict:
+        counts = {}
+        for entry in self.invalid:
+            counts[entry.reason] = counts.get(entry.reason, 0) + 1
+        return counts
+
+    def __repr__(self):
+        return (f"PreparedRecipients(total={self.total}, valid={len(self.recipients)}, "
+                f"duplicates={self.duplicates}, invalid={len(self.invalid)})")
+
+
+class RecipientNormalizer:
+    """
+    Normalizes phone numbers to E.164 ("+919876543210").
+
+    Numbers starting with "+" or "00" are international. Others are taken
+    as national numbers of `default_country` (an ISO code of COUNTRY_RULES)
+    when their length fits it, with or without its trunk prefix, and as
+    international numbers without the "+" otherwise, the form the Cloud API
+    itself uses. Numbers of a known calling code must match its rule;
+    with `strict`, numbers of other calling codes are rejected, otherwise
+    any 8 to 15 digits are accepted.
+
+    Results of up to `cache_size` distinct inputs are memoized, so repeated
+    normalize() and check() calls of the same numbers cost a dict lookup.
+    """
+
+    def __init__(self, default_country: str = None, strict: bool = False, cache_size: int = 2 ** 20) -> None:
+        if default_country is not None and default_country not in RULES_BY_COUNTRY:
+            raise ValueError(f"No numbering rule for country {default_country!r}")
+        self.default_country = default_country
+        self.strict = strict
+        self.cache_size = cache_size
+        self._default_rule = RULES_BY_COUNTRY.get(default_country)
+        self._default_match = None
+        if self._default_rule is not None:
+            self._default_match = national_pattern(self._default_rule).fullmatch
+            self._default_prefix = f"+{self._default_rule.calling_code}"
+        self._cache = {}
+
+    # -------------- Single numbers --------------
+
+    def check(self, value) -> tuple:
+        """
+        (E.164 number, None) for a valid number, (None, reason) otherwise
+        """
+        result = self._cache.get(value)
+        if result is None:
+            result = self._check(value)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[value] = result
+        return result
+
+    def normalize(self, value) -> Optional[str]:
+        """
+        The E.164 form of `value`, None if it is not a valid number
+        """
+        return self.check(value)[0]
+
+    def _check(self, value):
+        if not isinstance(value, str):
+            # numbers read from spreadsheets come as ints, or floats with a missing value as NaN
+            if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+                value = str(value)
+            elif isinstance(value, numbers.Real) and float(value).is_integer():
+                value = str(int(value))
+            elif value is None or value != value:
+                return None, EMPTY
+            else:
+                return None, BAD_CHARACTERS
+        digits = value
+        if not digits.isdigit():
+            for separator in _SEPARATORS:
+                if separator in digits:
+                    digits = digits.replace(separator, "")
+        if not digits:
+            return None, EMPTY
+        if self._default_match is not None:
+            # most numbers of a list are of its country, one regex match settles them
+            match = self._default_match(digits)
+            if match is not None:
+                return self._default_prefix + match.group(1), None
+        international = False
+        if digits[0] == "+":
+            digits, international = digits[1:], True
+        elif digits[:2] == "00":
+            digits, international = digits[2:], True
+        if not (digits.isascii() and digits.isdigit()):
+            return None, BAD_CHARACTERS
+        rule = self._default_rule
+        if rule is not None and not international:
+            trunk = rule.trunk_prefix
+            if trunk and digits.startswith(trunk) and len(digits) - len(trunk) in rule.lengths:
+                return self._check_national(rule, digits[len(trunk):])
+            if len(digits) in rule.lengths:
+                return self._check_national(rule, digits)
+        return self._check_international(digits)
+
+    def _check_international(self, digits):
+        if len(digits) > E164_MAX_DIGITS:
+            return None, TOO_LONG
+        if len(digits) < E164_MIN_DIGITS:
+            return None, TOO_SHORT
+        # calling codes are prefix free, so at most one of these matches
+        for size in (1, 2, 3):
+            rule = RULES_BY_CALLING_CODE.get(digits[:size])
+            if rule is not None:
+                return self._check_national(rule, digits[size:])
+        if self.strict:
+            return None, UNKNOWN_COUNTRY
+        return "+" + digits, None
+
+    @staticmethod
+    def _check_national(rule, national):
+        if len(national) not in rule.lengths:
+            return None, BAD_LENGTH
+        if rule.leading_digits and national[0] not in rule.leading_digits:
+            return None, BAD_PREFIX
+        return f"+{rule.calling_code}{national}", None
+
+    # -------------- Lists --------------
+
+    def prepare(self, values: Iterable) -> PreparedRecipients:
+        """
+        Normalize, validate and deduplicate a recipient list of numbers, or
+        of dicts with a "to" as taken by the bulk senders. numpy arrays and
+        pandas Series are normalized once per unique value.
+        """
+        if _is_array(values):
+            return self._prepare_array(values)
+        values = values if isinstance(values, list) else list(values)
+        if values and not isinstance(values[0], dict):
+            try:
+                return self._prepare_numbers(values)
+            except TypeError:
+                pass  # dicts further down the list
+        check = self.check
+        valid, invalid, seen = [], [], set()
+        duplicates = total = 0
+        for index, value in enumerate(values):
+            total += 1
+            raw = value.get("to") if isinstance(value, dict) else value
+            number, reason = check(raw)
+            if number is None:
+                invalid.append(InvalidRecipient(index, raw, reason))
+            elif number in seen:
+                duplicates += 1
+            else:
+                seen.add(number)
+                valid.append({**value, "to": number} if isinstance(value, dict) else number)
+        return self._prepared(valid, invalid, duplicates, total)
+
+    def _prepare_numbers(self, values):
+        # distinct inputs in order of first appearance, deduplicated in C,
+        # then each checked once
+        check = self._check
+        valid, seen, reasons = [], set(), {}
+        for raw in dict.fromkeys(values):
+            number, reason = check(raw)
+            if number is None:
+                reasons[raw] = reason
+            elif number not in seen:
+                seen.add(number)
+                valid.append(number)
+        invalid = []
+        if reasons:
+            invalid = [InvalidRecipient(index, raw, reasons[raw])
+                       for index, raw in enumerate(values) if raw in reasons]
+        return self._prepared(valid, invalid, len(values) - len(invalid) - len(valid), len(values))
+
+    def normalize_array(self, values):
+        """
+        numpy object array of the E.164 form of each of `values`, None for
+        invalid ones, normalizing every distinct value once
+        """
+        import numpy
+
+        codes, uniques = _factorize(values)
+        numbers = numpy.array([self._check(value)[0] for value in uniques] + [None], dtype=object)
+        # code -1 (a missing value) picks the trailing None
+        return numbers[codes]
+
+    def _prepare_array(self, values):
+        import numpy
+
+        codes, uniques = _factorize(values)
+        checked = [self._check(value) for value in uniques]
+        # uniques are in order of first appearance, so are the valid numbers
+        valid, seen = [], set()
+        for number, _ in checked:
+            if number is not None and number not in seen:
+                seen.add(number)
+                valid.append(number)
+        is_valid = numpy.array([number is not None for number, _ in checked] + [False])
+        row_valid = is_valid[codes]
+        reasons = [reason for _, reason in checked] + [EMPTY]
+        raw = numpy.asarray(values, dtype=object)
+        invalid = [InvalidRecipient(int(i), raw[i], reasons[codes[i]]) for i in numpy.flatnonzero(~row_valid)]
+        valid_rows = int(row_valid.sum())
+        return self._prepared(valid, invalid, valid_rows - len(valid), len(codes))
+
+    @staticmethod
+    def _prepared(valid, invalid, duplicates, total):
+        prepared = PreparedRecipients(valid, invalid, duplicates, total)
+        if invalid:
+            log.info(f"Dropped {len(invalid)} invalid recipients: {prepared.invalid_by_reason()}")
+        return prepared
+
+
+def _is_array(values):
+    # by module name, so that neither numpy nor pandas is imported to tell
+    return type(values).__module__.partition(".")[0] in ("numpy", "pandas")
+
+
+def _factorize(values):
+    """
+    (codes, uniques) with values == uniques[codes] and uniques in order of
+    first appearance; -1 codes for missing values (None and NaN)
+    """
+    import numpy
+
+    try:
+        import pandas
+    except ImportError:
+        pass
+    else:
+        codes, uniques = pandas.factorize(values)
+        return codes, list(uniques)
+    raw = numpy.asarray(values, dtype=object).reshape(-1)
+    # None and NaN are the values unequal to themselves or equal to None
+    missing = (raw == None) | (raw != raw)  # noqa: E711
+    present = numpy.flatnonzero(~missing)
+    # sorted by their text, the original values are kept as the uniques
+    _, first, inverse = numpy.unique(raw[present].astype(str), return_index=True, return_inverse=True)
+    order = numpy.argsort(first)
+    rank = numpy.empty_like(order)
+    rank[order] = numpy.arange(len(order))
+    codes = numpy.full(len(raw), -1, dtype=numpy.intp)
+    codes[present] = rank[inverse.reshape(-1)]
+    return codes, raw[present[first[order]]].tolist()
+
+
+_default_normalizers = {}
+
+
+def prepare_recipients(values: Iterable, default_country: str = None, strict: bool = False) -> PreparedRecipients:
+    """
+    RecipientNormalizer.prepare() with a normalizer shared per
+    (default_country, strict)
+    """
+    key = (default_country, strict)
+    normalizer = _default_normalizers.get(key)
+    if normalizer is None:
+        normalizer = _default_normalizers[key] = RecipientNormalizer(default_country, strict)
+    return normalizer.prepare(values)
@@ -0,0 +1,209 @@
+"""
+Classification of Graph API errors and retries of the transient ones
+"""
+import asyncio
+import logging
+import random
+import time
+
+from .error import (AuthenticationError, BadRequest, ClientError, GraphAPIError,
+                    InsufficientCreditError, NotFoundError, RateLimitError,
+                    RecipientError, ServerError, TemplateError)
+
+log = logging.getLogger(__name__)
+
+# Throttling: retry once the limit has refilled
+THROTTLING_CODES = frozenset((
+    4,  # application request limit reached
+    613,  # calls to this API exceeded the rate limit
+    80007,  # WhatsApp Business Account rate limit
+    130429,  # Cloud API throughput reached
+    131056,  # pair rate limit, too many messages to the same recipient
+))
+
+# Transient server side failures
+TRANSIENT_CODES = frozenset((
+    1,  # unknown API error
+    2,  # API service temporarily unavailable
+    131000,  # something went wrong
+    131016,  # service overloaded
+    131057,  # business account in maintenance mode
+    133004,  # server temporarily unavailable
+))
+
+# Permanent failures, by the exception raised for them
+PERMANENT_CODES = {
+    0: AuthenticationError,  # AuthException
+    190: AuthenticationError,  # access token expired or invalid
+    10: AuthenticationError,  # permission denied
+    100: BadRequest,  # invalid parameter
+    131008: BadRequest,  # required parameter missing
+    131009: BadRequest,  # parameter value invalid
+    131051: BadRequest,  # unsupported message type
+    131052: BadRequest,  # media download error
+    131053: BadRequest,  # media upload error
+    131021: RecipientError,  # recipient cannot be the sender
+    131026: RecipientError,  # message undeliverable
+    131030: RecipientError,  # recipient not in allowed list
+    131047: RecipientError,  # re-engagement message, outside the 24h window
+    131042: InsufficientCreditError,  # business eligibility payment issue
+    132000: TemplateError,  # parameter count mismatch
+    132001: TemplateError,  # template does not exist
+    132005: TemplateError,  # hydrated text too long
+    132007: TemplateError,  # template format character policy violated
+    132012: TemplateError,  # parameter format mismatch
+    132015: TemplateError,  # template paused
+    132016: TemplateError,  # template disabled
+}
+
+_STATUS_ERRORS = {
+    400: BadRequest,
+    401: AuthenticationError,
+    403: AuthenticationError,
+    404: NotFoundError,
+    429: RateLimitError,
+}
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _error_class(code, status_code):
+    if code in THROTTLING_CODES:
+        return RateLimitError
+    if code in TRANSIENT_CODES:
+        return ServerError
+    if code in PERMANENT_CODES:
+        return PERMANENT_CODES[code]
+    if 200 <= (code or 0) < 300:
+        return AuthenticationError
+    if status_code is not None and status_code >= 500:
+        return ServerError
+    return _STATUS_ERRORS.get(status_code, ClientError)
+
+
+def error_from_response(host, response) -> GraphAPIError:
+    """
+    Build the typed exception for an error response from its Graph error
+    code, falling back to the HTTP status.
+    """
+    try:
+        error = response.json().get("error") or {}
+    except ValueError:
+        error = {}
+    code = error.get("code")
+    details = (error.get("error_data") or {}).get("details")
+    message = f"{response.status_code} response from {host}: {error.get('message') or response.content!r}"
+    if code is not None:
+        message += f" (code {code})"
+    error_class = _error_class(code, response.status_code)
+    return error_class(
+        message, code=code, status_code=response.status_code, retry_after=_retry_after(response), details=details
+    )
+
+
+def error_from_result(host, response) -> GraphAPIError:
+    """
+    The typed exception of an error response that a client without a
+    retry_policy returned rather than raised: a lazy_response.LazyResponse,
+    classified as error_from_response does, or a WAErrorResponse, whose
+    HTTP status is not known.
+    """
+    if hasattr(response, "status_code"):
+        return error_from_response(host, response)
+    error = getattr(response, "error", None)
+    code = getattr(error, "code", None)
+    details = getattr(getattr(error, "error_data", None), "details", None)
+    message = f"Error response from {host}: {getattr(error, 'message', None) or response!r}"
+    if code is not None:
+        message += f" (code {code})"
+    return _error_class(code, None)(message, code=code, details=details)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether sending again may succeed: throttling and transient server
+    errors. Errors with a known permanent code never are.
+    """
+    if not isinstance(error, GraphAPIError):
+        return False
+    if error.code in THROTTLING_CODES or error.code in TRANSIENT_CODES:
+        return True
+    if error.code in PERMANENT_CODES:
+        return False
+    return isinstance(error, (RateLimitError, ServerError))
+
+
+class RetryPolicy:
+    """
+    Retries retryable Graph API errors with full-jitter exponential backoff.
+
+    A server provided Retry-After takes precedence over the backoff. No
+    retry is attempted once the next attempt would start after `budget`
+    seconds from the first one; the last error is raised instead.
+    """
+
+    def __init__(
+            self,
+            max_attempts: int = 4,
+            base_delay: float = 0.5,
+            max_delay: float = 30.0,
+            budget: float = 60.0,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def delay(self, attempt: int, error: GraphAPIError = None) -> float:
+        """
+        Seconds to wait after the `attempt`-th attempt (starting at 1) failed
+        """
+        if error is not None and error.retry_after is not None:
+            return error.retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def next_delay(self, attempt: int, error: GraphAPIError, started: float):
+        """
+        Seconds to wait before sending again after the `attempt`-th attempt,
+        first made at time.monotonic() `started`, failed with `error`; None
+        when it is not to be retried
+        """
+        if attempt >= self.max_attempts or not is_retryable(error):
+            return None
+        delay = self.delay(attempt, error)
+        if time.monotonic() - started + delay > self.budget:
+            return None
+        log.info(f"Retrying after {error!r} in {delay:.2f}s (attempt {attempt} of {self.max_attempts})")
+        return delay
+
+    def call(self, func, *args, **kwargs):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func(*args, **kwargs)
+            except GraphAPIError as e:
+                delay = self.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    async def call_async(self, func, *args, **kwargs):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func(*args, **kwargs)
+            except GraphAPIError as e:
+                delay = self.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
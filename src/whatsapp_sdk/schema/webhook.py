@@ -0,0 +1,147 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class Metadata(BaseModel):
+    display_phone_number: Optional[str] = None
+    phone_number_id: str
+
+
+class Profile(BaseModel):
+    name: Optional[str] = None
+
+
+class WebhookContact(BaseModel):
+    profile: Optional[Profile] = None
+    wa_id: str
+
+
+class ErrorDetails(BaseModel):
+    details: Optional[str] = None
+
+
+class WebhookError(BaseModel):
+    code: int
+    title: Optional[str] = None
+    message: Optional[str] = None
+    error_data: Optional[ErrorDetails] = None
+    href: Optional[str] = None
+
+
+# -------------- Statuses --------------
+
+class ConversationOrigin(BaseModel):
+    type: str
+
+
+class Conversation(BaseModel):
+    id: str
+    origin: Optional[ConversationOrigin] = None
+    expiration_timestamp: Optional[str] = None
+
+
+class Pricing(BaseModel):
+    billable: Optional[bool] = None
+    pricing_model: Optional[str] = None
+    category: Optional[str] = None
+
+
+class Status(BaseModel):
+    id: str  # "wamid.ID" of the outbound message
+    status: str  # sent, delivered, read or failed
+    timestamp: str
+    recipient_id: str
+    conversation: Optional[Conversation] = None
+    pricing: Optional[Pricing] = None
+    errors: Optional[List[WebhookError]] = None
+    biz_opaque_callback_data: Optional[str] = None
+
+
+# -------------- Inbound messages --------------
+
+class Text(BaseModel):
+    body: str
+
+
+class MediaObject(BaseModel):
+    id: str
+    mime_type: Optional[str] = None
+    sha256: Optional[str] = None
+    caption: Optional[str] = None
+    filename: Optional[str] = None
+    voice: Optional[bool] = None
+
+
+class Location(BaseModel):
+    latitude: float
+    longitude: float
+    name: Optional[str] = None
+    address: Optional[str] = None
+
+
+class Reaction(BaseModel):
+    message_id: str
+    emoji: Optional[str] = None
+
+
+class MessageContext(BaseModel):
+    id: Optional[str] = None
+    from_: Optional[str] = Field(default=None, alias="from")
+    forwarded: Optional[bool] = None
+    frequently_forwarded: Optional[bool] = None
+
+
+class InboundMessage(BaseModel):
+    """
+    A message sent to the business number. Only the common message types are
+    modelled; the payload of other types is kept as extra fields.
+    """
+    model_config = ConfigDict(extra="allow", populate_by_name=True)
+
+    from_: str = Field(alias="from")
+    id: str
+    timestamp: str
+    type: str
+    context: Optional[MessageContext] = None
+    text: Optional[Text] = None
+    image: Optional[MediaObject] = None
+    video: Optional[MediaObject] = None
+    audio: Optional[MediaObject] = None
+    document: Optional[MediaObject] = None
+    sticker: Optional[MediaObject] = None
+    location: Optional[Location] = None
+    reaction: Optional[Reaction] = None
+    interactive: Optional[dict] = None
+    button: Optional[dict] = None
+    errors: Optional[List[WebhookError]] = None
+
+
+# -------------- Notification envelope --------------
+
+class Value(BaseModel):
+    # Fields other than "messages" (message_template_status_update, account_update, ...)
+    # carry other keys, kept as extra attributes
+    model_config = ConfigDict(extra="allow")
+
+    messaging_product: str = "whatsapp"
+    metadata: Optional[Metadata] = None
+    contacts: Optional[List[WebhookContact]] = None
+    messages: Optional[List[InboundMessage]] = None
+    statuses: Optional[List[Status]] = None
+    errors: Optional[List[WebhookError]] = None
+
+
+class Change(BaseModel):
+    field: str
+    value: Value
+
+
+class Entry(BaseModel):
+    id: str  # WhatsApp Business Account ID
+    changes: List[Change]
+
+
+class WebhookNotification(BaseModel):
+    object: str
+    entry: List[Entry]
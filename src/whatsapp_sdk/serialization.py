@@ -0,0 +1,32 @@
+"""
+Encoding of request bodies straight to JSON bytes.
+
+Models are serialized by pydantic-core with model_dump_json, skipping the
+intermediate dict and the unset optional fields. Plain dicts use orjson when
+it is installed and the stdlib json module otherwise, as does decoding.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_model(model) -> bytes:
+    """
+    Serialize a pydantic request model to compact JSON, leaving out None fields.
+    """
+    return model.model_dump_json(exclude_none=True).encode()
+
+
+if orjson is not None:
+    def encode(params: dict) -> bytes:
+        return orjson.dumps(params)
+
+    decode = orjson.loads
+else:
+    def encode(params: dict) -> bytes:
+        return json.dumps(params, separators=(",", ":"), ensure_ascii=False).encode()
+
+    decode = json.loads
@@ -0,0 +1,245 @@
+"""
+Tracking of outbound message states from send responses and webhook statuses
+"""
+import hashlib
+import threading
+from array import array
+from enum import IntEnum
+from typing import Optional
+
+from .lazy_response import LazyResponse
+
+_EMPTY = 0
+_MAX_LOAD = 0.7
+_FILE_MAGIC = b"WASTATE1"
+
+
+class MessageState(IntEnum):
+    """
+    States of an outbound message, ordered so that a state only ever moves
+    forward. FAILED is last as it is final whatever came before it.
+    """
+    UNKNOWN = 0
+    ACCEPTED = 1
+    SENT = 2
+    DELIVERED = 3
+    READ = 4
+    FAILED = 5
+
+
+_STATES_BY_NAME = {state.name.lower(): state for state in MessageState}
+
+
+def _key(wamid: str) -> int:
+    # 64-bit digest of the wamid, 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(wamid.encode(), digest_size=8).digest(), "little") or 1
+
+
+class StatusTracker:
+    """
+    Compact store of message states keyed by wamid.
+
+    Messages live in an open-addressing hash table made of parallel arrays:
+    a 64-bit hash of the wamid, one byte of state and a 16-bit campaign
+    index, around 11 bytes per slot, so at most ~32 bytes per tracked message
+    at the lowest load factor. The wamid strings themselves are not kept.
+    Per-campaign counts of every state are maintained on each change, so
+    aggregates are O(1).
+
+    Feed it send results with record_response() (or pass it to Client as
+    status_tracker=) and webhook statuses with apply(); on_status has the
+    WebhookHandler callback signature.
+    """
+
+    def __init__(self, capacity: int = 1024, track_unknown: bool = True) -> None:
+        size = 8
+        while size * _MAX_LOAD < capacity:
+            size *= 2
+        self.track_unknown = track_unknown
+        self._lock = threading.Lock()
+        self._campaigns = [None]
+        self._campaign_index = {None: 0}
+        self._counts = [[0] * len(MessageState)]
+        self._allocate(size)
+
+    def _allocate(self, size):
+        self._mask = size - 1
+        self._keys = array("Q", bytes(8 * size))
+        self._states = bytearray(size)
+        self._campaign_ids = array("H", bytes(2 * size))
+        self._used = 0
+
+    def _slot(self, key):
+        mask = self._mask
+        keys = self._keys
+        index = key & mask
+        while True:
+            current = keys[index]
+            if current == key or current == _EMPTY:
+                return index
+            index = (index + 1) & mask
+
+    def _grow(self):
+        keys, states, campaign_ids = self._keys, self._states, self._campaign_ids
+        self._allocate(len(keys) * 2)
+        for index, key in enumerate(keys):
+            if key != _EMPTY:
+                slot = self._slot(key)
+                self._keys[slot] = key
+                self._states[slot] = states[index]
+                self._campaign_ids[slot] = campaign_ids[index]
+        self._used = sum(1 for key in keys if key != _EMPTY)
+
+    def _campaign(self, campaign):
+        index = self._campaign_index.get(campaign)
+        if index is None:
+            index = len(self._campaigns)
+            if index > 0xFFFF:
+                raise ValueError("StatusTracker supports at most 65535 campaigns")
+            self._campaigns.append(campaign)
+            self._campaign_index[campaign] = index
+            self._counts.append([0] * len(MessageState))
+        return index
+
+    def _set(self, key, state, campaign=None, insert=True):
+        slot = self._slot(key)
+        if self._keys[slot] == _EMPTY:
+            if not insert:
+                return False
+            if (self._used + 1) > len(self._keys) * _MAX_LOAD:
+                self._grow()
+                slot = self._slot(key)
+            campaign_id = self._campaign(campaign)
+            self._keys[slot] = key
+            self._states[slot] = state
+            self._campaign_ids[slot] = campaign_id
+            self._used += 1
+            self._counts[campaign_id][state] += 1
+            return True
+        current = self._states[slot]
+        if state <= current:
+            return False
+        counts = self._counts[self._campaign_ids[slot]]
+        counts[current] -= 1
+        counts[state] += 1
+        self._states[slot] = state
+        return True
+
+    def record(self, wamid: str, campaign=None, state: MessageState = MessageState.ACCEPTED) -> None:
+        """
+        Start tracking a sent message, optionally tagged with a campaign.
+        """
+        with self._lock:
+            self._set(_key(wamid), state, campaign)
+
+    def record_response(self, response, campaign=None) -> int:
+        """
+        Record the wamids of a WASuccessResponse or LazyResponse, returning
+        how many there were. Other responses are ignored.
+        """
+        if isinstance(response, LazyResponse):
+            wamid = response.wamid
+            if wamid is None:
+                return 0
+            self.record(wamid, campaign)
+            return 1
+        messages = getattr(response, "messages", None) or ()
+        for message in messages:
+            self.record(message.id, campaign)
+        return len(messages)
+
+    def update(self, wamid: str, status) -> bool:
+        """
+        Apply a status ("sent", "delivered", "read", "failed" or a
+        MessageState) to a message. Out of order statuses that would move the
+        state backwards are ignored.
+
+        :return: whether the state changed
+        """
+        state = status if isinstance(status, MessageState) else _STATES_BY_NAME.get(status)
+        if state is None:
+            return False
+        with self._lock:
+            return self._set(_key(wamid), state, insert=self.track_unknown)
+
+    def apply(self, status) -> bool:
+        """
+        Apply a webhook status, a schema.webhook.Status or webhook.StatusUpdate.
+        """
+        return self.update(status.id, status.status)
+
+    def on_status(self, status, metadata=None) -> None:
+        self.apply(status)
+
+    def state(self, wamid: str) -> Optional[MessageState]:
+        key = _key(wamid)
+        with self._lock:
+            slot = self._slot(key)
+            if self._keys[slot] == _EMPTY:
+                return None
+            return MessageState(self._states[slot])
+
+    def __contains__(self, wamid: str) -> bool:
+        return self.state(wamid) is not None
+
+    def __len__(self):
+        return self._used
+
+    def counts(self, campaign=None) -> dict:
+        """
+        Number of messages of `campaign` in each state
+        """
+        index = self._campaign_index.get(campaign)
+        if index is None:
+            return {state: 0 for state in MessageState}
+        counts = self._counts[index]
+        return {state: counts[state] for state in MessageState}
+
+    def campaigns(self):
+        return [campaign for campaign in self._campaigns if campaign is not None]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the table arrays
+        """
+        return self._keys.itemsize * len(self._keys) + len(self._states) + \
+            self._campaign_ids.itemsize * len(self._campaign_ids)
+
+    # -------------- Spill to disk --------------
+
+    def save(self, path) -> None:
+        """
+        Write the table to `path` as raw arrays. Campaign names must be str.
+        """
+        with self._lock, open(path, "wb") as f:
+            names = "\n".join(c for c in self._campaigns[1:]).encode()
+            f.write(_FILE_MAGIC)
+            f.write(len(self._keys).to_bytes(8, "little"))
+            f.write(len(names).to_bytes(8, "little"))
+            f.write(names)
+            self._keys.tofile(f)
+            f.write(self._states)
+            self._campaign_ids.tofile(f)
+
+    @classmethod
+    def load(cls, path, track_unknown: bool = True) -> "StatusTracker":
+        tracker = cls(track_unknown=track_unknown)
+        with open(path, "rb") as f:
+            if f.read(len(_FILE_MAGIC)) != _FILE_MAGIC:
+                raise ValueError(f"{path} is not a StatusTracker file")
+            size = int.from_bytes(f.read(8), "little")
+            names = f.read(int.from_bytes(f.read(8), "little")).decode()
+            for name in names.split("\n") if names else ():
+                tracker._campaign(name)
+            tracker._mask = size - 1
+            tracker._keys = array("Q")
+            tracker._keys.fromfile(f, size)
+            tracker._states = bytearray(f.read(size))
+            tracker._campaign_ids = array("H")
+            tracker._campaign_ids.fromfile(f, size)
+        for index, key in enumerate(tracker._keys):
+            if key != _EMPTY:
+                tracker._used += 1
+                tracker._counts[tracker._campaign_ids[index]][tracker._states[index]] += 1
+        return tracker
@@ -0,0 +1,267 @@
+"""
+Message templates of a WhatsApp Business Account, fetched from the Graph
+API and cached, to check template messages before they are sent.
+
+    registry = TemplateRegistry(client, waba_id="102290129340398")
+    client.template_registry = registry
+    client.whatsapp.send_template_message("order_update", to, language="en_US", body=body)
+
+With a registry on the client, template sends whose template does not
+exist in that language, is not approved (e.g. paused or disabled), or
+whose header/body/footer parameters do not match the template's
+placeholders raise error.TemplateValidationError before any request is
+made. Bulk sends and campaigns stop on the first such error rather than
+failing every recipient on the API.
+"""
+import asyncio
+import inspect
+import logging
+import re
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from .error import TemplateValidationError
+
+log = logging.getLogger(__name__)
+
+APPROVED = "APPROVED"
+
+FIELDS = "name,language,status,category,components"
+
+# {{1}} or, for templates with named parameters, {{first_name}}
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Parameter types accepted by each header format, and by the body
+HEADER_PARAMETER_TYPES = {
+    "TEXT": "text",
+    "IMAGE": "image",
+    "VIDEO": "video",
+    "DOCUMENT": "document",
+    "LOCATION": "location",
+}
+BODY_PARAMETER_TYPES = frozenset(("text", "currency", "date_time"))
+
+
+def placeholders(text: str) -> int:
+    """
+    Number of distinct parameters in a template text
+    """
+    return len(set(_PLACEHOLDER.findall(text or "")))
+
+
+class TemplateInfo(NamedTuple):
+    """
+    The parts of a message template that sends are checked against.
+    `header_format` is None for templates without a header.
+    """
+    name: str
+    language: str
+    status: str
+    category: Optional[str]
+    header_format: Optional[str]
+    header_parameters: int
+    body_parameters: int
+    id: Optional[str] = None
+
+    @property
+    def approved(self):
+        return self.status == APPROVED
+
+    @classmethod
+    def from_json(cls, data: dict) -> "TemplateInfo":
+        header_format, header_parameters, body_parameters = None, 0, 0
+        for component in data.get("components") or ():
+            kind = component.get("type", "").upper()
+            if kind == "HEADER":
+                header_format = component.get("format", "TEXT").upper()
+                header_parameters = placeholders(component.get("text")) if header_format == "TEXT" else 1
+            elif kind == "BODY":
+                body_parameters = placeholders(component.get("text"))
+        return cls(data["name"], data["language"], (data.get("status") or "").upper(), data.get("category"),
+                   header_format, header_parameters, body_parameters, data.get("id"))
+
+
+def _get(obj, name):
+    # field of a request model or of its dict form
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _type_name(value):
+    return getattr(value, "value", value)
+
+
+class TemplateRegistry:
+    """
+    Templates of the WhatsApp Business Account `waba_id`, indexed by
+    (name, language) and fetched through `client` (a synchronous Client) on
+    first use. Once they are older than `ttl` seconds, lookups keep
+    answering from the cached templates while a background thread fetches
+    them again; if that fails, the cached ones stay in use and the fetch is
+    tried again `retry_interval` seconds later.
+
+    A registry can also be set on an AsyncClient, still fetching through a
+    synchronous Client. Load it with `await registry.refresh_async()`
+    first: fetching blocks, so a first lookup from a running event loop
+    raises RuntimeError instead of stalling the loop.
+    """
+
+    def __init__(self, client, waba_id: str, ttl: float = 600.0, page_size: int = 200,
+                 retry_interval: float = 30.0) -> None:
+        if inspect.iscoroutinefunction(getattr(client, "get_json", None)):
+            raise TypeError("TemplateRegistry fetches through a synchronous Client, not an AsyncClient")
+        self._client = client
+        self.waba_id = waba_id
+        self.ttl = ttl
+        self.page_size = page_size
+        self.retry_interval = retry_interval
+        self._templates = None
+        self._languages = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    # -------------- Fetching --------------
+
+    def _fetch(self):
+        path = f"/{self.waba_id}/message_templates"
+        params = {"fields": FIELDS, "limit": self.page_size}
+        templates = []
+        while True:
+            page = self._client.get_json(path, params=params)
+            templates.extend(page.get("data") or ())
+            paging = page.get("paging") or {}
+            after = (paging.get("cursors") or {}).get("after")
+            if not paging.get("next") or not after:
+                return templates
+            params = {**params, "after": after}
+
+    def refresh(self) -> int:
+        """
+        Fetch the templates now, returning how many there are
+        """
+        templates = {}
+        languages = {}
+        for data in self._fetch():
+            info = TemplateInfo.from_json(data)
+            templates[(info.name, info.language)] = info
+            languages.setdefault(info.name, []).append(info.language)
+        self._templates, self._languages = templates, languages
+        self._loaded_at = time.monotonic()
+        log.debug(f"Fetched {len(templates)} message templates of {self.waba_id}")
+        return len(templates)
+
+    async def refresh_async(self) -> int:
+        """
+        refresh() in a worker thread, keeping the event loop free
+        """
+        return await asyncio.to_thread(self.refresh)
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            log.warning(f"Refreshing the message templates of {self.waba_id} failed, "
+                        f"trying again in {self.retry_interval:g}s: {e!r}")
+            # back off rather than fetching again on the next lookup
+            self._loaded_at = time.monotonic() - self.ttl + self.retry_interval
+        finally:
+            self._refreshing = False
+
+    def _index(self):
+        templates = self._templates
+        if templates is None:
+            if _in_event_loop():
+                raise RuntimeError(f"Message templates of {self.waba_id} not loaded yet: "
+                                   f"await registry.refresh_async() before sending from an event loop")
+            with self._lock:
+                if self._templates is None:
+                    self.refresh()
+            return self._templates
+        if time.monotonic() - self._loaded_at > self.ttl and not self._refreshing:
+            with self._lock:
+                if self._refreshing:
+                    return templates
+                self._refreshing = True
+            threading.Thread(target=self._refresh_in_background, name="whatsapp-templates", daemon=True).start()
+        return templates
+
+    # -------------- Lookup --------------
+
+    def get(self, name: str, language: str) -> Optional[TemplateInfo]:
+        return self._index().get((name, language))
+
+    def __len__(self):
+        return len(self._index())
+
+    def __iter__(self):
+        return iter(self._index().values())
+
+    # -------------- Validation --------------
+
+    def validate(self, name: str, language: str = "en", header=None, body=None, footer=None) -> TemplateInfo:
+        """
+        Check the header/body/footer components (models of schema/template.py
+        or their dicts) of a send of template `name` in `language`, raising
+        TemplateValidationError if it would be refused.
+        """
+        info = self._index().get((name, language))
+        if info is None:
+            languages = self._languages.get(name)
+            if languages:
+                raise TemplateValidationError(f"Template {name!r} does not exist in {language!r}, "
+                                              f"only in {sorted(languages)}")
+            raise TemplateValidationError(f"Template {name!r} does not exist")
+        if not info.approved:
+            raise TemplateValidationError(f"Template {name!r} ({language}) is {info.status.lower()}, not approved")
+        self._check_header(info, _get(header, "parameters") or [])
+        self._check_body(info, _get(body, "parameters") or [])
+        if _get(footer, "parameters"):
+            raise TemplateValidationError(f"Template {name!r} ({language}) footer takes no parameters")
+        return info
+
+    def validate_message(self, message) -> TemplateInfo:
+        """
+        validate() for a whole template message, a TemplateMsg or its dict
+        """
+        template = _get(message, "template")
+        components = {}
+        for component in _get(template, "components") or ():
+            components[_type_name(_get(component, "type"))] = component
+        return self.validate(_get(template, "name"), _get(_get(template, "language"), "code"),
+                             components.get("header"), components.get("body"), components.get("footer"))
+
+    @staticmethod
+    def _check_header(info, parameters):
+        where = f"Template {info.name!r} ({info.language}) header"
+        if info.header_format is None:
+            if parameters:
+                raise TemplateValidationError(f"Template {info.name!r} ({info.language}) has no header")
+            return
+        if len(parameters) != info.header_parameters:
+            raise TemplateValidationError(f"{where} takes {info.header_parameters} parameters, "
+                                          f"{len(parameters)} given")
+        expected = HEADER_PARAMETER_TYPES.get(info.header_format)
+        for parameter in parameters:
+            kind = _type_name(_get(parameter, "type"))
+            if expected is not None and kind != expected:
+                raise TemplateValidationError(f"{where} takes {expected} parameters, not {kind}")
+
+    @staticmethod
+    def _check_body(info, parameters):
+        where = f"Template {info.name!r} ({info.language}) body"
+        if len(parameters) != info.body_parameters:
+            raise TemplateValidationError(f"{where} takes {info.body_parameters} parameters, "
+                                          f"{len(parameters)} given")
+        for parameter in parameters:
+            kind = _type_name(_get(parameter, "type"))
+            if kind not in BODY_PARAMETER_TYPES:
+                raise TemplateValidationError(f"{where} does not take {kind} parameters")
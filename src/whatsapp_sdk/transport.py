@@ -0,0 +1,285 @@
+"""
+HTTP transports the Client sends its requests through.
+
+A transport takes a finished URL, the request headers and an encoded body,
+and returns a response with the status_code / content / headers / json() /
+elapsed / iter_content() interface of a requests.Response:
+
+- RequestsTransport: a requests Session, the default
+- Urllib3Transport: urllib3 connection pools called directly, skipping
+  requests' hooks, cookie handling and per-request merging of environment
+  settings (proxies, certificates), which are a good share of the CPU time
+  of a send
+- HTTP2Transport: HTTP/2 through http2.HTTP2Session
+- InMemoryTransport: canned responses without any network I/O, for load
+  tests measuring only the SDK's own overhead
+
+Pick one by name with Client(transport="urllib3") or pass an instance.
+"""
+import datetime
+import logging
+import threading
+import time
+
+from .serialization import decode
+
+log = logging.getLogger(__name__)
+
+TRANSPORTS = ("requests", "urllib3", "http2", "memory")
+
+# Routes of the URLs sent to most recently, see Urllib3Transport
+_MAX_ROUTES = 256
+
+
+class TransportResponse:
+    """
+    Response of the transports that do not return a requests or httpx one
+    """
+    __slots__ = ("status_code", "headers", "elapsed", "_content", "_raw")
+
+    def __init__(self, status_code: int, content: bytes = None, headers=None, elapsed: float = 0.0,
+                 raw=None) -> None:
+        self.status_code = status_code
+        self.headers = headers if headers is not None else {}
+        self.elapsed = datetime.timedelta(seconds=elapsed)
+        self._content = content
+        self._raw = raw
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = self._raw.data if self._raw is not None else b""
+        return self._content
+
+    def json(self):
+        return decode(self.content)
+
+    def iter_content(self, chunk_size=None):
+        if self._raw is not None and self._content is None:
+            return self._raw.stream(chunk_size or 2 ** 16)
+        content = self.content
+        chunk_size = chunk_size or len(content) or 1
+        return (content[i:i + chunk_size] for i in range(0, len(content), chunk_size))
+
+    def close(self):
+        if self._raw is not None:
+            self._raw.release_conn()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Transport:
+    """
+    Sends one HTTP request. Implementations must be safe to call from many
+    threads at once.
+    """
+
+    def request(self, method: str, url: str, headers: dict, body=None, timeout=None, stream: bool = False):
+        """
+        Send `body`, bytes or an iterable of bytes chunks, and return the
+        response. With `stream` the body is read by the caller, who closes
+        the response.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """
+    Transport over a requests Session, by default one with a
+    timed_http.TimedHTTPAdapter sized from pool_connections/pool_maxsize
+    """
+
+    def __init__(self, session=None, pool_connections: int = 10, pool_maxsize: int = 10,
+                 max_retries: int = 3) -> None:
+        self.adapter = None
+        if session is None:
+            from requests.sessions import Session
+
+            from .timed_http import TimedHTTPAdapter
+
+            session = Session()
+            self.adapter = TimedHTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                max_retries=max_retries,
+            )
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+        self.session = session
+
+    def request(self, method, url, headers, body=None, timeout=None, stream=False):
+        return self.session.request(method, url, headers=headers, data=body, timeout=timeout, stream=stream)
+
+    def close(self):
+        self.session.close()
+
+
+class Urllib3Transport(Transport):
+    """
+    Transport calling urllib3 connection pools directly. The pool and
+    request target of each URL are looked up once and reused, so a send is
+    one dict lookup and a urlopen().
+
+    Proxy settings are not read from the environment; pass a
+    urllib3.ProxyManager as `pool_manager` to send through a proxy.
+    Redirects are not followed.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, max_retries: int = 3,
+                 pool_manager=None) -> None:
+        import urllib3
+        from urllib3.exceptions import ClosedPoolError
+        from urllib3.util.retry import Retry
+
+        from .timed_http import TimedHTTPConnectionPool, TimedHTTPSConnectionPool
+
+        if pool_manager is None:
+            pool_manager = urllib3.PoolManager(num_pools=pool_connections, maxsize=pool_maxsize)
+            pool_manager.pool_classes_by_scheme = {
+                "http": TimedHTTPConnectionPool,
+                "https": TimedHTTPSConnectionPool,
+            }
+        self.pool_manager = pool_manager
+        # as requests' HTTPAdapter: retry failed connections, not requests the server may have read
+        self.retries = Retry(max_retries, read=False, redirect=False)
+        self._routes = {}
+        self._closed_pool_error = ClosedPoolError
+
+    def _route(self, url):
+        route = self._routes.get(url)
+        if route is None:
+            from urllib3.util import parse_url
+
+            parsed = parse_url(url)
+            pool = self.pool_manager.connection_from_host(parsed.host, parsed.port, parsed.scheme)
+            route = (pool, parsed.request_uri)
+            if len(self._routes) >= _MAX_ROUTES:
+                self._routes.clear()
+            self._routes[url] = route
+        return route
+
+    def request(self, method, url, headers, body=None, timeout=None, stream=False):
+        try:
+            return self._urlopen(self._route(url), method, headers, body, timeout, stream)
+        except self._closed_pool_error:
+            # the pool manager evicted the pool of this URL for another host's
+            self._routes.pop(url, None)
+            return self._urlopen(self._route(url), method, headers, body, timeout, stream)
+
+    def _urlopen(self, route, method, headers, body, timeout, stream):
+        pool, target = route
+        chunked = False
+        if body is not None and not isinstance(body, (bytes, bytearray, str)):
+            if hasattr(body, "__len__"):
+                headers = {**headers, "Content-Length": str(len(body))}
+            else:
+                chunked = True
+        started = time.perf_counter()
+        raw = pool.urlopen(
+            method, target, body=body, headers=headers, retries=self.retries, redirect=False,
+            timeout=timeout, assert_same_host=False, preload_content=not stream, chunked=chunked,
+        )
+        return TransportResponse(raw.status, None if stream else raw.data, raw.headers,
+                                 time.perf_counter() - started, raw)
+
+    def close(self):
+        self._routes.clear()
+        self.pool_manager.clear()
+
+
+class HTTP2Transport(Transport):
+    """
+    Transport over an http2.HTTP2Session, see there
+    """
+
+    def __init__(self, max_connections: int = 10, max_keepalive_connections: int = None, retries: int = 0,
+                 timeout=30, prior_knowledge: bool = False) -> None:
+        from .http2 import HTTP2Session
+
+        self.session = HTTP2Session(max_connections, max_keepalive_connections, retries, timeout, prior_knowledge)
+
+    def request(self, method, url, headers, body=None, timeout=None, stream=False):
+        return self.session.request(method, url, data=body, headers=headers, timeout=timeout, stream=stream)
+
+    def close(self):
+        self.session.close()
+
+
+# Reply of InMemoryTransport by default: a message send accepted by the Cloud API
+ACCEPTED_BODY = (
+    b'{"messaging_product":"whatsapp","contacts":[{"input":"0","wa_id":"0"}],'
+    b'"messages":[{"id":"wamid.inmemory","message_status":"accepted"}]}'
+)
+
+
+class InMemoryTransport(Transport):
+    """
+    Transport answering every request with `status_code` and `body` without
+    any I/O, or with what `responder(method, url, headers, body)` returns:
+    a (status_code, body) tuple or a response. Batch requests (see batch.py)
+    get one such item per operation. Request bodies given as iterables are
+    read to the end, as a real transport would.
+
+    `requests` counts the requests answered.
+    """
+
+    def __init__(self, status_code: int = 200, body: bytes = ACCEPTED_BODY, headers: dict = None,
+                 responder=None) -> None:
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {"Content-Type": "application/json"}
+        self.responder = responder
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers, body=None, timeout=None, stream=False):
+        if body is not None and not isinstance(body, (bytes, bytearray, str)):
+            body = b"".join(body)
+        with self._lock:
+            self.requests += 1
+        if self.responder is None:
+            if body is not None and body[:6] == b"batch=":
+                return TransportResponse(200, self._batch_reply(body), self.headers)
+            return TransportResponse(self.status_code, self.body, self.headers)
+        reply = self.responder(method, url, headers, body)
+        if isinstance(reply, tuple):
+            status_code, content = reply
+            return TransportResponse(status_code, content, self.headers)
+        return reply
+
+    def _batch_reply(self, body):
+        import json
+        import urllib.parse
+
+        operations = json.loads(urllib.parse.parse_qs(body.decode())["batch"][0])
+        item = {"code": self.status_code, "body": self.body.decode()}
+        return json.dumps([item] * len(operations)).encode()
+
+
+def create_transport(name: str, pool_connections: int = 10, pool_maxsize: int = 10, max_retries: int = 3,
+                     timeout=30, prior_knowledge: bool = False) -> Transport:
+    """
+    A transport of one of TRANSPORTS, sized like the Client's connection pool
+    """
+    if name == "requests":
+        return RequestsTransport(None, pool_connections, pool_maxsize, max_retries)
+    if name == "urllib3":
+        return Urllib3Transport(pool_connections, pool_maxsize, max_retries)
+    if name == "http2":
+        return HTTP2Transport(pool_maxsize, pool_connections, max_retries, timeout, prior_knowledge)
+    if name == "memory":
+        return InMemoryTransport()
+    raise ValueError(f"Unknown transport {name!r}, expected one of {list(TRANSPORTS)}")
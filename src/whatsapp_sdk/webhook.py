@@ -0,0 +1,259 @@
+"""
+Webhook receiver for WhatsApp Cloud API notifications.
+
+WebhookHandler performs the verify-token handshake, checks the
+X-Hub-Signature-256 HMAC over the raw body and dispatches inbound messages,
+statuses and errors, and changes of other subscribed fields, to callbacks.
+It is framework neutral: the handler is a WSGI application, `handler.asgi`
+is an ASGI application, and handle_verification/handle_notification can be
+called from any framework.
+"""
+import hashlib
+import hmac
+import logging
+import urllib.parse
+from http import HTTPStatus
+from typing import Callable, Optional
+
+from .schema.webhook import Metadata, Status, WebhookNotification
+from .serialization import decode
+
+log = logging.getLogger(__name__)
+
+# Keys of a change value that only carries status updates
+_STATUS_ONLY_KEYS = frozenset(("messaging_product", "metadata", "statuses"))
+
+
+def verify_signature(app_secret: bytes, body: bytes, signature: Optional[str]) -> bool:
+    """
+    Check an X-Hub-Signature-256 header ("sha256=<hex>") against the HMAC of
+    the raw request body, in constant time.
+    """
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(app_secret, body, hashlib.sha256).hexdigest()
+    # compared as bytes: compare_digest refuses str with non-ASCII characters
+    return hmac.compare_digest(expected.encode(), signature[7:].encode("utf-8", "replace"))
+
+
+class StatusUpdate:
+    """
+    Unvalidated status update from the fast path. Exposes the core fields of
+    schema.webhook.Status as attributes; the nested conversation, pricing and
+    errors are left in `raw` until the full model is asked for.
+    """
+    __slots__ = ("id", "status", "timestamp", "recipient_id", "raw")
+
+    def __init__(self, raw: dict) -> None:
+        self.id = raw["id"]
+        self.status = raw["status"]
+        self.timestamp = raw.get("timestamp")
+        self.recipient_id = raw.get("recipient_id")
+        self.raw = raw
+
+    def model(self) -> Status:
+        return Status.model_validate(self.raw)
+
+    def __repr__(self):
+        return f"StatusUpdate(id={self.id!r}, status={self.status!r}, recipient_id={self.recipient_id!r})"
+
+
+def _status_only_values(payload):
+    """
+    The change values of a payload when all of them are "messages" changes
+    only carrying well-formed statuses, otherwise None: anything else goes
+    through full validation.
+    """
+    try:
+        changes = [change for entry in payload["entry"] for change in entry["changes"]]
+        values = [change["value"] for change in changes if change.get("field") == "messages"]
+    except (KeyError, TypeError, AttributeError):
+        return None
+    if len(values) != len(changes):
+        return None
+    for value in values:
+        if ("statuses" not in value or not _STATUS_ONLY_KEYS.issuperset(value)
+                or not isinstance(value.get("metadata"), dict)):
+            return None
+        statuses = value["statuses"]
+        if not isinstance(statuses, list):
+            return None
+        for status in statuses:
+            if not isinstance(status, dict) or "id" not in status or "status" not in status:
+                return None
+    return values
+
+
+def parse_notification(body: bytes) -> WebhookNotification:
+    """
+    Parse and fully validate a webhook request body.
+    """
+    return WebhookNotification.model_validate(decode(body))
+
+
+class WebhookHandler:
+    """
+    :param verify_token: token configured for the webhook in the Meta app
+    :param app_secret: app secret used to sign notifications; None disables
+                       signature checks, e.g. when a proxy already verified them
+    :param on_message: called with (InboundMessage, Value) for each inbound message
+    :param on_status: called with (Status, Metadata) for each status update
+    :param on_error: called with (WebhookError, Value) for each error
+    :param on_change: called with (field, Value) for changes of subscribed
+                      fields other than "messages", e.g.
+                      message_template_status_update, whose keys are
+                      attributes of the Value. Without it they are
+                      acknowledged and ignored.
+    :param trust_statuses: deliver statuses of status-only notifications, by
+                           far the most common ones, as StatusUpdate objects
+                           without validating them. Safe once the signature
+                           has been verified.
+
+    Callbacks run synchronously on the request; keep them short or hand the
+    event off to a queue. When a callback raises, the request is answered
+    with 500 so that Meta delivers the notification again.
+    """
+
+    def __init__(
+            self,
+            verify_token: str,
+            app_secret,
+            on_message: Callable = None,
+            on_status: Callable = None,
+            on_error: Callable = None,
+            on_change: Callable = None,
+            trust_statuses: bool = True,
+    ) -> None:
+        self.verify_token = verify_token
+        if isinstance(app_secret, str):
+            app_secret = app_secret.encode()
+        self._app_secret = app_secret
+        if app_secret is None:
+            log.warning("WebhookHandler created without app_secret, signatures will not be verified")
+        self.on_message = on_message
+        self.on_status = on_status
+        self.on_error = on_error
+        self.on_change = on_change
+        self.trust_statuses = trust_statuses
+
+    def handle_verification(self, params: dict):
+        """
+        Answer the GET subscription handshake.
+
+        :param params: query parameters as a flat dict
+        :return: (status code, response body)
+        """
+        token = params.get("hub.verify_token") or ""
+        if params.get("hub.mode") == "subscribe" and hmac.compare_digest(token.encode(), self.verify_token.encode()):
+            return 200, (params.get("hub.challenge") or "").encode()
+        return 403, b""
+
+    def dispatch(self, notification: WebhookNotification) -> None:
+        for entry in notification.entry:
+            for change in entry.changes:
+                value = change.value
+                if change.field != "messages":
+                    if self.on_change is not None:
+                        self.on_change(change.field, value)
+                    else:
+                        log.debug(f"Ignored webhook change of field {change.field}")
+                    continue
+                if value.statuses and self.on_status is not None:
+                    for status in value.statuses:
+                        self.on_status(status, value.metadata)
+                if value.messages and self.on_message is not None:
+                    for message in value.messages:
+                        self.on_message(message, value)
+                if value.errors and self.on_error is not None:
+                    for error in value.errors:
+                        self.on_error(error, value)
+
+    def handle_notification(self, body: bytes, signature: Optional[str]):
+        """
+        Verify, parse and dispatch a POSTed notification.
+
+        :param body: the raw request body, exactly as received
+        :param signature: value of the X-Hub-Signature-256 header
+        :return: (status code, response body)
+        """
+        if self._app_secret is not None and not verify_signature(self._app_secret, body, signature):
+            log.warning("Rejected webhook notification with an invalid signature")
+            return 401, b""
+        try:
+            payload = decode(body)
+            values = _status_only_values(payload) if self.trust_statuses else None
+            if values is None:
+                notification = WebhookNotification.model_validate(payload)
+        except ValueError as e:
+            log.warning(f"Rejected malformed webhook notification: {e}")
+            return 400, b""
+        try:
+            if values is None:
+                self.dispatch(notification)
+            elif self.on_status is not None:
+                for value in values:
+                    metadata = Metadata.model_construct(**value["metadata"])
+                    for status in value["statuses"]:
+                        self.on_status(StatusUpdate(status), metadata)
+        except Exception:
+            log.exception("Webhook callback failed")
+            return 500, b""
+        return 200, b""
+
+    # -------------- WSGI --------------
+
+    def __call__(self, environ, start_response):
+        method = environ.get("REQUEST_METHOD")
+        if method == "GET":
+            params = dict(urllib.parse.parse_qsl(environ.get("QUERY_STRING", "")))
+            status, body = self.handle_verification(params)
+        elif method == "POST":
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+            raw = environ["wsgi.input"].read(length) if length else b""
+            status, body = self.handle_notification(raw, environ.get("HTTP_X_HUB_SIGNATURE_256"))
+        else:
+            status, body = 405, b""
+        start_response(
+            f"{status} {HTTPStatus(status).phrase}",
+            [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))],
+        )
+        return [body]
+
+    # -------------- ASGI --------------
+
+    async def asgi(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        method = scope["method"]
+        if method == "GET":
+            params = dict(urllib.parse.parse_qsl(scope.get("query_string", b"").decode()))
+            status, body = self.handle_verification(params)
+        elif method == "POST":
+            chunks = []
+            more_body = True
+            while more_body:
+                message = await receive()
+                chunks.append(message.get("body", b""))
+                more_body = message.get("more_body", False)
+            signature = None
+            for name, value in scope["headers"]:
+                if name == b"x-hub-signature-256":
+                    signature = value.decode()
+                    break
+            status, body = self.handle_notification(b"".join(chunks), signature)
+        else:
+            status, body = 405, b""
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
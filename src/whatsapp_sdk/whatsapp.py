@@ -1,9 +1,12 @@
+import asyncio
 import json
 import logging
+import time
 from typing import List
 
 from .enums import FreeFormMsgType
 from .request_schema import *
+from .serialization import encode, encode_model
 from .schema.template import Language, Template, TemplateMsg
 
 log = logging.getLogger(__name__)
@@ -14,7 +17,7 @@ class Whatsapp:
     def __init__(self, client):
         self._client = client
 
-    def send_free_form_message(
+    def build_free_form_message(
             self,
             msg_type: str = "text",
             recipient_type: str = "individual",
@@ -47,7 +50,7 @@ class Whatsapp:
         - Contacts
         - Interactive
         - Address messages
-        :return:
+        :return: the request model for the message, ready to be dumped
         """
         msg_body = {}
         if msg_type == "text":
@@ -113,9 +116,21 @@ class Whatsapp:
             pass
         else:
             raise ValueError("Invalid msg_type")
-        return self._client.post(path="/messages", params=msg_body.model_dump())
+        return msg_body
 
-    def send_template_message(
+    def send_free_form_message(self, *args, idempotency_key: str = None, **kwargs):
+        """
+        Build a free-form message and send it. Accepts the same arguments as
+        build_free_form_message, and the `idempotency_key` of Client.post.
+        """
+        from .instrumentation import message_type
+
+        started = time.perf_counter()
+        msg_body = self.build_free_form_message(*args, **kwargs)
+        return self._client.post(path="/messages", body=encode_model(msg_body), recipient=msg_body.to,
+                                 msg_type=message_type(msg_body), started=started, idempotency_key=idempotency_key)
+
+    def build_template_message(
         self,
         name: str,
         to: str,
@@ -137,12 +152,214 @@ class Whatsapp:
             components=components,
             language=Language(code=language)
         )
-        msg_body = TemplateMsg(to=to, template=template, recipient_type=recipient_type)
-        msg_body_dict = msg_body.model_dump()
-        return self._client.post(path="/messages", params=msg_body_dict)
+        return TemplateMsg(to=to, template=template, recipient_type=recipient_type)
+
+    def validate_template_message(self, message) -> None:
+        """
+        Check a template message, a TemplateMsg or its dict, against the
+        client's template_registry if it has one, raising
+        TemplateValidationError for messages the API would refuse
+        """
+        registry = getattr(self._client, "template_registry", None)
+        if registry is not None:
+            registry.validate_message(message)
+
+    def send_template_message(self, *args, idempotency_key: str = None, **kwargs):
+        """
+        Build a template message and send it. Accepts the same arguments as
+        build_template_message, and the `idempotency_key` of Client.post.
+        """
+        from .instrumentation import message_type
+
+        started = time.perf_counter()
+        msg_body = self.build_template_message(*args, **kwargs)
+        self.validate_template_message(msg_body)
+        return self._client.post(path="/messages", body=encode_model(msg_body), recipient=msg_body.to,
+                                 msg_type=message_type(msg_body), started=started, idempotency_key=idempotency_key)
+
+    def send_compiled_template(self, template, to: str, header=None, body=None, footer=None,
+                               idempotency_key: str = None):
+        """
+        Send a CompiledTemplate to `to`, filling its text slots with the given
+        header/body/footer values.
+        """
+        started = time.perf_counter()
+        params = template.render(to, header=header, body=body, footer=footer)
+        self.validate_template_message(params)
+        return self._client.post(path="/messages", body=encode(params), recipient=to,
+                                 msg_type="template", started=started, idempotency_key=idempotency_key)
+
+    def send_message(self, message, idempotency_key: str = None):
+        """
+        Send a message built with one of the builders.py classes, e.g.
+        TextMessage(to, "Hello"), without going through the pydantic models
+        """
+        started = time.perf_counter()
+        params = message.to_dict()
+        if message.type == "template":
+            self.validate_template_message(params)
+        return self._client.post(path="/messages", body=encode(params), recipient=message.to,
+                                 msg_type=message.type, started=started, idempotency_key=idempotency_key)
+
+    def _bulk_workers(self, workers):
+        return workers or getattr(self._client, "pool_maxsize", None) or 10
+
+    def send_template_bulk(self, recipients, name: str, workers: int = None, **kwargs):
+        """
+        Send a template message to many recipients concurrently.
+
+        `recipients` is an iterable of phone numbers, or of dicts holding
+        per-recipient arguments of send_template_message (e.g. `to` and `body`)
+        which override `kwargs`. `workers` defaults to the client's pool_maxsize
+        so every worker holds one pooled connection.
+
+        :return: BulkSend, an iterator of BulkResult in completion order whose
+                 `summary` holds the totals once exhausted
+        """
+        from .bulk import BulkSend
+        return BulkSend(self.send_template_message, recipients, self._bulk_workers(workers), name=name, **kwargs)
+
+    def template_campaign(self, name: str, rows, mapping=None, checkpoint: str = None, results: str = None,
+                          workers: int = None, **kwargs) -> "Campaign":
+        """
+        A Campaign sending the template `name` to every row of `rows`, e.g.
+        campaign.read_csv(path), resuming from `checkpoint` when it exists.
+        Call run() on it to send, or await run_async() on an AsyncWhatsapp.
+        """
+        from .campaign import Campaign
+        return Campaign(self, name, rows, mapping, checkpoint, results, workers, **kwargs)
+
+    def send_free_form_bulk(self, recipients, workers: int = None, **kwargs):
+        """
+        Send a free-form message to many recipients concurrently. Recipients
+        and results are handled as in send_template_bulk, with `kwargs` being
+        the common arguments of send_free_form_message.
+        """
+        from .bulk import BulkSend
+        return BulkSend(self.send_free_form_message, recipients, self._bulk_workers(workers), **kwargs)
+
+    def upload_media(self, file, mime_type: str, filename: str = None, use_cache: bool = True) -> str:
+        """
+        Upload media to the phone number's /media endpoint and return its
+        media_id, for use as `media_id` in send_free_form_message.
+
+        `file` is a path, a binary file object or a bytes-like/mmap buffer; it
+        is streamed in chunks and never read into memory as a whole. When the
+        client has a media_cache, content already uploaded is looked up by
+        its sha256 and not uploaded again.
+        """
+        from .media import finish_upload, prepare_upload
+
+        media_id, upload, digest = prepare_upload(self._client, file, mime_type, filename, use_cache)
+        if media_id is not None:
+            return media_id
+        with upload:
+            result = self._client.post_stream(upload, upload.content_type, path="/media")
+        return finish_upload(self._client, digest, result)
+
+    def download_media(self, media_id: str, dest, chunk_size: int = None, workers: int = 1,
+                       part_size: int = None, verify: bool = True) -> dict:
+        """
+        Download received media to `dest` (a path or a writer), streaming it in
+        chunks and checking its sha256. See media.download_media for parallel
+        ranged downloads with `workers` > 1; `chunk_size` and `part_size`
+        default to media.CHUNK_SIZE and media.DOWNLOAD_PART_SIZE.
+
+        :return: the media metadata (url, mime_type, sha256, file_size, id)
+        """
+        from .media import CHUNK_SIZE, DOWNLOAD_PART_SIZE, download_media
+
+        return download_media(self._client, media_id, dest, chunk_size or CHUNK_SIZE, workers,
+                              part_size or DOWNLOAD_PART_SIZE, verify)
+
+    @staticmethod
+    def build_read_receipt(message_id: str):
+        if message_id is None:
+            raise ValueError("Message ID cannot be empty")
+        return {"messaging_product": "whatsapp", "status": "read", "message_id": message_id}
+
+    def mark_message_as_read(self, message_id: str):
+        return self._client.post(path="/messages", params=self.build_read_receipt(message_id), msg_type="read")
+
+
+class AsyncWhatsapp(Whatsapp):
+    """
+    Awaitable counterpart of Whatsapp, bound to an AsyncClient. Message bodies
+    are built exactly as in Whatsapp; only the network call is awaited.
+    """
+
+    async def send_free_form_message(self, *args, idempotency_key: str = None, **kwargs):
+        from .instrumentation import message_type
+
+        started = time.perf_counter()
+        msg_body = self.build_free_form_message(*args, **kwargs)
+        return await self._client.post(path="/messages", body=encode_model(msg_body), recipient=msg_body.to,
+                                       msg_type=message_type(msg_body), started=started,
+                                       idempotency_key=idempotency_key)
+
+    async def send_template_message(self, *args, idempotency_key: str = None, **kwargs):
+        from .instrumentation import message_type
+
+        started = time.perf_counter()
+        msg_body = self.build_template_message(*args, **kwargs)
+        self.validate_template_message(msg_body)
+        return await self._client.post(path="/messages", body=encode_model(msg_body), recipient=msg_body.to,
+                                       msg_type=message_type(msg_body), started=started,
+                                       idempotency_key=idempotency_key)
+
+    async def send_compiled_template(self, template, to: str, header=None, body=None, footer=None,
+                                     idempotency_key: str = None):
+        started = time.perf_counter()
+        params = template.render(to, header=header, body=body, footer=footer)
+        self.validate_template_message(params)
+        return await self._client.post(path="/messages", body=encode(params), recipient=to,
+                                       msg_type="template", started=started, idempotency_key=idempotency_key)
+
+    def send_template_bulk(self, recipients, name: str, workers: int = None, **kwargs):
+        """
+        Send a template message to many recipients concurrently on the
+        running event loop, awaiting at most `workers` sends at once.
+
+        :return: AsyncBulkSend, iterated with `async for` in completion order
+        """
+        from .bulk import AsyncBulkSend
+        return AsyncBulkSend(self.send_template_message, recipients, self._bulk_workers(workers), name=name,
+                             **kwargs)
+
+    def send_free_form_bulk(self, recipients, workers: int = None, **kwargs):
+        from .bulk import AsyncBulkSend
+        return AsyncBulkSend(self.send_free_form_message, recipients, self._bulk_workers(workers), **kwargs)
+
+    async def send_message(self, message, idempotency_key: str = None):
+        started = time.perf_counter()
+        params = message.to_dict()
+        if message.type == "template":
+            self.validate_template_message(params)
+        return await self._client.post(path="/messages", body=encode(params), recipient=message.to,
+                                       msg_type=message.type, started=started, idempotency_key=idempotency_key)
+
+    async def upload_media(self, file, mime_type: str, filename: str = None, use_cache: bool = True) -> str:
+        from .media import finish_upload, prepare_upload
+
+        # opening and hashing the file for the media cache blocks
+        media_id, upload, digest = await asyncio.to_thread(prepare_upload, self._client, file, mime_type, filename,
+                                                           use_cache)
+        if media_id is not None:
+            return media_id
+        with upload:
+            result = await self._client.post_stream(upload, upload.content_type, path="/media")
+        return finish_upload(self._client, digest, result)
+
+    async def download_media(self, media_id: str, dest, chunk_size: int = None, workers: int = 1,
+                             part_size: int = None, verify: bool = True) -> dict:
+        from .media import CHUNK_SIZE, DOWNLOAD_PART_SIZE, download_media_async
+
+        return await download_media_async(self._client, media_id, dest, chunk_size or CHUNK_SIZE, workers,
+                                          part_size or DOWNLOAD_PART_SIZE, verify)
 
-    def mark_message_as_read(self):
-        pass
+    async def mark_message_as_read(self, message_id: str):
+        return await self._client.post(path="/messages", params=self.build_read_receipt(message_id),
+                                       msg_type="read")
 
 
 if __name__ == '__main__':
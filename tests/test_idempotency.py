@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from whatsapp_sdk.client import Client
+from whatsapp_sdk.error import DuplicateMessageError
+from whatsapp_sdk.idempotency import DuplicateGuard
+from whatsapp_sdk.retry import RetryPolicy
+from whatsapp_sdk.transport import ACCEPTED_BODY, InMemoryTransport
+
+MESSAGE = {"messaging_product": "whatsapp", "to": "919876543210", "type": "text", "text": {"body": "hi"}}
+
+
+def error_body(code):
+    return json.dumps({"error": {
+        "message": f"error {code}", "type": "OAuthException", "code": code,
+        "error_data": {"messaging_product": "whatsapp", "details": f"error {code}"}, "fbtrace_id": "A",
+    }}).encode()
+
+
+def reply(status_code, body):
+    def responder(method, url, headers, data):
+        return status_code, body
+    return responder
+
+
+def connection_error(method, url, headers, data):
+    raise ConnectionError("connection reset")
+
+
+# how the client reports failures: raised with a retry_policy, returned (lazily or not) without one
+CLIENTS = {
+    "raised": {"retry_policy": RetryPolicy(max_attempts=1)},
+    "returned": {},
+    "lazy": {"lazy_responses": True},
+}
+
+
+def send_twice(guard, responder, client_kwargs):
+    """
+    Send MESSAGE with `responder` answering, then again with the API accepting it. Whether the second
+    send went out.
+    """
+    transport = InMemoryTransport(responder=responder)
+    client = Client("token", "1", transport=transport, idempotency=guard, **client_kwargs)
+    try:
+        client.post(params=MESSAGE)
+    except Exception:
+        pass
+    transport.responder = reply(200, ACCEPTED_BODY)
+    try:
+        client.post(params=MESSAGE)
+    except DuplicateMessageError:
+        return False
+    return True
+
+
+@pytest.mark.parametrize("client", CLIENTS)
+@pytest.mark.parametrize("uncertain", ["keep", "release"])
+@pytest.mark.parametrize("status_code, code", [(400, 131026), (429, 130429), (400, 131056), (401, 190)])
+def test_refused_send_releases_key(client, uncertain, status_code, code):
+    guard = DuplicateGuard(capacity=1000, uncertain=uncertain)
+    assert send_twice(guard, reply(status_code, error_body(code)), CLIENTS[client])
+
+
+@pytest.mark.parametrize("client", CLIENTS)
+@pytest.mark.parametrize("uncertain, resent", [("keep", False), ("release", True)])
+@pytest.mark.parametrize("responder", [
+    reply(500, error_body(1)),
+    reply(503, b"Service Unavailable"),
+    reply(400, error_body(131000)),
+    connection_error,
+], ids=["500", "503-no-json", "transient-code", "connection-error"])
+def test_uncertain_send_follows_policy(client, uncertain, resent, responder):
+    guard = DuplicateGuard(capacity=1000, uncertain=uncertain)
+    assert send_twice(guard, responder, CLIENTS[client]) is resent
+
+
+@pytest.mark.parametrize("client", CLIENTS)
+def test_sent_key_is_kept(client):
+    guard = DuplicateGuard(capacity=1000, uncertain="release")
+    assert not send_twice(guard, reply(200, ACCEPTED_BODY), CLIENTS[client])
+    assert guard.suppressed == 1
+
+
+def test_unknown_policy_is_refused():
+    with pytest.raises(ValueError):
+        DuplicateGuard(capacity=1000, uncertain="retry")
@@ -0,0 +1,55 @@
+import json
+import sqlite3
+
+import pytest
+
+from whatsapp_sdk.client import Client
+from whatsapp_sdk.outbound_queue import FAILED, SENT, OutboundQueue
+from whatsapp_sdk.transport import ACCEPTED_BODY, InMemoryTransport
+
+
+def error_body(code):
+    return json.dumps({"error": {
+        "message": f"error {code}", "type": "OAuthException", "code": code,
+        "error_data": {"messaging_product": "whatsapp", "details": f"error {code}"}, "fbtrace_id": "A",
+    }}).encode()
+
+
+class Replies:
+    """
+    Responder answering with `errors` (status_code, body) replies first, then accepting
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+
+    def __call__(self, method, url, headers, body):
+        if self.errors:
+            return self.errors.pop(0)
+        return 200, ACCEPTED_BODY
+
+
+def drain(tmp_path, responder, lazy_responses):
+    client = Client("token", "1", transport=InMemoryTransport(responder=responder), lazy_responses=lazy_responses)
+    path = str(tmp_path / "queue.db")
+    outbound = OutboundQueue(client, path, workers=2, backoff=0.01, max_backoff=0.05, poll_interval=0.01)
+    outbound.enqueue({"messaging_product": "whatsapp", "to": "919876543210", "type": "text",
+                      "text": {"body": "hi"}})
+    with outbound:
+        assert outbound.join(timeout=10, poll_interval=0.01)
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT state, attempts, wamid, error FROM outbound").fetchone()
+
+
+@pytest.mark.parametrize("lazy_responses", [False, True])
+@pytest.mark.parametrize("status_code, code", [(429, 130429), (400, 131056), (403, 4), (500, 131000)])
+def test_throttled_or_transient_body_is_retried(tmp_path, lazy_responses, status_code, code):
+    state, attempts, wamid, error = drain(tmp_path, Replies((status_code, error_body(code))), lazy_responses)
+    assert (state, attempts, wamid) == (SENT, 2, "wamid.inmemory")
+
+
+@pytest.mark.parametrize("lazy_responses", [False, True])
+def test_permanent_error_body_fails(tmp_path, lazy_responses):
+    state, attempts, wamid, error = drain(tmp_path, Replies((400, error_body(131026))), lazy_responses)
+    assert (state, attempts, wamid) == (FAILED, 1, None)
+    assert "RecipientError" in error and "131026" in error